@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import TeacherProfile, Student, Subject, Result
+from .search import search_filter
+from .models import (
+    TeacherProfile, Student, Subject, Result, GradeBoundary, TermSummary, ClassSubjectSummary, CumulativeResult,
+    Job,
+)
 
 @admin.register(TeacherProfile)
 class TeacherProfileAdmin(admin.ModelAdmin):
@@ -10,6 +14,12 @@ class StudentAdmin(admin.ModelAdmin):
     list_display = ('reg_no', 'first_name', 'last_name', 'class_level', 'teacher')
     search_fields = ('reg_no', 'first_name', 'last_name')
 
+    def get_search_results(self, request, queryset, search_term):
+        # Indexed prefix match on the normalized keys instead of icontains scans
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(search_filter(search_term)), False
+
 @admin.register(Subject)
 class SubjectAdmin(admin.ModelAdmin):
     list_display = ('name',)
@@ -20,3 +30,33 @@ class ResultAdmin(admin.ModelAdmin):
                     'grade', 'term', 'session', 'entered_by', 'created_at')
     list_filter = ('term', 'session', 'subject')
     search_fields = ('student__reg_no', 'student__first_name')
+
+@admin.register(GradeBoundary)
+class GradeBoundaryAdmin(admin.ModelAdmin):
+    list_display = ('session', 'grade', 'min_score')
+    list_filter = ('session',)
+
+@admin.register(TermSummary)
+class TermSummaryAdmin(admin.ModelAdmin):
+    list_display = ('student', 'term', 'session', 'result_count', 'total_score', 'average', 'updated_at')
+    list_filter = ('term', 'session')
+    search_fields = ('student__reg_no', 'student__first_name')
+
+@admin.register(ClassSubjectSummary)
+class ClassSubjectSummaryAdmin(admin.ModelAdmin):
+    list_display = ('class_level', 'subject', 'term', 'session', 'result_count', 'average',
+                    'minimum', 'maximum', 'updated_at')
+    list_filter = ('class_level', 'term', 'session', 'subject')
+
+@admin.register(CumulativeResult)
+class CumulativeResultAdmin(admin.ModelAdmin):
+    list_display = ('student', 'subject', 'session', 'result_count', 'total_score', 'average', 'term_scores',
+                    'updated_at')
+    list_filter = ('session', 'subject')
+    search_fields = ('student__reg_no', 'student__first_name')
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress', 'total', 'requested_by', 'worker', 'attempts',
+                    'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
@@ -0,0 +1,124 @@
+from collections import Counter
+from decimal import Decimal
+from .grading import get_scale
+from .models import TERM_CHOICES, ClassSubjectSummary
+from .summaries import HISTOGRAM_BUCKETS, HISTOGRAM_WIDTH
+
+# ---------------------------
+# Grade and score distributions (EO analytics page)
+# ---------------------------
+# Everything here is read from ClassSubjectSummary: its grade_counts and
+# score_histogram are maintained incrementally with the rest of the summary
+# (summaries.py), so a page reads at most classes x subjects x terms rows of
+# one session whatever the number of results behind them.
+
+def bucket_label(low):
+    high = 100 if low == HISTOGRAM_BUCKETS[-1] else low + HISTOGRAM_WIDTH - 1
+    return f"{low}–{high}"
+
+
+class Distribution:
+    """Summary rows merged: result count, total, grade counts and score histogram."""
+
+    def __init__(self, failing_grade):
+        self.failing_grade = failing_grade
+        self.count = 0
+        self.total = Decimal(0)
+        self.grades = Counter()
+        self.histogram = Counter()
+
+    def add(self, row):
+        self.count += row['result_count']
+        self.total += row['total_score']
+        self.grades.update(row['grade_counts'])
+        self.histogram.update({int(low): n for low, n in row['score_histogram'].items()})
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def pass_rate(self):
+        """Percentage of results above the session's lowest grade."""
+        if not self.count:
+            return None
+        return 100 * Decimal(self.count - self.grades.get(self.failing_grade, 0)) / self.count
+
+    def grade_rows(self, grades):
+        return [{'grade': grade, 'count': self.grades.get(grade, 0),
+                 'percent': self.percent(self.grades.get(grade, 0))} for grade in grades]
+
+    def histogram_rows(self):
+        return [{'label': bucket_label(low), 'count': self.histogram.get(low, 0),
+                 'percent': self.percent(self.histogram.get(low, 0))} for low in HISTOGRAM_BUCKETS]
+
+    def percent(self, n):
+        return 100 * n / self.count if self.count else 0
+
+
+def change(current, previous):
+    if current is None or previous is None:
+        return None
+    return current - previous
+
+
+def session_choices():
+    return list(ClassSubjectSummary.objects.order_by('-session').values_list('session', flat=True).distinct())
+
+
+def grade_analytics(session, term='', class_level='', subject_id=''):
+    """
+    Page data for one session, optionally narrowed to a class and/or subject:
+    grade distribution, score histogram and per-class / per-subject figures
+    for ``term`` (or the whole session), plus every term side by side.
+    """
+    summaries = ClassSubjectSummary.objects.filter(session=session)
+    if class_level:
+        summaries = summaries.filter(class_level=class_level)
+    if subject_id:
+        summaries = summaries.filter(subject_id=subject_id)
+    rows = list(summaries.values('class_level', 'subject_id', 'subject__name', 'term', 'result_count',
+                                 'total_score', 'grade_counts', 'score_histogram'))
+
+    scale = get_scale(session)
+    failing_grade = scale.grades[0]
+    overall = Distribution(failing_grade)
+    by_class, by_subject, by_term = {}, {}, {}
+    for row in rows:
+        by_term.setdefault(row['term'], Distribution(failing_grade)).add(row)
+        if term and row['term'] != term:
+            continue
+        overall.add(row)
+        by_class.setdefault(row['class_level'], Distribution(failing_grade)).add(row)
+        by_subject.setdefault((row['subject__name'], row['subject_id']), Distribution(failing_grade)).add(row)
+
+    # Hardest subjects first: lowest average, then lowest pass rate
+    subjects = sorted(
+        ({'name': name, 'id': subject_id, 'stats': stats,
+          'relative': change(stats.average, overall.average)}
+         for (name, subject_id), stats in by_subject.items()),
+        key=lambda item: (item['stats'].average, item['stats'].pass_rate, item['name']),
+    )
+
+    terms, previous = [], None
+    for value, label in TERM_CHOICES:
+        stats = by_term.get(value)
+        if stats is None:
+            continue
+        terms.append({
+            'term': value, 'label': label, 'stats': stats,
+            'average_change': change(stats.average, previous.average) if previous else None,
+            'pass_rate_change': change(stats.pass_rate, previous.pass_rate) if previous else None,
+        })
+        previous = stats
+
+    grades = list(reversed(scale.grades))  # best first
+    return {
+        'overall': overall,
+        'grades': overall.grade_rows(grades),
+        'histogram': overall.histogram_rows(),
+        'classes': [{'class_level': name, 'stats': stats} for name, stats in sorted(by_class.items())],
+        'subjects': subjects,
+        'terms': terms,
+        'failing_grade': failing_grade,
+    }
@@ -1,4 +1,6 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 class ExamAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -6,4 +8,16 @@ class ExamAppConfig(AppConfig):
 
     def ready(self):
         # import signals to auto-create TeacherProfile when a new User is created
-        import exam_app.signals
+        # and to keep the result summaries up to date
+        from . import signals
+        post_migrate.connect(signals.build_missing_summaries, sender=self)
+
+        # WAL, busy timeout and pragmas for every new SQLite connection
+        from .database import configure_connection
+        connection_created.connect(configure_connection, dispatch_uid='exam_app.configure_connection')
+
+        # Query counting on every connection from the start, whatever thread opens it
+        from django.conf import settings
+        if settings.EXAM_INSTRUMENTATION:
+            from .instrumentation import install_query_counting
+            connection_created.connect(install_query_counting, dispatch_uid='exam_app.instrumentation')
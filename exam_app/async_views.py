@@ -0,0 +1,138 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from .caching import (
+    REBUILD_SCOPE, STUDENTS_SCOPE, acached, class_students_scope, section_scope, teacher_results_scope,
+)
+from .decorators import eo_required, teacher_required
+from .exports import astatistics_csv, astreaming_results_csv
+from .models import CLASS_CHOICES, TERM_CHOICES, Result, Student
+from .pagination import DEFAULT_PAGE_SIZE, akeyset_page
+from .queries import aresults_overview, graded_by_teacher, section_rows
+from .routers import reporting_view
+
+# ---------------------------
+# Async read-only views (served under ASGI)
+# ---------------------------
+# Same URLs, templates and cache keys as their views.py counterparts; urls.py
+# picks these when settings.EXAM_ASYNC_VIEWS is on. Every queryset is
+# evaluated here with the async ORM, so templates only see plain lists and
+# never touch the database from the event loop.
+
+async def alist(queryset):
+    return [obj async for obj in queryset.aiterator()]
+
+
+# Teacher Dashboard
+@teacher_required
+async def teacher_dashboard(request):
+    teacher = request.teacher
+    student_count, recent_results = await asyncio.gather(
+        Student.objects.filter(class_level=teacher.class_level).acount(),
+        alist(
+            Result.objects.filter(entered_by=teacher)
+            .select_related('student', 'subject')
+            .order_by('-created_at')[:8]
+        ),
+    )
+    return render(request, 'teacher_dashboard.html', {
+        'teacher': teacher,
+        'student_count': student_count,
+        'recent_results': recent_results
+    })
+
+
+# View Students
+@teacher_required
+async def view_students(request):
+    teacher = request.teacher
+    students = await alist(Student.objects.filter(class_level=teacher.class_level))
+    return render(request, 'view_students.html', {
+        'students': students,
+        'teacher': teacher
+    })
+
+
+# Graded Students
+@teacher_required
+@reporting_view
+async def graded_students(request):
+    teacher = request.teacher
+
+    graded = await acached(
+        'graded-students', (teacher.id,),
+        (teacher_results_scope(teacher.id), STUDENTS_SCOPE, REBUILD_SCOPE),
+        lambda: alist(graded_by_teacher(teacher)),
+    )
+
+    grouped_by_subject = {}
+    for item in graded:
+        grouped_by_subject.setdefault(item['subject__name'], []).append(item)
+
+    return render(request, 'graded_students.html', {
+        'grouped_by_subject': grouped_by_subject,
+        'teacher': teacher
+    })
+
+
+# EO: View All Results
+@eo_required
+@reporting_view
+async def view_all_results(request):
+    teacher = request.teacher
+
+    if request.GET.get("download") == "csv":
+        return astreaming_results_csv(Result.objects.all(), request.GET)
+
+    if request.GET.get("download") == "stats":
+        return await astatistics_csv(request.GET)
+
+    filters = {key: request.GET.get(key, '') for key in ('term', 'session', 'class_level')}
+    classes = await aresults_overview(filters)
+
+    # The template's {% cache %} blocks read the cache, so it renders off the event loop
+    return await sync_to_async(render)(request, 'eo_view_results.html', {
+        'classes': classes,
+        'teacher': teacher,
+        'filters': filters,
+        'class_choices': CLASS_CHOICES,
+        'term_choices': TERM_CHOICES,
+    })
+
+
+# EO: one page of a class/subject section (JSON fragment)
+@reporting_view
+async def results_section(request):
+    teacher = request.teacher
+    if not teacher or not teacher.is_eo:
+        return JsonResponse({'error': "Access denied. EO only."}, status=403)
+
+    class_level = request.GET.get('class_level')
+    subject_id = request.GET.get('subject')
+    if not class_level or not subject_id:
+        return JsonResponse({'error': "class_level and subject are required."}, status=400)
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        limit = DEFAULT_PAGE_SIZE
+
+    async def page():
+        rows, next_cursor = await akeyset_page(section_rows(request.GET, subject_id),
+                                               after=request.GET.get('after'), limit=limit)
+        html = render_to_string('eo_result_rows.html', {'results': rows})
+        return {'html': html, 'count': len(rows), 'next': next_cursor}
+
+    term, session = request.GET.get('term', ''), request.GET.get('session', '')
+    try:
+        data = await acached(
+            'results-section', (class_level, subject_id, term or '*', session or '*',
+                                request.GET.get('after', ''), limit),
+            (section_scope(class_level, subject_id, term, session), class_students_scope(class_level),
+             REBUILD_SCOPE),
+            page,
+        )
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse(data)
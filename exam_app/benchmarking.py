@@ -0,0 +1,119 @@
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+import django
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# ---------------------------
+# Helpers shared by the benchmark_* management commands
+# ---------------------------
+@contextmanager
+def isolated_database(verbosity=0):
+    """Run the block against a throwaway test database; db.sqlite3 is never touched."""
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def percentiles(samples, points=(50, 90, 95, 99)):
+    """Nearest-rank percentiles of ``samples`` as {'p50': ..., ...}."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {f'p{p}': None for p in points}
+    last = len(ordered) - 1
+    return {f'p{p}': ordered[min(last, int(round(p / 100 * last)))] for p in points}
+
+
+class Timer:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+
+
+# ---------------------------
+# Request measurement
+# ---------------------------
+def consume(response):
+    """Body size in bytes; streaming bodies are read to the end so their queries count too."""
+    if getattr(response, 'streaming', False):
+        size = sum(len(chunk) for chunk in response.streaming_content)
+        response.close()
+        return size
+    return len(response.content)
+
+
+def measure_request(send, trace_memory=False):
+    """
+    Call ``send()`` (which returns a response) and measure it:
+    {'elapsed': seconds, 'queries': n, 'bytes': n, 'status': code, 'peak': bytes or None}.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries, Timer() as timer:
+        response = send()
+        size = consume(response)
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'elapsed': timer.elapsed, 'queries': len(queries), 'bytes': size,
+        'status': response.status_code, 'peak': peak,
+    }
+
+
+def latency_summary(samples):
+    """Milliseconds: min / mean / max and the usual percentiles."""
+    ms = [s * 1000 for s in samples]
+    summary = {key: round(value, 3) for key, value in percentiles(ms).items()}
+    summary.update(min=round(min(ms), 3), mean=round(sum(ms) / len(ms), 3), max=round(max(ms), 3))
+    return summary
+
+
+def run_metadata(**extra):
+    """Where and what was measured, so two JSON reports can be compared meaningfully."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return dict({
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+    }, **extra)
+
+
+def compare_reports(baseline, current, tolerance=0.2, min_delta_ms=1.0):
+    """
+    Yield (scenario, message, regressed) for every scenario in both reports.
+    A scenario regresses when it runs more queries than before, or when its
+    p50 grows by more than ``tolerance`` (a fraction) and by at least
+    ``min_delta_ms`` (so sub-millisecond jitter on fast pages is ignored).
+    """
+    for name, now in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        old_p50, new_p50 = before['latency_ms']['p50'], now['latency_ms']['p50']
+        change = (new_p50 - old_p50) / old_p50 if old_p50 else 0
+        query_change = now['queries'] - before['queries']
+        regressed = query_change > 0 or (change > tolerance and new_p50 - old_p50 >= min_delta_ms)
+        yield name, f"p50 {old_p50:.1f} -> {new_p50:.1f}ms ({change:+.0%}), queries {before['queries']} -> " \
+                    f"{now['queries']}, bytes {before.get('bytes', 0)} -> {now['bytes']}", regressed
+
+
+def load_report(path):
+    with open(path) as fh:
+        return json.load(fh)
@@ -0,0 +1,170 @@
+import csv
+import tempfile
+from array import array
+from decimal import Decimal
+from .caching import STUDENTS_SCOPE, cached, results_scope
+from .exports import Echo
+from .models import Result
+
+# ---------------------------
+# Class broadsheet (student x subject score matrix)
+# ---------------------------
+# One values_list query fetches every result of a class for a term; the
+# scores are pivoted into one flat array of integer hundredths (row-major,
+# one row per student, MISSING where a student did not take a subject), so a
+# 2,000 x 20 sheet is 40,000 machine integers rather than 40,000 objects.
+# Totals and averages are row reductions over that array, subject averages
+# column reductions, and positions use the same competition ranking as
+# ranking.py ("1, 2, 2, 4").
+
+MISSING = -1
+BROADSHEET_FIELDS = ('student_id', 'student__reg_no', 'student__first_name', 'student__last_name',
+                     'subject_id', 'subject__name', 'total_score')
+BROADSHEET_ORDERING = ('student__last_name', 'student__first_name', 'student_id')
+
+
+def cents(score):
+    return int(Decimal(score) * 100)
+
+
+def competition_ranks(values):
+    """Rank of each value, highest first; equal values share a rank (None values are unranked)."""
+    ordered = sorted((value for value in values if value is not None), reverse=True)
+    first = {}
+    for rank, value in enumerate(ordered, start=1):
+        first.setdefault(value, rank)
+    return [first.get(value) if value is not None else None for value in values]
+
+
+class Broadsheet:
+    def __init__(self, students, subjects, scores):
+        self.students = students    # [(id, reg_no, first_name, last_name)] in display order
+        self.subjects = subjects    # [(id, name)] in display order
+        self.scores = scores        # array('q'): len(students) * len(subjects) hundredths, or MISSING
+        self.width = len(subjects)
+        self.compute()
+
+    @classmethod
+    def build(cls, term, session, class_level):
+        rows = (
+            Result.objects
+            .filter(term=term, session=session, student__class_level=class_level)
+            .order_by(*BROADSHEET_ORDERING)
+            .values_list(*BROADSHEET_FIELDS)
+        )
+        # Rows arrive grouped by student; the subject columns are only known at the end
+        students, subject_names = [], {}
+        row_index, subject_ids, values = array('l'), array('l'), array('q')
+        for student_id, reg_no, first_name, last_name, subject_id, subject_name, total in rows.iterator():
+            if not students or students[-1][0] != student_id:
+                students.append((student_id, reg_no, first_name, last_name))
+            subject_names[subject_id] = subject_name
+            row_index.append(len(students) - 1)
+            subject_ids.append(subject_id)
+            values.append(cents(total))
+
+        subjects = sorted(subject_names.items(), key=lambda item: (item[1], item[0]))
+        column = {subject_id: n for n, (subject_id, _) in enumerate(subjects)}
+        width = len(subjects)
+        scores = array('q', [MISSING]) * (len(students) * width)
+        for row, subject_id, value in zip(row_index, subject_ids, values):
+            scores[row * width + column[subject_id]] = value
+        return cls(students, subjects, scores)
+
+    def row(self, n):
+        return self.scores[n * self.width:(n + 1) * self.width]
+
+    def column(self, n):
+        return self.scores[n::self.width]
+
+    def compute(self):
+        # Row reductions: total, subjects taken, average
+        self.totals, self.counts, self.averages = array('q'), array('l'), []
+        for n in range(len(self.students)):
+            taken = [value for value in self.row(n) if value != MISSING]
+            self.totals.append(sum(taken))
+            self.counts.append(len(taken))
+            self.averages.append(sum(taken) / len(taken) if taken else None)
+        self.positions = competition_ranks(self.averages)
+
+        # Column reductions: subject average over the students who took it
+        self.subject_averages = []
+        for n in range(self.width):
+            taken = [value for value in self.column(n) if value != MISSING]
+            self.subject_averages.append(sum(taken) / len(taken) if taken else None)
+
+    def header(self):
+        return ['Reg No', 'Student'] + [name for _, name in self.subjects] + ['Subjects', 'Total', 'Average',
+                                                                               'Position']
+
+    def lines(self):
+        """Display rows: numbers as Decimals, blanks for subjects not taken."""
+        for n, (_, reg_no, first_name, last_name) in enumerate(self.students):
+            scores = [None if value == MISSING else Decimal(value) / 100 for value in self.row(n)]
+            average = self.averages[n]
+            yield [reg_no, f"{first_name} {last_name}"] + scores + [
+                self.counts[n], Decimal(self.totals[n]) / 100,
+                None if average is None else round(Decimal(average) / 100, 2), self.positions[n],
+            ]
+
+    def footer(self):
+        averages = [None if value is None else round(Decimal(value) / 100, 2) for value in self.subject_averages]
+        return ['', 'Subject average'] + averages + ['', '', '', '']
+
+    def __len__(self):
+        return len(self.students)
+
+
+def class_broadsheet(term, session, class_level):
+    """The Broadsheet for one class and term (cached until its results or students change)."""
+    return cached(
+        'broadsheet', (term, session, class_level),
+        (results_scope(term, session), STUDENTS_SCOPE),
+        lambda: Broadsheet.build(term, session, class_level),
+    )
+
+
+# ---------------------------
+# Broadsheet exports
+# ---------------------------
+def broadsheet_filename(term, session, class_level, extension):
+    return 'broadsheet_{}_{}_{}.{}'.format(class_level, term, session.replace('/', '-'), extension)
+
+
+def iter_broadsheet_csv(sheet):
+    writer = csv.writer(Echo())
+    yield writer.writerow(sheet.header())
+    for line in sheet.lines():
+        yield writer.writerow(['' if value is None else value for value in line])
+    yield writer.writerow(['' if value is None else value for value in sheet.footer()])
+
+
+def write_broadsheet_xlsx(sheet, path, title='Broadsheet'):
+    """
+    Write ``sheet`` to ``path`` (a filename or a binary file) with openpyxl in
+    write-only mode (rows go to disk as they are appended).
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ValueError("XLSX export needs openpyxl installed; download the CSV instead.")
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title[:31])
+    worksheet.append(sheet.header())
+    for line in sheet.lines():
+        worksheet.append([float(value) if isinstance(value, Decimal) else value for value in line])
+    worksheet.append([float(value) if isinstance(value, Decimal) else value for value in sheet.footer()])
+    workbook.save(path)
+    return path
+
+
+def broadsheet_xlsx_file(sheet, title='Broadsheet'):
+    """An open anonymous temporary .xlsx file of ``sheet``, rewound; it is deleted once closed."""
+    fh = tempfile.TemporaryFile(suffix='.xlsx')
+    try:
+        write_broadsheet_xlsx(sheet, fh, title)
+    except BaseException:
+        fh.close()
+        raise
+    fh.seek(0)
+    return fh
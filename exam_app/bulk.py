@@ -0,0 +1,211 @@
+import csv
+import io
+import zipfile
+from decimal import Decimal, InvalidOperation
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from .grading import grade_many
+from .models import Result, Student, Subject, TERM_CHOICES
+from .summaries import ResultState, apply_result_changes
+
+# ---------------------------
+# Bulk result entry
+# ---------------------------
+# Rows are plain dicts with: reg_no (or student_id), subject (id or name),
+# test_score, exam_score, term, session. Everything is validated against data
+# prefetched in a handful of queries, then inserted with one bulk_create.
+
+UPLOAD_COLUMNS = ['reg_no', 'subject', 'test_score', 'exam_score', 'term', 'session']
+
+MAX_SCORE = Decimal('999.99')  # Result.*_score is max_digits=5, decimal_places=2
+TWO_PLACES = Decimal('0.01')
+
+
+class BulkEntryError(Exception):
+    """Raised when any row is invalid; ``errors`` lists (row number, message)."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid row(s)")
+
+
+def parse_score(value):
+    try:
+        score = Decimal(str(value).strip() or '0').quantize(TWO_PLACES)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"'{value}' is not a number")
+    if not score.is_finite():  # NaN gets through quantize() and can't be compared
+        raise ValueError(f"'{value}' is not a number")
+    if score < 0 or score > MAX_SCORE:
+        raise ValueError(f"{score} is out of range")
+    return score
+
+
+def build_results(teacher, rows):
+    """
+    Validate ``rows`` for ``teacher``'s class and return unsaved Result objects.
+    Raises BulkEntryError listing every bad row; nothing is written here.
+    """
+    rows = list(rows)
+    terms = {value for value, _ in TERM_CHOICES}
+
+    # Prefetch everything the rows can refer to
+    reg_nos = {str(row.get('reg_no', '')).strip() for row in rows if row.get('reg_no')}
+    student_ids = {int(row['student_id']) for row in rows if str(row.get('student_id', '')).isdigit()}
+    students = list(
+        Student.objects
+        .filter(class_level=teacher.class_level)
+        .filter(Q(reg_no__in=reg_nos) | Q(id__in=student_ids))
+        .only('id', 'reg_no', 'class_level')
+    )
+    by_reg_no = {s.reg_no: s for s in students}
+    by_id = {s.id: s for s in students}
+
+    subjects = list(Subject.objects.all())
+    subject_by_id = {str(s.id): s for s in subjects}
+    subject_by_name = {s.name.strip().lower(): s for s in subjects}
+
+    sessions = {str(row.get('session', '')).strip() for row in rows}
+    existing = set(
+        Result.objects
+        .filter(student__in=students, session__in=sessions)
+        .values_list('student_id', 'subject_id', 'term', 'session')
+    )
+
+    results, errors, seen = [], [], set()
+    for number, row in enumerate(rows, start=1):
+        if row.get('student_id'):
+            student = by_id.get(int(row['student_id'])) if str(row['student_id']).isdigit() else None
+        else:
+            student = by_reg_no.get(str(row.get('reg_no', '')).strip())
+        subject_key = str(row.get('subject', '')).strip()
+        subject = subject_by_id.get(subject_key) or subject_by_name.get(subject_key.lower())
+        term = str(row.get('term', '')).strip()
+        session = str(row.get('session', '')).strip()
+
+        if student is None:
+            errors.append((number, "Student not found in your class."))
+            continue
+        if subject is None:
+            errors.append((number, f"Unknown subject '{subject_key}'."))
+            continue
+        if term not in terms:
+            errors.append((number, f"Invalid term '{term}'."))
+            continue
+        if not session:
+            errors.append((number, "Session is required."))
+            continue
+        try:
+            test_score = parse_score(row.get('test_score', 0))
+            exam_score = parse_score(row.get('exam_score', 0))
+        except ValueError as exc:
+            errors.append((number, f"Invalid score: {exc}."))
+            continue
+
+        key = (student.id, subject.id, term, session)
+        if key in existing:
+            errors.append((number, f"Result for {student.reg_no} in {subject} for Term {term} ({session}) already exists."))
+            continue
+        if key in seen:
+            errors.append((number, f"Duplicate row for {student.reg_no} in {subject}."))
+            continue
+        seen.add(key)
+
+        results.append(Result(
+            student=student, subject=subject, test_score=test_score, exam_score=exam_score,
+            term=term, session=session, entered_by=teacher,
+        ))
+
+    if errors:
+        raise BulkEntryError(errors)
+    return results
+
+
+def save_results(teacher, rows, batch_size=500):
+    """Validate and insert ``rows`` in a single transaction; returns the created results."""
+    rows = list(rows)
+    results = build_results(teacher, rows)
+    if not results:
+        return []
+
+    # bulk_create skips Result.save(), so totals and grades are filled in here,
+    # one batch per session since each session may have its own grade scale
+    by_session = {}
+    for result in results:
+        result.total_score = result.test_score + result.exam_score
+        by_session.setdefault(result.session, []).append(result)
+    for session, batch in by_session.items():
+        for result, grade in zip(batch, grade_many([r.total_score for r in batch], session)):
+            result.grade = grade
+
+    try:
+        with transaction.atomic():
+            created = Result.objects.bulk_create(results, batch_size=batch_size)
+            apply_result_changes(added=[
+                ResultState(r.student_id, r.student.class_level, r.subject_id, r.term, r.session,
+                            r.total_score, r.grade, r.entered_by_id)
+                for r in created
+            ])
+    except IntegrityError:
+        # Someone saved some of these results after they were validated:
+        # validating again names the rows that clash now
+        build_results(teacher, rows)
+        raise BulkEntryError([(number, "Not saved: a result for this row was saved at the same time.")
+                              for number in range(1, len(rows) + 1)])
+    return created
+
+
+# ---------------------------
+# Spreadsheet parsing
+# ---------------------------
+def read_upload(uploaded_file, defaults=None):
+    """Rows from an uploaded .csv or .xlsx file; ``defaults`` fill missing columns."""
+    name = uploaded_file.name.lower()
+    if name.endswith('.xlsx'):
+        rows = read_xlsx(uploaded_file)
+    elif name.endswith('.csv'):
+        text = io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', newline='')
+        try:
+            rows = list(csv.DictReader(text))
+        except csv.Error as exc:
+            raise ValueError(f"The CSV file could not be read ({exc}).")
+    else:
+        raise ValueError("Upload a .csv or .xlsx file.")
+
+    defaults = {key: value for key, value in (defaults or {}).items() if value}
+    cleaned = []
+    for row in rows:
+        row = {str(k).strip().lower(): v for k, v in row.items() if k}
+        if not any(str(v).strip() for v in row.values() if v is not None):
+            continue  # blank line
+        for key, value in defaults.items():
+            if not row.get(key):
+                row[key] = value
+        cleaned.append(row)
+    return cleaned
+
+
+def read_xlsx(uploaded_file):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ValueError("XLSX upload needs openpyxl installed; upload a CSV instead.")
+    try:
+        workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, OSError):
+        raise ValueError("The file is not a valid .xlsx workbook.")
+    sheet = workbook.active
+    lines = sheet.iter_rows(values_only=True)
+    header = [str(cell or '').strip().lower() for cell in next(lines, [])]
+    rows = [dict(zip(header, (xlsx_value(cell) for cell in line))) for line in lines]
+    workbook.close()
+    return rows
+
+
+def xlsx_value(cell):
+    if cell is None:
+        return ''
+    if isinstance(cell, float) and cell.is_integer():
+        return int(cell)  # "1" typed into a cell comes back as 1.0
+    return cell
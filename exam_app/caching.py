@@ -0,0 +1,186 @@
+import math
+import time
+from itertools import product
+from django.core.cache import cache
+from django.db import transaction
+from .routers import reading_replica, replica_alias, sticky_seconds
+
+# ---------------------------
+# Versioned cache keys
+# ---------------------------
+# Cached report data is stored under keys that embed a version number per
+# "scope" (e.g. the results of one term/session). Writers bump the version
+# instead of hunting down every key, so stale entries simply stop being read
+# and expire on their own. Works with any cache backend that supports incr.
+#
+# A version key that is missing (never set, evicted or cleared) starts again
+# from the clock rather than from 1, so it can't reissue a number that a
+# per-process copy (middleware.local_teachers) still holds entries under.
+
+VERSION_KEY = 'exam_app:version:{scope}'
+BUMPED_KEY = 'exam_app:bumped:{scope}'
+DEFAULT_TIMEOUT = 60 * 60
+
+
+def initial_version():
+    return time.time_ns() // 1000
+
+
+def get_version(scope):
+    key = VERSION_KEY.format(scope=scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, initial_version(), None)
+        version = cache.get(key) or initial_version()
+    return version
+
+
+async def aget_version(scope):
+    key = VERSION_KEY.format(scope=scope)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, initial_version(), None)
+        version = await cache.aget(key) or initial_version()
+    return version
+
+
+def get_versions(scopes):
+    """{scope: version} for many scopes in one cache round trip."""
+    keys = {VERSION_KEY.format(scope=scope): scope for scope in scopes}
+    found = cache.get_many(list(keys))
+    versions = {keys[key]: version for key, version in found.items()}
+    for scope in set(keys.values()) - set(versions):
+        versions[scope] = get_version(scope)
+    return versions
+
+
+async def aget_versions(scopes):
+    keys = {VERSION_KEY.format(scope=scope): scope for scope in scopes}
+    found = await cache.aget_many(list(keys))
+    versions = {keys[key]: version for key, version in found.items()}
+    for scope in set(keys.values()) - set(versions):
+        versions[scope] = await aget_version(scope)
+    return versions
+
+
+def bump_version(*scopes):
+    scopes = set(scopes)
+    for scope in scopes:
+        key = VERSION_KEY.format(scope=scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Never read (or evicted): any value differing from the old one will do
+            cache.set(key, initial_version(), None)
+    if replica_alias():
+        cache.set_many({BUMPED_KEY.format(scope=scope): time.time() for scope in scopes}, DEFAULT_TIMEOUT)
+
+
+def bump_version_on_commit(*scopes):
+    """Bump once the surrounding transaction commits, so readers can't re-cache old rows."""
+    transaction.on_commit(lambda: bump_version(*scopes))
+
+
+# ---------------------------
+# Entries computed from a lagging replica
+# ---------------------------
+# Right after a write, the replica may not have the new rows yet while the
+# bumped version already names a fresh key. An entry computed from the
+# replica within EXAM_REPLICA_STICKY_SECONDS of a bump to one of its scopes
+# is therefore only kept until that window ends, when the replica has caught up.
+
+def lag_timeout(bumped_at, timeout):
+    """``timeout``, cut short to the end of the sticky window after the latest of ``bumped_at``."""
+    if not bumped_at:
+        return timeout
+    left = max(bumped_at) + sticky_seconds() - time.time()
+    if left <= 0:
+        return timeout
+    return math.ceil(left) if timeout is None else min(timeout, math.ceil(left))
+
+
+def entry_timeout(scopes, timeout=DEFAULT_TIMEOUT):
+    """The timeout for an entry over ``scopes`` computed by reads made here and now."""
+    if not reading_replica():
+        return timeout
+    bumped = cache.get_many([BUMPED_KEY.format(scope=scope) for scope in scopes])
+    return lag_timeout(list(bumped.values()), timeout)
+
+
+async def aentry_timeout(scopes, timeout=DEFAULT_TIMEOUT):
+    if not reading_replica():
+        return timeout
+    bumped = await cache.aget_many([BUMPED_KEY.format(scope=scope) for scope in scopes])
+    return lag_timeout(list(bumped.values()), timeout)
+
+
+def format_key(name, parts, scopes, found):
+    versions = '.'.join(str(found[scope]) for scope in scopes)
+    return 'exam_app:{}:{}:v{}'.format(name, ':'.join(str(p) for p in parts), versions)
+
+
+def versioned_key(name, parts, scopes):
+    return format_key(name, parts, scopes, get_versions(scopes))
+
+
+async def aversioned_key(name, parts, scopes):
+    return format_key(name, parts, scopes, await aget_versions(scopes))
+
+
+def cached(name, parts, scopes, compute, timeout=DEFAULT_TIMEOUT):
+    """Return the cached value for (name, parts), computing it on a miss."""
+    key = versioned_key(name, parts, scopes)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, entry_timeout(scopes, timeout))
+    return value
+
+
+async def acached(name, parts, scopes, acompute, timeout=DEFAULT_TIMEOUT):
+    """cached() for async views: ``acompute`` is a coroutine function; cache I/O goes through the async API."""
+    key = await aversioned_key(name, parts, scopes)
+    value = await cache.aget(key)
+    if value is None:
+        value = await acompute()
+        await cache.aset(key, value, await aentry_timeout(scopes, timeout))
+    return value
+
+
+def results_scope(term, session):
+    return f'results:{session}:{term}'
+
+
+STUDENTS_SCOPE = 'students'
+
+# Bumped by full summary rebuilds and regrades, which change many sections at once
+REBUILD_SCOPE = 'results:rebuild'
+
+
+# ---------------------------
+# Fine-grained result scopes
+# ---------------------------
+# Every (class_level, subject, term, session) section has its own scope, and
+# so does every wildcard ('*') combination of those four. A change to one
+# result bumps the 16 scopes that contain it; a reader picks the one scope
+# matching its filters (blank filter = '*'), e.g. the SS1 page for all terms
+# of 2024/2025 reads 'section:SS1:*:2024/2025:*'.
+
+def section_scope(class_level='', subject_id='', term='', session=''):
+    return 'section:{}:{}:{}:{}'.format(class_level or '*', subject_id or '*', session or '*', term or '*')
+
+
+def section_scopes(class_level, subject_id, term, session):
+    """All the scopes a result in this section belongs to."""
+    return [
+        section_scope(*combo)
+        for combo in product((class_level, ''), (subject_id, ''), (term, ''), (session, ''))
+    ]
+
+
+def class_students_scope(class_level):
+    return f'students:{class_level}'
+
+
+def teacher_results_scope(teacher_id):
+    return f'teacher-results:{teacher_id}'
@@ -0,0 +1,31 @@
+from django.conf import settings
+
+# ---------------------------
+# Per-connection database setup
+# ---------------------------
+# Connected to connection_created in apps.py. SQLite gets a write-ahead log
+# (readers never block the writer), a busy timeout so concurrent writers
+# queue instead of failing with "database is locked", and a few pragmas that
+# are safe with WAL. Override or extend them with settings.SQLITE_PRAGMAS.
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 20000,      # ms to wait for a lock before giving up
+    'synchronous': 'NORMAL',    # durable at checkpoints; safe with WAL
+    'cache_size': -64000,       # 64 MB page cache
+    'temp_store': 'MEMORY',
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+def sqlite_pragmas():
+    return dict(SQLITE_PRAGMAS, **getattr(settings, 'SQLITE_PRAGMAS', {}))
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas().items():
+            if value is not None:
+                cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,43 @@
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.contrib import messages
+from django.shortcuts import redirect
+
+# ---------------------------
+# View access decorators (use request.teacher from TeacherMiddleware)
+# ---------------------------
+# Both work on sync and async views; an async view gets an async wrapper.
+
+def teacher_denied(request):
+    if not request.teacher:
+        return redirect('teacher_login')
+    return None
+
+
+def eo_denied(request):
+    if not request.teacher:
+        messages.error(request, "You must log in first.")
+        return redirect('teacher_login')
+    if not request.teacher.is_eo:
+        messages.error(request, "Access denied. EO only.")
+        return redirect('teacher_dashboard')
+    return None
+
+
+def access_check(denied):
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                return denied(request) or await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return denied(request) or view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+teacher_required = access_check(teacher_denied)
+eo_required = access_check(eo_denied)
@@ -0,0 +1,157 @@
+import asyncio
+import csv
+from django.http import HttpResponse, StreamingHttpResponse
+from .queries import SummaryStatistics, filter_results
+from .routers import pin_database
+
+# ---------------------------
+# Streaming CSV export
+# ---------------------------
+CSV_HEADER = ['Student', 'Class', 'Subject', 'Total Score', 'Grade', 'Term', 'Session']
+
+# Flat column list read straight from the cursor (no model instances)
+CSV_FIELDS = (
+    'student__first_name',
+    'student__last_name',
+    'student__class_level',
+    'subject__name',
+    'total_score',
+    'grade',
+    'term',
+    'session',
+)
+
+CSV_ORDERING = ('student__class_level', 'subject__name', 'student__last_name', 'student__first_name')
+
+STATISTICS_HEADER = ['Class', 'Subject', 'Results', 'Average', 'Minimum', 'Maximum', 'Std Dev']
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() hands the encoded line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def iter_results_csv(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield CSV lines for ``queryset`` one row at a time."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+
+    rows = queryset.order_by(*CSV_ORDERING).values_list(*CSV_FIELDS).iterator(chunk_size=chunk_size)
+    for first_name, last_name, class_level, subject, total, grade, term, session in rows:
+        yield writer.writerow([
+            f"{first_name} {last_name}",
+            class_level,
+            subject or '',
+            total,
+            grade,
+            term,
+            session,
+        ])
+
+
+async def aiter_results_csv(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """iter_results_csv() for ASGI: an async generator fed by the async ORM cursor."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+
+    # .values(), not .values_list(): Django's tuple iterable runs its query as
+    # soon as aiterator() asks for it, i.e. on the event loop
+    rows = queryset.order_by(*CSV_ORDERING).values(*CSV_FIELDS).aiterator(chunk_size=chunk_size)
+    async for row in rows:
+        first_name, last_name, class_level, subject, total, grade, term, session = (
+            row[field] for field in CSV_FIELDS
+        )
+        yield writer.writerow([
+            f"{first_name} {last_name}",
+            class_level,
+            subject or '',
+            total,
+            grade,
+            term,
+            session,
+        ])
+
+
+def iter_statistics_csv(statistics):
+    """Yield CSV lines for per-class/subject statistics, with a class total after each class."""
+    yield from statistics_lines(statistics, statistics.by_class(), statistics.by_class_subject())
+
+
+def statistics_lines(statistics, by_class, by_class_subject):
+    writer = csv.writer(Echo())
+    yield writer.writerow(STATISTICS_HEADER)
+
+    by_class = {row[statistics.CLASS]: row for row in by_class}
+    current = None
+    for row in by_class_subject + [None]:
+        class_level = row[statistics.CLASS] if row else None
+        if current is not None and class_level != current:
+            yield writer.writerow(statistics_row(current, 'All subjects', by_class[current]))
+        current = class_level
+        if row:
+            yield writer.writerow(statistics_row(class_level, row[statistics.SUBJECT], row))
+
+
+def statistics_row(class_level, subject, stats):
+    def fmt(value):
+        return '' if value is None else f"{value:.2f}"
+    return [
+        class_level,
+        subject,
+        stats['count'],
+        fmt(stats['average']),
+        fmt(stats['minimum']),
+        fmt(stats['maximum']),
+        fmt(stats['stddev']),
+    ]
+
+
+def export_filename(params, base='all_results'):
+    parts = [base]
+    for key in ('class_level', 'term', 'session'):
+        value = params.get(key)
+        if value:
+            parts.append(value.replace('/', '-'))
+    return '_'.join(parts) + '.csv'
+
+
+def streaming_results_csv(queryset, params, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Build a StreamingHttpResponse for the (filtered) results export."""
+    queryset = pin_database(filter_results(queryset, params))
+    response = StreamingHttpResponse(iter_results_csv(queryset, chunk_size), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(params)}"'
+    return response
+
+
+def astreaming_results_csv(queryset, params, chunk_size=DEFAULT_CHUNK_SIZE):
+    """streaming_results_csv() for async views; ASGI would buffer a sync iterator whole."""
+    queryset = pin_database(filter_results(queryset, params))
+    response = StreamingHttpResponse(aiter_results_csv(queryset, chunk_size), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(params)}"'
+    return response
+
+
+def streaming_statistics_csv(params):
+    """StreamingHttpResponse with the class/subject statistics for the filtered results."""
+    statistics = SummaryStatistics(params=params)
+    statistics.queryset = pin_database(statistics.queryset)
+    response = StreamingHttpResponse(iter_statistics_csv(statistics), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(params, "result_statistics")}"'
+    return response
+
+
+async def astatistics_csv(params):
+    """The statistics export for async views; it is one row per class/subject, so not streamed."""
+    statistics = SummaryStatistics(params=params)
+    by_class, by_class_subject = await asyncio.gather(
+        statistics.agrouped(statistics.CLASS),
+        statistics.agrouped(statistics.CLASS, statistics.SUBJECT, 'subject_id'),
+    )
+    response = HttpResponse(''.join(statistics_lines(statistics, by_class, by_class_subject)),
+                            content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(params, "result_statistics")}"'
+    return response
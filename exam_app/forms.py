@@ -1,5 +1,7 @@
 from django import forms
-from .models import Student, Result, Subject
+from django.urls import reverse
+from django.utils.html import format_html
+from .models import CLASS_CHOICES, JOB_KIND_CHOICES, TERM_CHOICES, Student, Result, Subject
 from django.contrib.auth.hashers import check_password
 from .models import TeacherProfile
 
@@ -8,7 +10,8 @@ from .models import TeacherProfile
 # ---------------------------
 from django import forms
 from django.contrib.auth.hashers import check_password
-from .models import TeacherProfile
+from .models import TeacherProfile, normalize_name
+from .throttle import LoginThrottle, client_ip
 
 class TeacherLoginForm(forms.Form):
     name = forms.CharField(
@@ -18,17 +21,32 @@ class TeacherLoginForm(forms.Form):
         widget=forms.PasswordInput(attrs={'placeholder': 'Password', 'class': 'form-control'})
     )
 
+    def __init__(self, *args, request=None, **kwargs):
+        self.request = request
+        super().__init__(*args, **kwargs)
+
     def clean(self):
         cleaned_data = super().clean()
         name = cleaned_data.get("name")
         password = cleaned_data.get("password")
         if name and password:
+            name_key = normalize_name(name)
+            throttle = LoginThrottle(name_key, client_ip(self.request))
+            wait = throttle.blocked()
+            if wait:
+                minutes = -(-wait // 60)
+                raise forms.ValidationError(
+                    f"Too many login attempts. Try again in {minutes} minute{'s' if minutes != 1 else ''}."
+                )
             try:
-                teacher = TeacherProfile.objects.get(name__iexact=name)
+                teacher = TeacherProfile.objects.get(name_normalized=name_key)
                 if not teacher.check_password(password):
+                    throttle.failed()
                     raise forms.ValidationError("Incorrect password.")
+                throttle.succeeded()
                 cleaned_data['teacher'] = teacher
-            except TeacherProfile.DoesNotExist:
+            except (TeacherProfile.DoesNotExist, TeacherProfile.MultipleObjectsReturned):
+                throttle.failed()
                 raise forms.ValidationError("Teacher not found.")
         return cleaned_data
 
@@ -47,17 +65,53 @@ class StudentForm(forms.ModelForm):
         }
 
 # ---------------------------
-# Result Form
+# Student Autocomplete Widget
 # ---------------------------
+class StudentAutocomplete(forms.Widget):
+    """
+    Hidden student id plus a search box filled from the student_search
+    endpoint; only the selected student is rendered, never the whole class
+    (the choices ModelChoiceField hands it are never iterated).
+    """
+
+    class Media:
+        js = ('js/student_autocomplete.js',)
+
+    def selected_label(self, value):
+        try:
+            pk = int(value)
+        except (TypeError, ValueError):  # nothing picked yet, or a tampered POST
+            return ''
+        student = Student.objects.filter(pk=pk).only('reg_no', 'first_name', 'last_name').first()
+        return str(student) if student else ''
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, attrs)
+        input_id = attrs.get('id') or f'id_{name}'
+        return format_html(
+            '<span class="student-autocomplete" data-url="{}">'
+            '<input type="hidden" name="{}" id="{}" value="{}">'
+            '<input type="search" class="{}" value="{}" placeholder="Reg no or name" autocomplete="off" '
+            'aria-label="Search students">'
+            '<ul class="student-autocomplete-results" hidden></ul>'
+            '</span>',
+            reverse('student_search'), name, input_id, '' if value is None else value,
+            attrs.get('class', ''), self.selected_label(value),
+        )
+
+    def value_from_datadict(self, data, files, name):
+        return data.get(name)
+
+
 # ---------------------------
-# Result Form (Fixed)
+# Result Form
 # ---------------------------
 class ResultForm(forms.ModelForm):
     class Meta:
         model = Result
         fields = ['student', 'subject', 'test_score', 'exam_score', 'term', 'session']
         widgets = {
-            'student': forms.Select(attrs={'class': 'form-control'}),
+            'student': StudentAutocomplete(attrs={'class': 'form-control'}),
             'subject': forms.Select(attrs={'class': 'form-control'}),
             'test_score': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'exam_score': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
@@ -96,3 +150,62 @@ class SubjectForm(forms.ModelForm):
         model = Subject
         fields = ['name']
         widgets = {'name': forms.TextInput(attrs={'class': 'form-control'})}
+
+# ---------------------------
+# Bulk Result Entry Forms
+# ---------------------------
+class BulkResultForm(forms.Form):
+    """Picks the subject / term / session for a whole-class grid."""
+    subject = forms.ModelChoiceField(
+        queryset=Subject.objects.all(),
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    term = forms.ChoiceField(
+        choices=Result._meta.get_field('term').choices,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    session = forms.CharField(
+        max_length=20,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '2024/2025'})
+    )
+
+
+class ResultUploadForm(forms.Form):
+    file = forms.FileField(
+        help_text="CSV or XLSX with columns: reg_no, subject, test_score, exam_score, term, session"
+    )
+    subject = forms.ModelChoiceField(
+        queryset=Subject.objects.all(), required=False,
+        help_text="Used when the file has no subject column",
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    term = forms.ChoiceField(
+        choices=[('', '---------')] + list(Result._meta.get_field('term').choices), required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    session = forms.CharField(
+        max_length=20, required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '2024/2025'})
+    )
+
+
+# ---------------------------
+# Background Job Form (EO dashboard)
+# ---------------------------
+class JobForm(forms.Form):
+    kind = forms.ChoiceField(choices=JOB_KIND_CHOICES, widget=forms.Select(attrs={'class': 'form-control'}))
+    term = forms.ChoiceField(
+        choices=[('', 'Any term')] + list(TERM_CHOICES), required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    session = forms.CharField(
+        max_length=20, required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '2024/2025'})
+    )
+    class_level = forms.ChoiceField(
+        choices=[('', 'All classes')] + list(CLASS_CHOICES), required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+    def params(self):
+        return {key: self.cleaned_data[key] for key in ('term', 'session', 'class_level') if self.cleaned_data[key]}
@@ -0,0 +1,140 @@
+from bisect import bisect_right
+from decimal import Decimal
+from django.db import transaction
+from .caching import bump_version_on_commit, cached
+from .models import GradeBoundary, Result
+from .summaries import rebuild_summaries
+
+try:
+    import numpy as np
+except ImportError:  # batch grading falls back to bisect
+    np = None
+
+# ---------------------------
+# Grading engine
+# ---------------------------
+# A grade scale is a list of (lowest total for the grade, grade). Scales are
+# stored per session in GradeBoundary; rows with a blank session are the
+# school default, and DEFAULT_BOUNDARIES applies when there are none at all.
+
+DEFAULT_BOUNDARIES = [(70, 'A'), (60, 'B'), (50, 'C'), (45, 'D'), (40, 'E'), (0, 'F')]
+
+# Cached scales are versioned like the report caches (caching.py), so a
+# boundary change reaches every process sharing the cache, job workers included
+SCALE_CACHE_TIMEOUT = 60 * 60
+DEFAULT_SCALE_SCOPE = 'grade-scale:default'  # every session without its own boundaries uses it
+
+# Below this many scores plain bisect beats converting to a NumPy array
+NUMPY_THRESHOLD = 256
+
+
+class GradeScale:
+    def __init__(self, boundaries):
+        ordered = sorted((Decimal(str(low)), grade) for low, grade in boundaries)
+        if not ordered:
+            raise ValueError("A grade scale needs at least one boundary.")
+        self.cutoffs = [low for low, _ in ordered]
+        self.grades = [grade for _, grade in ordered]
+
+    @property
+    def boundaries(self):
+        return list(zip(reversed(self.cutoffs), reversed(self.grades)))
+
+    def grade(self, score):
+        """Grade one total score (scores below the lowest boundary get the lowest grade)."""
+        index = bisect_right(self.cutoffs, Decimal(score)) - 1
+        return self.grades[max(index, 0)]
+
+    def grade_many(self, scores):
+        """Grade a sequence of total scores in one pass."""
+        scores = list(scores)
+        if np is not None and len(scores) >= NUMPY_THRESHOLD:
+            # Compare in hundredths so 2dp Decimals never hit float rounding
+            cutoffs = np.array([int(c * 100) for c in self.cutoffs], dtype=np.int64)
+            values = np.array([int(Decimal(s) * 100) for s in scores], dtype=np.int64)
+            indexes = np.maximum(np.searchsorted(cutoffs, values, side='right') - 1, 0)
+            grades = np.array(self.grades, dtype=object)
+            return grades[indexes].tolist()
+        cutoffs, grades = self.cutoffs, self.grades
+        return [grades[max(bisect_right(cutoffs, Decimal(s)) - 1, 0)] for s in scores]
+
+
+def load_boundaries(session):
+    for key in (session, ''):
+        rows = list(GradeBoundary.objects.filter(session=key).values_list('min_score', 'grade'))
+        if rows:
+            return rows
+    return DEFAULT_BOUNDARIES
+
+
+def scale_scope(session):
+    return f'grade-scale:{session}' if session else DEFAULT_SCALE_SCOPE
+
+
+def get_scale(session=''):
+    """The grade scale for ``session``, cached until a GradeBoundary changes."""
+    boundaries = cached(
+        'grade-scale', (session or '-',), (scale_scope(session), DEFAULT_SCALE_SCOPE),
+        lambda: [(str(low), grade) for low, grade in load_boundaries(session or '')],
+        SCALE_CACHE_TIMEOUT,
+    )
+    return GradeScale(boundaries)
+
+
+def clear_scale_cache(*sessions):
+    """Retire the cached scales of ``sessions`` on commit; a blank session is the default scale."""
+    bump_version_on_commit(*(scale_scope(session) for session in sessions or ('',)))
+
+
+def grade_for(total_score, session=''):
+    return get_scale(session).grade(total_score)
+
+
+def grade_many(total_scores, session=''):
+    return get_scale(session).grade_many(total_scores)
+
+
+def regrade_session(session, batch_size=2000, progress=None):
+    """
+    Recompute total_score and grade for every result in ``session`` and write
+    back only the rows that changed, batch_size rows per bulk_update. Each
+    batch commits on its own, so ``progress(checked, total)`` is reported as
+    the regrade goes and an interrupted run can simply be repeated; the
+    summaries are rebuilt once at the end, even when nothing changed this
+    time (an interrupted run may have committed batches without rebuilding).
+    Returns (results checked, results changed).
+    """
+    scale = get_scale(session)
+    results = (
+        Result.objects.filter(session=session)
+        .only('id', 'test_score', 'exam_score', 'total_score', 'grade')
+        .order_by('id')
+    )
+    total = results.count()
+    checked = changed = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(results.filter(id__gt=last_id).select_for_update()[:batch_size])
+            if not batch:
+                break
+            changed += regrade_batch(batch, scale)
+        checked += len(batch)
+        last_id = batch[-1].id
+        if progress:
+            progress(checked, total)
+    if checked:
+        rebuild_summaries(session=session)
+    return checked, changed
+
+
+def regrade_batch(results, scale):
+    totals = [r.test_score + r.exam_score for r in results]
+    dirty = []
+    for result, total, grade in zip(results, totals, scale.grade_many(totals)):
+        if result.total_score != total or result.grade != grade:
+            result.total_score, result.grade = total, grade
+            dirty.append(result)
+    if dirty:
+        Result.objects.bulk_update(dirty, ['total_score', 'grade'])
+    return len(dirty)
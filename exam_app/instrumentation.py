@@ -0,0 +1,195 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('exam_app.instrumentation')
+
+# ---------------------------
+# Per-request query and timing instrumentation
+# ---------------------------
+# Switched on with settings.EXAM_INSTRUMENTATION. When it is off the
+# middleware removes itself at startup (MiddlewareNotUsed), so it costs
+# nothing. When on, every request gets:
+#   X-DB-Queries, X-DB-Time-ms, X-Template-Time-ms, X-Python-Time-ms,
+#   X-Total-Time-ms, Server-Timing and (if any) X-N-Plus-One
+# plus one JSON log line on the exam_app.instrumentation logger.
+# Streamed bodies run their queries after the middleware returns, so they
+# are not included.
+# Queries are counted by an execute wrapper put on every connection as it
+# opens. It finds the request's metrics through a context variable, which
+# sync_to_async copies into its worker thread, so the ORM calls of the async
+# views (EXAM_ASYNC_VIEWS) are counted too, not only those on the request's
+# own thread.
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+
+# IN lists of any length have the same shape
+IN_LIST = re.compile(r'\((?:%s, )*%s\)')
+
+current_metrics = ContextVar('exam_app_request_metrics', default=None)
+
+
+def sql_shape(sql):
+    return IN_LIST.sub('(%s...)', sql)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_sql_time = 0.0
+        self.template_depth = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute_wrapper: time every query and count its shape."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sql_time += elapsed
+            if self.template_depth:  # lazy querysets evaluated by a template
+                self.template_sql_time += elapsed
+            self.queries += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    def repeated(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def summary(self):
+        total = time.perf_counter() - self.started
+        # Queries run while rendering count as database time, not template time
+        template = max(self.template_time - self.template_sql_time, 0)
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.sql_time * 1000, 2),
+            'template_ms': round(template * 1000, 2),
+            'python_ms': round(max(total - self.sql_time - template, 0) * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+        }
+
+
+def count_query(execute, sql, params, many, context):
+    """Execute wrapper on every connection: feeds the current request's metrics, if any."""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_counting(connection, **kwargs):
+    """connection_created receiver; also called for connections that opened earlier."""
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def install_on_open_connections():
+    """Connections are per thread: covers the calling thread's already open ones."""
+    for connection in connections.all(initialized_only=True):
+        install_query_counting(connection)
+
+
+_template_timing_installed = False
+
+
+def install_template_timing():
+    """Time the Django template backend's render(); installed once, only when enabled."""
+    global _template_timing_installed
+    if _template_timing_installed:
+        return
+    from django.template.backends.django import Template
+
+    original_render = Template.render
+
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return original_render(self, context, request)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:  # nested render_to_string calls count once
+                metrics.template_time += time.perf_counter() - started
+
+    Template.render = render
+    _template_timing_installed = True
+
+
+class InstrumentationMiddleware:
+    """Query count, SQL/template/Python time and N+1 detection for every request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'EXAM_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.threshold = getattr(settings, 'EXAM_N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+        install_template_timing()
+        connection_created.connect(install_query_counting, dispatch_uid='exam_app.instrumentation')
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        install_on_open_connections()
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.report(request, response, metrics)
+
+    async def __acall__(self, request):
+        # The thread the views' sync_to_async calls run in may hold connections opened before startup
+        await sync_to_async(install_on_open_connections)()
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.report(request, response, metrics)
+
+    def report(self, request, response, metrics):
+        summary = metrics.summary()
+        repeated = metrics.repeated(self.threshold)
+        response['X-DB-Queries'] = str(summary['queries'])
+        response['X-DB-Time-ms'] = str(summary['db_ms'])
+        response['X-Template-Time-ms'] = str(summary['template_ms'])
+        response['X-Python-Time-ms'] = str(summary['python_ms'])
+        response['X-Total-Time-ms'] = str(summary['total_ms'])
+        response['Server-Timing'] = (
+            f'db;dur={summary["db_ms"]};desc="{summary["queries"]} queries", '
+            f'tpl;dur={summary["template_ms"]}, app;dur={summary["python_ms"]}'
+        )
+        if repeated:
+            response['X-N-Plus-One'] = str(len(repeated))
+
+        logger.info(json.dumps(dict(
+            summary, method=request.method, path=request.path, status=response.status_code,
+            n_plus_one=len(repeated),
+        )))
+        for shape, count in repeated:
+            logger.warning(json.dumps({
+                'event': 'n_plus_one', 'method': request.method, 'path': request.path,
+                'count': count, 'sql': shape,
+            }))
+        return response
@@ -0,0 +1,274 @@
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+from .exports import export_filename, iter_results_csv
+from .grading import clear_scale_cache, regrade_session
+from .models import Job, Result
+from .queries import filter_results
+from .report_cards import generate_report_cards
+from .snapshots import snapshot_filename, write_snapshot
+from .routers import reporting_reads
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Background jobs
+# ---------------------------
+# The EO enqueues a Job row; `manage.py run_jobs` claims and runs it in a
+# thread pool, with the database as the only queue (no broker). A worker
+# claims the oldest queued job with SELECT ... FOR UPDATE SKIP LOCKED (where
+# the backend has it) and then a conditional UPDATE ... WHERE status='queued',
+# so two workers can never both start a job, on SQLite included.
+# Runners write their output under a temporary directory; the file is then
+# stored in Job.result_file and served by the job_download view.
+
+PROGRESS_INTERVAL = 1.0  # seconds between progress writes
+CSV_PROGRESS_ROWS = 5000
+
+JobKind = namedtuple('JobKind', ['run', 'required'])
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+class ProgressReporter:
+    """``progress(done, total)`` callback that writes to the Job row at most every ``interval`` seconds."""
+
+    def __init__(self, job, interval=PROGRESS_INTERVAL):
+        self.job = job
+        self.interval = interval
+        self.last = 0.0
+
+    def __call__(self, done, total=None):
+        now = time.monotonic()
+        if now - self.last < self.interval and (total is None or done < total):
+            return
+        self.last = now
+        # Also the heartbeat: a running job that stops reporting is eventually requeued
+        Job.objects.filter(id=self.job.id).update(progress=done, total=total, heartbeat_at=timezone.now())
+
+
+# Runners: (params, workdir, progress) -> (message, path of the result file or None)
+def run_results_csv(params, workdir, progress):
+    with reporting_reads():
+        queryset = filter_results(Result.objects.all(), params)
+        total = queryset.count()
+        progress(0, total)
+        path = os.path.join(workdir, export_filename(params))
+        with open(path, 'w', newline='') as fh:
+            # The first line is the header
+            for done, line in enumerate(iter_results_csv(queryset)):
+                fh.write(line)
+                if done and done % CSV_PROGRESS_ROWS == 0:
+                    progress(done, total)
+    progress(total, total)
+    return f"{total} results exported", path
+
+
+def run_regrade(params, workdir, progress):
+    # Batches commit one by one, so progress (and the heartbeat) keeps moving
+    session = params['session']
+    clear_scale_cache(session)
+    checked, changed = regrade_session(session, progress=progress)
+    progress(checked, checked)
+    return f"{checked} results checked, {changed} regraded", None
+
+
+def run_report_cards(params, workdir, progress):
+    filename = 'report_cards_{}_{}.zip'.format(params['term'], params['session'].replace('/', '-'))
+    output = os.path.join(workdir, filename)
+    # Rendered in the worker thread: run_jobs --workers already runs jobs side by side
+    stats = generate_report_cards(output, params['term'], params['session'], params.get('class_level') or None,
+                                  workers=0, progress=progress)
+    return f"{stats['rendered']} report cards rendered", output
+
+
+def run_snapshot(params, workdir, progress):
+    session = params['session']
+    with reporting_reads():
+        total = Result.objects.filter(session=session).count()
+    progress(0, total)
+    path = os.path.join(workdir, snapshot_filename(session))
+    rows = write_snapshot(path, session, progress=lambda done: progress(done, total))
+    return f"{rows} results in a columnar snapshot", path
+
+
+JOB_KINDS = {
+    'results_csv': JobKind(run_results_csv, ()),
+    'regrade': JobKind(run_regrade, ('session',)),
+    'report_cards': JobKind(run_report_cards, ('term', 'session')),
+    'snapshot': JobKind(run_snapshot, ('session',)),
+}
+
+
+def enqueue(kind, params, requested_by=None):
+    missing = [name for name in JOB_KINDS[kind].required if not params.get(name)]
+    if missing:
+        raise ValueError(f"{kind} jobs need: {', '.join(missing)}")
+    return Job.objects.create(kind=kind, params=params, requested_by=requested_by)
+
+
+# Claiming
+def requeue_stale(now=None):
+    """Running jobs whose worker stopped reporting: queue them again, or fail them after too many attempts."""
+    now = now or timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING,
+                               heartbeat_at__lt=now - timedelta(seconds=settings.EXAM_JOB_STALE_SECONDS))
+    failed = stale.filter(attempts__gte=settings.EXAM_JOB_MAX_ATTEMPTS).update(
+        status=Job.FAILED, finished_at=now, message="The worker stopped responding.")
+    requeued = stale.update(status=Job.QUEUED, worker='')
+    return requeued, failed
+
+
+def claim_job(worker, kinds=None):
+    """The oldest queued job, now marked running for ``worker``; None if the queue is empty."""
+    queued = Job.objects.filter(status=Job.QUEUED)
+    if kinds:
+        queued = queued.filter(kind__in=kinds)
+    with transaction.atomic():
+        job = queued.order_by('created_at', 'id').select_for_update(skip_locked=True).first()
+        if job is None:
+            return None
+        now = timezone.now()
+        claimed = Job.objects.filter(id=job.id, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1,
+            progress=0, total=None,
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def finish_job(job, status, message, path=None):
+    job.status, job.message, job.finished_at = status, message, timezone.now()
+    if path:
+        with open(path, 'rb') as fh:
+            job.result_file.save(os.path.basename(path), File(fh), save=False)
+    # Only if this worker still owns it: a requeued stale job may have moved on
+    Job.objects.filter(id=job.id, status=Job.RUNNING, worker=job.worker).update(
+        status=job.status, message=job.message, finished_at=job.finished_at, result_file=job.result_file.name,
+    )
+
+
+def run_job(job):
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            message, path = JOB_KINDS[job.kind].run(job.params, workdir, ProgressReporter(job))
+        except Exception as exc:
+            logger.exception("Job %s failed", job.pk)
+            finish_job(job, Job.FAILED, str(exc) or exc.__class__.__name__)
+        else:
+            finish_job(job, Job.SUCCEEDED, message, path)
+    return job
+
+
+# Retention: result files are kept for EXAM_JOB_RETENTION_DAYS after the job finished
+JOB_FILES_DIR = 'jobs'
+SWEEP_INTERVAL = 60 * 60  # seconds between sweeps of a running worker pool
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+def sweep_job_files(now=None):
+    """
+    Delete the result files of jobs that finished more than
+    EXAM_JOB_RETENTION_DAYS ago, and any file under media/jobs/ that old
+    which no job points to (e.g. left by a worker that lost a requeued job).
+    Returns the number of files removed.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=settings.EXAM_JOB_RETENTION_DAYS)
+    removed = 0
+    expired = Job.objects.filter(finished_at__lt=cutoff).exclude(result_file='')
+    for job in expired.only('id', 'result_file'):
+        job.result_file.delete(save=False)
+        Job.objects.filter(id=job.id).update(result_file='')
+        removed += 1
+
+    root = os.path.join(settings.MEDIA_ROOT, JOB_FILES_DIR)
+    kept = {
+        os.path.normpath(name) for name in Job.objects.exclude(result_file='').values_list('result_file', flat=True)
+    }
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            relative = os.path.normpath(os.path.relpath(path, settings.MEDIA_ROOT))
+            if relative not in kept and os.path.getmtime(path) < cutoff.timestamp():
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def maybe_sweep_job_files():
+    """sweep_job_files() at most once per SWEEP_INTERVAL across this process's workers."""
+    global _last_sweep
+    with _sweep_lock:
+        if _last_sweep and time.monotonic() - _last_sweep < SWEEP_INTERVAL:
+            return 0
+        _last_sweep = time.monotonic()
+    removed = sweep_job_files()
+    if removed:
+        logger.info("Removed %s expired job files", removed)
+    return removed
+
+
+def work(stop, poll=1.0, once=False, kinds=None):
+    """One worker loop: claim and run jobs until ``stop`` is set (or, with ``once``, the queue is empty)."""
+    name = worker_name()
+    processed = 0
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            requeue_stale()
+            maybe_sweep_job_files()
+            job = claim_job(name, kinds)
+            if job is None:
+                if once:
+                    break
+                stop.wait(poll)
+                continue
+            logger.info("Running job %s (%s)", job.pk, job.kind)
+            run_job(job)
+            processed += 1
+    finally:
+        connections.close_all()  # this thread's connections
+    return processed
+
+
+# Status for the polling endpoint
+def job_status(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'label': job.get_kind_display(),
+        'params': job.params,
+        'status': job.status,
+        'finished': job.status in Job.FINISHED,
+        'progress': job.progress,
+        'total': job.total,
+        'percent': job.percent,
+        'message': job.message,
+        'created_at': job.created_at.isoformat(),
+        'status_url': reverse('job_status', args=[job.id]),
+        'download_url': reverse('job_download', args=[job.id]) if job.result_file else None,
+    }
+
+
+def recent_jobs(limit=10, kind=None):
+    jobs = Job.objects.all()
+    if kind:
+        jobs = jobs.filter(kind=kind)
+    return list(jobs.order_by('-created_at', '-id')[:limit])
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from exam_app.benchmarking import Timer, isolated_database, latency_summary, measure_request
+from exam_app.models import ClassSubjectSummary, Result, Subject, TeacherProfile
+from exam_app.summaries import rebuild_summaries
+from exam_app.synthetic import TEACHER_PASSWORD, DatasetGenerator, fast_sqlite_writes
+
+EO_NAME = 'Benchmark EO'
+
+
+class Command(BaseCommand):
+    help = "Benchmark the EO analytics page on a throwaway database of generated results (10M by default)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--results', type=int, default=10_000_000, help='Results to generate (about)')
+        parser.add_argument('--subjects-per-student', type=int, default=9)
+        parser.add_argument('--repeat', type=int, default=50, help='Requests per page')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def page(self, client, name, path, repeat):
+        client.get(path)  # warm-up: template compilation, connection setup
+        runs = [measure_request(lambda: client.get(path)) for _ in range(repeat)]
+        if {run['status'] for run in runs} != {200}:
+            raise CommandError(f"{path} answered {sorted({run['status'] for run in runs})}")
+        summary = latency_summary([run['elapsed'] for run in runs])
+        self.stdout.write(self.style.SUCCESS(
+            f"{name:>18}: p50 {summary['p50']:.2f}ms, p95 {summary['p95']:.2f}ms, max {summary['max']:.2f}ms, "
+            f"{max(run['queries'] for run in runs)} queries"
+        ))
+
+    def handle(self, *args, **options):
+        generator = DatasetGenerator(seed=options['seed'], subjects_per_student=options['subjects_per_student'],
+                                     batch_size=20000)
+        per_student = generator.subjects_per_student * len(generator.sessions) * len(generator.terms)
+        students = -(-options['results'] // per_student)
+        session = generator.sessions[-1]
+        with override_settings(ALLOWED_HOSTS=['testserver']), isolated_database():
+            self.stdout.write(f"Generating {students} students ({per_student} results each)...")
+            with fast_sqlite_writes():
+                stats = generator.run(students)
+            self.stdout.write(f"{stats['results']} results in {stats['elapsed']:.1f}s")
+            with Timer() as timer:
+                rebuild_summaries()
+            self.stdout.write(f"rebuild_summaries: {timer.elapsed:.1f}s, "
+                              f"{ClassSubjectSummary.objects.count()} summary rows")
+
+            TeacherProfile.objects.create(name=EO_NAME, password=TEACHER_PASSWORD, is_eo=True)
+            client = Client()
+            if client.post('/login/', {'name': EO_NAME, 'password': TEACHER_PASSWORD}).status_code != 302:
+                raise CommandError("Could not log in as the EO")
+            subject = Subject.objects.order_by('id').first()
+            pages = [
+                ('session', f'/eo/analytics/?session={session}'),
+                ('term', f'/eo/analytics/?session={session}&term=1'),
+                ('class', f'/eo/analytics/?session={session}&class_level=SS1'),
+                ('class + subject', f'/eo/analytics/?session={session}&term=1&class_level=SS1&subject={subject.id}'),
+            ]
+            for name, path in pages:
+                self.page(client, name, path, options['repeat'])
+
+            # Incremental refresh: one edited result updates its summary rows, not a rebuild
+            result = Result.objects.filter(session=session).order_by('id').first()
+            samples = []
+            for n in range(options['repeat']):
+                result.exam_score = 40 + n % 20
+                with Timer() as timer:
+                    result.save()
+                samples.append(timer.elapsed)
+            summary = latency_summary(samples)
+            self.stdout.write(self.style.SUCCESS(
+                f"{'result save':>18}: p50 {summary['p50']:.2f}ms, p95 {summary['p95']:.2f}ms (summaries included)"
+            ))
+            self.page(client, 'session, after', pages[0][1], options['repeat'])
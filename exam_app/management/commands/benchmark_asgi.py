@@ -0,0 +1,181 @@
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from importlib import import_module
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from exam_app.benchmarking import Timer, isolated_database, latency_summary, run_metadata
+from exam_app.models import Subject, TeacherProfile
+from exam_app.summaries import rebuild_summaries
+from exam_app.synthetic import DatasetGenerator, TEACHER_PASSWORD
+
+EO_NAME = 'Benchmark EO'
+TERM, SESSION = '1', '2024/2025'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the read-only views served by WSGI (sync views) and uvicorn (async views) "
+        "under many concurrent connections, on a seeded throwaway database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=300, help='Students in the seeded dataset')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--connections', type=int, default=200, help='Concurrent client connections')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per server and URL')
+        parser.add_argument('--workers', type=int, default=1, help='Server worker processes')
+        parser.add_argument('--threads', type=int, default=8, help='Threads per gunicorn worker (WSGI)')
+        parser.add_argument('--servers', default='wsgi,asgi', help='Comma-separated: wsgi, asgi')
+        parser.add_argument('--port', type=int, default=8765, help='First port to listen on')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds before a request counts as an error')
+        parser.add_argument('--output', default='', help='Write the JSON report here')
+
+    # Dataset and session
+    def seed(self, options):
+        DatasetGenerator(seed=options['seed'], sessions=[SESSION]).run(options['students'])
+        rebuild_summaries()
+        eo = TeacherProfile.objects.create(name=EO_NAME, password=TEACHER_PASSWORD, is_eo=True)
+        teacher = TeacherProfile.objects.get(name='SS1 Teacher 1')
+        subject = Subject.objects.order_by('id').first()
+        filters = f'term={TERM}&session={SESSION}'
+        return [
+            ('teacher_dashboard', teacher, '/teacher/dashboard/'),
+            ('view_students', teacher, '/teacher/view-students/'),
+            ('graded_students', teacher, '/graded-students/'),
+            ('view_all_results', eo, f'/eo/view-results/?{filters}'),
+            ('results_section', eo, f'/eo/view-results/section/?{filters}&class_level=SS1&subject={subject.id}'),
+        ]
+
+    def session_cookie(self, teacher):
+        """A logged-in session, built directly: logging in would only benchmark PBKDF2."""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session['teacher_id'] = teacher.id
+        session.save()
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    # Servers
+    def server_command(self, kind, port, options):
+        if kind == 'asgi':
+            if importlib.util.find_spec('uvicorn') is None:
+                raise CommandError("uvicorn is not installed (pip install uvicorn)")
+            return [sys.executable, '-m', 'uvicorn', 'exam_system.asgi:application', '--port', str(port),
+                    '--workers', str(options['workers']), '--log-level', 'warning', '--no-access-log']
+        if importlib.util.find_spec('gunicorn') is not None:
+            return [sys.executable, '-m', 'gunicorn', 'exam_system.wsgi:application', '--bind', f'127.0.0.1:{port}',
+                    '--workers', str(options['workers']), '--threads', str(options['threads']),
+                    '--log-level', 'warning']
+        self.stderr.write("gunicorn is not installed; using the development server for WSGI "
+                          "(its small listen backlog stalls connects at high concurrency)")
+        return [sys.executable, 'manage.py', 'runserver', str(port), '--noreload', '--skip-checks']
+
+    def start_server(self, kind, port, options):
+        env = dict(os.environ, DJANGO_DB_NAME=connection.settings_dict['NAME'],
+                   DJANGO_ASYNC_VIEWS='1' if kind == 'asgi' else '0')
+        process = subprocess.Popen(self.server_command(kind, port, options), cwd=settings.BASE_DIR, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"The {kind} server exited with status {process.returncode}")
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+                return process
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f"The {kind} server did not start listening on port {port}")
+
+    # Load generation: a minimal HTTP/1.1 client, one request per connection
+    async def fetch(self, port, path, cookie):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            writer.write(
+                f'GET {path} HTTP/1.1\r\nHost: localhost\r\nCookie: {cookie}\r\nConnection: close\r\n\r\n'.encode()
+            )
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        return int(response.split(b' ', 2)[1]), len(response)
+
+    async def load(self, port, path, cookie, total, concurrency, timeout):
+        latencies, statuses, errors = [], {}, 0
+        remaining = iter(range(total))
+
+        async def client():
+            nonlocal errors
+            for _ in remaining:
+                started = time.perf_counter()
+                try:
+                    status, _ = await asyncio.wait_for(self.fetch(port, path, cookie), timeout)
+                except (OSError, ValueError, IndexError, asyncio.TimeoutError):
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        with Timer() as timer:
+            await asyncio.gather(*(client() for _ in range(concurrency)))
+        return {
+            'requests': total,
+            'errors': errors,
+            'status': {str(code): count for code, count in sorted(statuses.items())},
+            'throughput_rps': round(len(latencies) / timer.elapsed, 1),
+            'latency_ms': latency_summary(latencies) if latencies else None,
+        }
+
+    def handle(self, *args, **options):
+        servers = [kind.strip() for kind in options['servers'].split(',') if kind.strip()]
+        if set(servers) - {'wsgi', 'asgi'}:
+            raise CommandError("--servers takes wsgi and/or asgi")
+
+        with isolated_database():
+            if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+                raise CommandError("Set DATABASES['default']['TEST']['NAME'] so the servers can open the test database")
+            self.stdout.write(f"Seeding {options['students']} students...")
+            urls = self.seed(options)
+            cookies = {teacher.id: self.session_cookie(teacher) for _, teacher, _ in urls}
+            # The servers open their own connections; release the test database's locks
+            connection.close()
+
+            report = {
+                'meta': run_metadata(
+                    students=options['students'], seed=options['seed'], connections=options['connections'],
+                    requests=options['requests'], workers=options['workers'],
+                ),
+                'servers': {},
+            }
+            for offset, kind in enumerate(servers):
+                port = options['port'] + offset
+                process = self.start_server(kind, port, options)
+                try:
+                    rows = report['servers'][kind] = {}
+                    for name, teacher, path in urls:
+                        cookie = cookies[teacher.id]
+                        # One untimed round per connection warms the server's caches
+                        asyncio.run(self.load(port, path, cookie, options['connections'], options['connections'],
+                                              options['timeout']))
+                        row = rows[name] = asyncio.run(
+                            self.load(port, path, cookie, options['requests'], options['connections'],
+                                      options['timeout'])
+                        )
+                        latency = row['latency_ms'] or {'p50': 0, 'p99': 0}
+                        self.stdout.write(
+                            f"{kind} {name:>18}: {row['throughput_rps']:8.1f} req/s  p50 {latency['p50']:8.1f}ms  "
+                            f"p99 {latency['p99']:8.1f}ms  status {row['status']}  errors {row['errors']}"
+                        )
+                finally:
+                    process.terminate()
+                    process.wait(timeout=30)
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
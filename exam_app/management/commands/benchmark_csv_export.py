@@ -0,0 +1,77 @@
+import csv
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from exam_app.exports import CSV_HEADER, CSV_ORDERING, DEFAULT_CHUNK_SIZE, streaming_results_csv
+from exam_app.models import Result
+from exam_app.queries import filter_results
+
+
+def legacy_results_csv(queryset):
+    """The original export: one HttpResponse built from model instances."""
+    results_qs = queryset.select_related('student', 'subject').order_by(*CSV_ORDERING)
+    response = HttpResponse(content_type='text/csv')
+    writer = csv.writer(response)
+    writer.writerow(CSV_HEADER)
+    for r in results_qs:
+        writer.writerow([
+            f"{r.student.first_name} {r.student.last_name}",
+            r.student.class_level,
+            r.subject.name if r.subject else '',
+            r.total_score,
+            r.grade,
+            r.term,
+            r.session
+        ])
+    return response
+
+
+class Command(BaseCommand):
+    help = "Compare memory and throughput of the legacy and streaming CSV exports"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', default='')
+        parser.add_argument('--session', default='')
+        parser.add_argument('--class-level', dest='class_level', default='')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per export path')
+
+    def measure(self, build):
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = build()
+        first_byte = None
+        size = 0
+        if response.streaming:
+            for chunk in response.streaming_content:
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                size += len(chunk)
+        else:
+            first_byte = time.perf_counter() - started
+            size = len(response.content)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {'elapsed': elapsed, 'first_byte': first_byte or elapsed, 'peak': peak, 'bytes': size}
+
+    def handle(self, *args, **options):
+        params = {key: options[key] for key in ('term', 'session', 'class_level')}
+        queryset = Result.objects.all()
+        # Legacy path has no filters, so apply them up front for a fair comparison
+        rows = filter_results(queryset, params).count()
+        self.stdout.write(f"Exporting {rows} results ({options['repeat']} runs each)")
+
+        paths = {
+            'legacy': lambda: legacy_results_csv(filter_results(queryset, params)),
+            'streaming': lambda: streaming_results_csv(queryset, params, options['chunk_size']),
+        }
+        for name, build in paths.items():
+            runs = [self.measure(build) for _ in range(options['repeat'])]
+            best = min(runs, key=lambda r: r['elapsed'])
+            rate = rows / best['elapsed'] if best['elapsed'] else 0
+            self.stdout.write(self.style.SUCCESS(
+                f"{name:>9}: {best['elapsed']:.3f}s total, {best['first_byte'] * 1000:.1f}ms to first byte, "
+                f"{rate:,.0f} rows/s, peak {best['peak'] / 1024 / 1024:.1f} MiB, {best['bytes']:,} bytes"
+            ))
@@ -0,0 +1,58 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from exam_app.benchmarking import Timer, isolated_database, percentiles
+from exam_app.models import TeacherProfile
+
+TEACHER_NAME = 'Benchmark Teacher'
+PASSWORD = 'correct horse battery staple'
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent logins (valid logins and a wrong-password storm) on a throwaway database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=200, help='Logins per scenario')
+        parser.add_argument('--concurrency', type=int, default=16, help='Client threads')
+        parser.add_argument('--iterations', type=int, default=0,
+                            help='PBKDF2 iterations for this run (default: PASSWORD_PBKDF2_ITERATIONS)')
+
+    def attempt(self, args):
+        password, ip = args
+        client = Client(REMOTE_ADDR=ip)
+        started = time.perf_counter()
+        response = client.post('/login/', {'name': TEACHER_NAME.lower(), 'password': password})
+        elapsed = time.perf_counter() - started
+        connections.close_all()
+        return elapsed, response.status_code == 302
+
+    def scenario(self, name, requests, concurrency):
+        cache.clear()
+        with Timer() as timer, ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(self.attempt, requests))
+        latencies = [elapsed for elapsed, _ in outcomes]
+        ok = sum(1 for _, success in outcomes if success)
+        stats = percentiles(latencies)
+        self.stdout.write(self.style.SUCCESS(
+            f"{name:>14}: {len(requests) / timer.elapsed:7.1f} logins/s, {ok}/{len(requests)} succeeded, "
+            + ", ".join(f"{p} {value * 1000:.1f}ms" for p, value in stats.items())
+        ))
+
+    def handle(self, *args, **options):
+        iterations = options['iterations'] or getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', None)
+        attempts, concurrency = options['attempts'], options['concurrency']
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=iterations, ALLOWED_HOSTS=['testserver']), \
+                isolated_database():
+            TeacherProfile.objects.create(name=TEACHER_NAME, password=PASSWORD, class_level='SS1')
+            self.stdout.write(
+                f"{attempts} logins per scenario, {concurrency} threads, "
+                f"PBKDF2 iterations: {iterations or 'Django default'}"
+            )
+            # Every attempt is valid: PBKDF2 cost dominates
+            self.scenario('valid', [(PASSWORD, f'10.0.{i % 250}.1') for i in range(attempts)], concurrency)
+            # Wrong password from a handful of IPs: the limiter should cut PBKDF2 work off early
+            self.scenario('wrong-password', [('wrong', f'10.1.{i % 4}.1') for i in range(attempts)], concurrency)
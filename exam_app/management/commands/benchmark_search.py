@@ -0,0 +1,60 @@
+import random
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from exam_app.benchmarking import Timer, isolated_database, latency_summary
+from exam_app.models import CLASS_CHOICES, Student
+from exam_app.search import DEFAULT_LIMIT, search_students
+from exam_app.synthetic import FIRST_NAMES, LAST_NAMES, DatasetGenerator, fast_sqlite_writes
+
+
+class Command(BaseCommand):
+    help = "Benchmark student autocomplete search on a throwaway database of generated students"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1_000_000, help='Students to generate')
+        parser.add_argument('--queries', type=int, default=500, help='Searches per scenario')
+        parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help='Results per search')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--compare-icontains', action='store_true',
+                            help='Also time the old icontains search (a full scan per query)')
+
+    def prefixes(self, rnd, total, count):
+        """What people type: reg number fragments, first names, surnames, partial full names."""
+        makers = [
+            lambda: f'STU{rnd.randint(1, total):07d}'[:rnd.randint(4, 10)],
+            lambda: rnd.choice(FIRST_NAMES)[:rnd.randint(2, 6)],
+            lambda: rnd.choice(LAST_NAMES)[:rnd.randint(2, 6)],
+            lambda: f'{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)[:2]}',
+        ]
+        return [rnd.choice(makers)() for _ in range(count)]
+
+    def scenario(self, name, prefixes, search):
+        samples, found = [], 0
+        for prefix in prefixes:
+            with Timer() as timer:
+                found += len(search(prefix))
+            samples.append(timer.elapsed)
+        summary = latency_summary(samples)
+        self.stdout.write(self.style.SUCCESS(
+            f"{name:>18}: p50 {summary['p50']:.2f}ms, p95 {summary['p95']:.2f}ms, p99 {summary['p99']:.2f}ms, "
+            f"max {summary['max']:.2f}ms, {found / len(prefixes):.1f} results/search"
+        ))
+
+    def handle(self, *args, **options):
+        total, limit = options['students'], options['limit']
+        rnd = random.Random(options['seed'])
+        with isolated_database():
+            self.stdout.write(f"Generating {total} students...")
+            with fast_sqlite_writes():
+                DatasetGenerator(seed=options['seed'], results=False, batch_size=20000).run(total)
+            prefixes = self.prefixes(rnd, total, options['queries'])
+            class_level = CLASS_CHOICES[0][0]
+
+            self.scenario('prefix (EO)', prefixes, lambda q: search_students(q, limit=limit))
+            self.scenario('prefix (teacher)', prefixes,
+                          lambda q: search_students(q, class_level=class_level, limit=limit))
+            if options['compare_icontains']:
+                def icontains(q):
+                    condition = Q(reg_no__icontains=q) | Q(first_name__icontains=q) | Q(last_name__icontains=q)
+                    return list(Student.objects.filter(condition).values('id')[:limit])
+                self.scenario('icontains', prefixes, icontains)
@@ -0,0 +1,234 @@
+import json
+import tempfile
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from exam_app.benchmarking import (
+    compare_reports, isolated_database, latency_summary, load_report, measure_request, run_metadata,
+)
+from exam_app.jobs import claim_job, enqueue, run_job
+from exam_app.models import Result, Student, Subject, TeacherProfile
+from exam_app.summaries import rebuild_summaries
+from exam_app.synthetic import DatasetGenerator, TEACHER_PASSWORD
+
+# One benchmarked request. ``data(n)`` builds the payload for iteration n, so
+# POSTs that create rows never collide; ``repeat`` caps slow scenarios.
+Scenario = namedtuple('Scenario', ['name', 'role', 'method', 'path', 'data', 'repeat'], defaults=(None, None))
+
+EO_NAME = 'Benchmark EO'
+TERM, SESSION = '1', '2024/2025'
+
+
+class Command(BaseCommand):
+    help = "Benchmark every exam_app URL on a seeded throwaway database and write a JSON report"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=300, help='Students in the seeded dataset')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per URL')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per URL first')
+        parser.add_argument('--only', default='', help='Comma-separated scenario names to run')
+        parser.add_argument('--output', default='', help='Write the JSON report here')
+        parser.add_argument('--compare', default='', help='Baseline JSON report to diff against')
+        parser.add_argument('--production', action='store_true',
+                            help='Use the production rendering profile: cached template loader and gzip')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed p50 slowdown vs the baseline, as a fraction (default 0.2)')
+
+    # Dataset and clients
+    def seed(self, options):
+        generator = DatasetGenerator(seed=options['seed'], sessions=[SESSION])
+        stats = generator.run(options['students'])
+        rebuild_summaries()
+        TeacherProfile.objects.create(name=EO_NAME, password=TEACHER_PASSWORD, is_eo=True)
+        self.teacher = TeacherProfile.objects.get(name='SS1 Teacher 1')
+        self.class_students = list(
+            Student.objects.filter(class_level='SS1').order_by('id').values_list('id', 'reg_no')
+        )
+        self.subject = Subject.objects.order_by('id').first()
+        # A finished export for the job status and download scenarios
+        eo = TeacherProfile.objects.get(name=EO_NAME)
+        enqueue('results_csv', {'term': TERM, 'session': SESSION, 'class_level': 'SS1'}, requested_by=eo)
+        self.job = run_job(claim_job('benchmark'))
+        return stats
+
+    def client(self):
+        # A browser's Accept-Encoding, so the production profile's responses are counted compressed
+        return Client(raise_request_exception=False, headers={'Accept-Encoding': 'gzip, deflate, br'})
+
+    def logged_in(self, name):
+        client = self.client()
+        response = client.post('/login/', {'name': name, 'password': TEACHER_PASSWORD})
+        if response.status_code != 302:
+            raise CommandError(f"Could not log in as {name}")
+        return client
+
+    def clients(self):
+        teacher = self.logged_in(self.teacher.name)
+        eo = self.logged_in(EO_NAME)
+        return {
+            'teacher': lambda: teacher,
+            'eo': lambda: eo,
+            'anonymous': self.client,
+            # Sessions live on the server: logging out ends them, so each logout gets its own login
+            'teacher-session': lambda: self.logged_in(self.teacher.name),
+        }
+
+    # Payloads
+    def result_rows(self, n, count=20):
+        return [
+            {'reg_no': reg_no, 'subject': self.subject.id, 'test_score': 20, 'exam_score': 50,
+             'term': TERM, 'session': f'API{n:05d}'}
+            for _, reg_no in self.class_students[:count]
+        ]
+
+    def upload_file(self, n):
+        lines = ['reg_no,subject,test_score,exam_score,term,session']
+        lines += [f"{row['reg_no']},{row['subject']},15,45,{TERM},UP{n:05d}" for row in self.result_rows(n)]
+        return {'file': SimpleUploadedFile('results.csv', '\n'.join(lines).encode(), content_type='text/csv')}
+
+    def grid(self, n):
+        data = {'subject': self.subject.id, 'term': TERM, 'session': f'GRID{n:05d}'}
+        for student_id, _ in self.class_students:
+            data[f'test_{student_id}'] = '18'
+            data[f'exam_{student_id}'] = '52'
+        return data
+
+    def scenarios(self):
+        section = f'class_level=SS1&subject={self.subject.id}&term={TERM}&session={SESSION}'
+        filters = f'term={TERM}&session={SESSION}&class_level=SS1'
+        student_id = self.class_students[0][0]
+        return [
+            Scenario('login_page', 'anonymous', 'get', '/login/'),
+            Scenario('login_post', 'anonymous', 'post', '/login/',
+                     lambda n: {'name': self.teacher.name, 'password': TEACHER_PASSWORD}),
+            Scenario('logout', 'teacher-session', 'get', '/logout/'),
+            Scenario('teacher_dashboard', 'teacher', 'get', '/teacher/dashboard/'),
+            Scenario('add_student_page', 'teacher', 'get', '/teacher/add-student/'),
+            Scenario('add_student_post', 'teacher', 'post', '/teacher/add-student/',
+                     lambda n: {'first_name': 'Bench', 'last_name': 'Mark', 'reg_no': f'BENCH{n:06d}'}),
+            Scenario('view_students', 'teacher', 'get', '/teacher/view-students/'),
+            Scenario('input_results_page', 'teacher', 'get', '/teacher/input-results/'),
+            Scenario('input_results_post', 'teacher', 'post', '/teacher/input-results/',
+                     lambda n: {'student': student_id, 'subject': self.subject.id, 'test_score': '20',
+                                'exam_score': '50', 'term': TERM, 'session': f'IN{n:05d}'}),
+            Scenario('bulk_input_page', 'teacher', 'get',
+                     f'/teacher/input-results/bulk/?subject={self.subject.id}&term={TERM}&session={SESSION}'),
+            Scenario('bulk_input_post', 'teacher', 'post', '/teacher/input-results/bulk/', self.grid),
+            Scenario('upload_results_page', 'teacher', 'get', '/teacher/upload-results/'),
+            Scenario('upload_results_post', 'teacher', 'post', '/teacher/upload-results/', self.upload_file),
+            Scenario('bulk_results_api', 'teacher', 'json', '/api/results/bulk/',
+                     lambda n: {'rows': self.result_rows(n)}),
+            Scenario('graded_students', 'teacher', 'get', '/graded-students/'),
+            Scenario('eo_dashboard', 'eo', 'get', '/eo/dashboard/'),
+            Scenario('view_all_results', 'eo', 'get', '/eo/view-results/'),
+            Scenario('view_all_results_csv', 'eo', 'get', '/eo/view-results/?download=csv'),
+            Scenario('view_all_results_stats', 'eo', 'get', '/eo/view-results/?download=stats'),
+            Scenario('results_section', 'eo', 'get', f'/eo/view-results/section/?{section}'),
+            Scenario('compile_results', 'eo', 'get', f'/eo/compile-results/?{filters}'),
+            Scenario('analytics', 'eo', 'get', f'/eo/analytics/?session={SESSION}'),
+            Scenario('analytics_filtered', 'eo', 'get',
+                     f'/eo/analytics/?session={SESSION}&term={TERM}&class_level=SS1&subject={self.subject.id}'),
+            Scenario('broadsheet', 'eo', 'get', f'/eo/broadsheet/?{filters}'),
+            Scenario('broadsheet_csv', 'eo', 'get', f'/eo/broadsheet/?{filters}&download=csv'),
+            Scenario('broadsheet_xlsx', 'eo', 'get', f'/eo/broadsheet/?{filters}&download=xlsx', repeat=5),
+            Scenario('student_search_teacher', 'teacher', 'get', '/students/search/?q=ad'),
+            Scenario('student_search_eo', 'eo', 'get', '/students/search/?q=ok'),
+            Scenario('job_enqueue', 'eo', 'post', '/eo/jobs/',
+                     lambda n: {'kind': 'results_csv', 'term': TERM, 'session': SESSION}),
+            Scenario('job_status', 'eo', 'get', f'/eo/jobs/{self.job.id}/'),
+            Scenario('job_download', 'eo', 'get', f'/eo/jobs/{self.job.id}/download/'),
+            Scenario('report_cards_page', 'eo', 'get', '/eo/report-cards/'),
+            Scenario('report_cards_enqueue', 'eo', 'post', '/eo/report-cards/',
+                     lambda n: {'term': TERM, 'session': SESSION, 'class_level': 'SS1'}),
+        ]
+
+    # Running
+    def send(self, client, scenario, n):
+        data = scenario.data(n) if scenario.data else None
+        if scenario.method == 'get':
+            return lambda: client.get(scenario.path)
+        if scenario.method == 'json':
+            return lambda: client.post(scenario.path, json.dumps(data), content_type='application/json')
+        return lambda: client.post(scenario.path, data or {})
+
+    def run_scenario(self, client_for, scenario, options):
+        repeat = min(options['repeat'], scenario.repeat or options['repeat'])
+        runs, n = [], 0
+        for i in range(options['warmup'] + repeat):
+            n += 1
+            run = measure_request(self.send(client_for[scenario.role](), scenario, n))
+            if i >= options['warmup']:
+                runs.append(run)
+        n += 1
+        # Peak memory from one extra run: tracemalloc would distort the timings
+        traced = measure_request(self.send(client_for[scenario.role](), scenario, n), trace_memory=True)
+        return {
+            'method': scenario.method.upper() if scenario.method != 'json' else 'POST',
+            'path': scenario.path,
+            'status': sorted({run['status'] for run in runs}),
+            'repeat': repeat,
+            'latency_ms': latency_summary([run['elapsed'] for run in runs]),
+            'queries': max(run['queries'] for run in runs),
+            'bytes': max(run['bytes'] for run in runs),
+            'peak_kib': round(traced['peak'] / 1024, 1),
+        }
+
+    def profile_settings(self, options):
+        overrides = {'ALLOWED_HOSTS': ['testserver']}
+        if options['production']:
+            # Static storage stays as it is: the manifest only exists after collectstatic
+            templates = [dict(settings.TEMPLATES[0], APP_DIRS=False,
+                              OPTIONS=dict(settings.TEMPLATES[0]['OPTIONS'],
+                                           loaders=settings.PRODUCTION_TEMPLATE_LOADERS))]
+            middleware = [name for name in settings.MIDDLEWARE if name not in settings.PRODUCTION_MIDDLEWARE]
+            overrides.update(TEMPLATES=templates,
+                             MIDDLEWARE=middleware[:1] + settings.PRODUCTION_MIDDLEWARE + middleware[1:])
+        return overrides
+
+    def handle(self, *args, **options):
+        only = {name.strip() for name in options['only'].split(',') if name.strip()}
+        # Job result files go to a scratch MEDIA_ROOT, not the real media/
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, **self.profile_settings(options)), isolated_database():
+            cache.clear()
+            self.stdout.write(f"Seeding {options['students']} students...")
+            stats = self.seed(options)
+            client_for = self.clients()
+            report = {
+                'meta': run_metadata(
+                    students=stats['students'], results=Result.objects.count(), seed=options['seed'],
+                    repeat=options['repeat'], warmup=options['warmup'], production=options['production'],
+                ),
+                'scenarios': {},
+            }
+            for scenario in self.scenarios():
+                if only and scenario.name not in only:
+                    continue
+                row = self.run_scenario(client_for, scenario, options)
+                report['scenarios'][scenario.name] = row
+                latency = row['latency_ms']
+                self.stdout.write(
+                    f"{scenario.name:>24}: p50 {latency['p50']:8.2f}ms  p95 {latency['p95']:8.2f}ms  "
+                    f"{row['queries']:4d} queries  {row['bytes']:9d} bytes  peak {row['peak_kib']:9.1f} KiB  "
+                    f"status {row['status']}"
+                )
+            cache.clear()
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+        if options['compare']:
+            regressions = 0
+            for name, message, regressed in compare_reports(load_report(options['compare']), report,
+                                                            options['tolerance']):
+                style = self.style.ERROR if regressed else self.style.SUCCESS
+                self.stdout.write(style(f"{name:>24}: {message}"))
+                regressions += regressed
+            if regressions:
+                raise CommandError(f"{regressions} scenario(s) regressed against {options['compare']}")
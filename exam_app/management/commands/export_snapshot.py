@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from exam_app.snapshots import DEFAULT_CHUNK_SIZE, load_snapshot, snapshot_filename, write_snapshot
+
+
+class Command(BaseCommand):
+    help = "Write one session's results as a columnar snapshot (Arrow IPC with pyarrow, else uncompressed .npz)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session', required=True, help='e.g. 2024/2025')
+        parser.add_argument('--format', dest='fmt', default='auto', choices=['auto', 'arrow', 'npz'],
+                            help='auto: Arrow when pyarrow is installed, otherwise npz')
+        parser.add_argument('--output', default='', help='File path (default: results_<session>.<format>)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows per cursor fetch')
+
+    def progress(self, rows):
+        self.stdout.write(f"  {rows} rows", ending='\r')
+        self.stdout.flush()
+
+    def handle(self, *args, **options):
+        extension = None if options['fmt'] == 'auto' else options['fmt']
+        output = options['output'] or snapshot_filename(options['session'], extension)
+        started = time.perf_counter()
+        try:
+            rows = write_snapshot(output, options['session'], options['chunk_size'], progress=self.progress)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+        with load_snapshot(output) as snapshot:
+            columns = ', '.join(snapshot.manifest['columns'])
+        self.stdout.write(self.style.SUCCESS(f"{rows} results written to {output} in {elapsed:.1f}s ({columns})"))
@@ -0,0 +1,61 @@
+import os
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+from exam_app.models import CLASS_CHOICES, TERM_CHOICES
+from exam_app.report_cards import DEFAULT_CHUNK_SIZE, generate_report_cards
+
+
+class Command(BaseCommand):
+    help = "Render a report card for every student in a term into a zip (resumable)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', required=True, choices=[value for value, _ in TERM_CHOICES])
+        parser.add_argument('--session', required=True, help='e.g. 2024/2025')
+        parser.add_argument('--class-level', dest='class_level', default='',
+                            choices=[''] + [value for value, _ in CLASS_CHOICES])
+        parser.add_argument('--format', dest='fmt', default='html', choices=['html', 'pdf'])
+        parser.add_argument('--output', default='', help='Zip path (default: report_cards_<term>_<session>.zip)')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Rendering processes (default: CPU count, 0 = render in this process)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--restart', action='store_true', help='Ignore any previous partial run')
+        parser.add_argument('--benchmark', action='store_true',
+                            help='Render into a throwaway zip with 0 and --workers processes and report cards/s')
+
+    def progress(self, done, total):
+        self.stdout.write(f"  {done}/{total} cards", ending='\r')
+        self.stdout.flush()
+
+    def run(self, output, options, workers, restart):
+        try:
+            return generate_report_cards(
+                output, options['term'], options['session'], options['class_level'] or None,
+                fmt=options['fmt'], workers=workers, chunk_size=options['chunk_size'],
+                restart=restart, progress=self.progress,
+            )
+        except (RuntimeError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            with tempfile.TemporaryDirectory() as tmp:
+                for workers in (0, options['workers']):
+                    stats = self.run(os.path.join(tmp, f'bench_{workers}.zip'), options, workers, True)
+                    self.stdout.write('')
+                    label = 'in-process' if workers == 0 else f"{workers or os.cpu_count()} workers"
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{label:>12}: {stats['rendered']} cards in {stats['elapsed']:.2f}s "
+                        f"({stats['rate']:.1f} cards/s)"
+                    ))
+            return
+
+        output = options['output'] or 'report_cards_{}_{}.zip'.format(
+            options['term'], options['session'].replace('/', '-'))
+        stats = self.run(output, options, options['workers'], options['restart'])
+        self.stdout.write('')
+        if stats['skipped']:
+            self.stdout.write(f"Resumed: {stats['skipped']} cards were already done")
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['rendered']} cards rendered in {stats['elapsed']:.2f}s "
+            f"({stats['rate']:.1f} cards/s) -> {stats['output']}"
+        ))
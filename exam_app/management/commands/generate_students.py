@@ -1,52 +1,66 @@
-import random
-from django.core.management.base import BaseCommand
-from exam_app.models import Student, TeacherProfile
+from django.core.management.base import BaseCommand, CommandError
+from exam_app.models import TERM_CHOICES, Student
+from exam_app.summaries import rebuild_summaries
+from exam_app.synthetic import DEFAULT_SESSIONS, SUBJECT_NAMES, DatasetGenerator, fast_sqlite_writes
 
-FIRST_NAMES = ["John", "Jane", "Michael", "Sarah", "David", "Emily", "Daniel", "Laura", "James", "Olivia"]
-LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Miller", "Davis", "Garcia", "Rodriguez", "Wilson"]
-CLASS_CHOICES = ['SS1', 'SS2', 'SS3']
 
 class Command(BaseCommand):
-    help = "Generate random students"
+    help = "Generate a reproducible synthetic dataset: teachers, subjects, students and their results"
 
     def add_arguments(self, parser):
-        parser.add_argument(
-            '--total',
-            type=int,
-            default=1000,  # safe default
-            help='Total number of students to generate'
-        )
+        parser.add_argument('--total', type=int, default=1000, help='Number of students to generate')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; same seed, same dataset')
+        parser.add_argument('--prefix', default='STU', help='Registration number prefix')
+        parser.add_argument('--teachers-per-class', type=int, default=2)
+        parser.add_argument('--subjects', type=int, default=len(SUBJECT_NAMES), help='Subjects offered')
+        parser.add_argument('--subjects-per-student', type=int, default=9)
+        parser.add_argument('--sessions', default=','.join(DEFAULT_SESSIONS), help='Comma-separated sessions')
+        parser.add_argument('--terms', default='1,2,3', help='Comma-separated terms')
+        parser.add_argument('--no-results', action='store_true', help='Only create students')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Students per transaction')
+        parser.add_argument('--skip-summaries', action='store_true',
+                            help='Do not rebuild summary tables afterwards (run rebuild_summaries later)')
+        parser.add_argument('--fast', action='store_true',
+                            help='SQLite only: WAL journal and synchronous=OFF during the load')
 
     def handle(self, *args, **options):
-        total = options['total']
-        students = []
-
-        for i in range(total):
-            first_name = random.choice(FIRST_NAMES)
-            last_name = random.choice(LAST_NAMES)
-            reg_no = f"STU{str(i+1).zfill(7)}"
-            class_level = random.choice(CLASS_CHOICES)
-
-            # Optional: assign a random teacher of that class
-            teacher_qs = TeacherProfile.objects.filter(class_level=class_level)
-            teacher = random.choice(teacher_qs) if teacher_qs.exists() else None
-
-            students.append(Student(
-                first_name=first_name,
-                last_name=last_name,
-                reg_no=reg_no,
-                class_level=class_level,
-                teacher=teacher
-            ))
-
-            # Bulk insert in chunks of 10k to avoid memory issues
-            if len(students) >= 10000:
-                Student.objects.bulk_create(students)
-                students = []
-                self.stdout.write(self.style.SUCCESS(f'{i+1} students added...'))
-
-        # Insert remaining students
-        if students:
-            Student.objects.bulk_create(students)
-
-        self.stdout.write(self.style.SUCCESS(f'Total {total} students generated successfully!'))
+        prefix = options['prefix']
+        terms = [t.strip() for t in options['terms'].split(',') if t.strip()]
+        # Rows go in with executemany, past model validation, so check the terms here
+        unknown = [t for t in terms if t not in dict(TERM_CHOICES)]
+        if unknown or not terms:
+            raise CommandError(f"--terms must be among {', '.join(dict(TERM_CHOICES))}; got {options['terms']!r}.")
+        if Student.objects.filter(reg_no__startswith=prefix).exists():
+            raise CommandError(f"Students with the '{prefix}' prefix already exist; pick another --prefix.")
+
+        generator = DatasetGenerator(
+            seed=options['seed'],
+            teachers_per_class=options['teachers_per_class'],
+            subjects=options['subjects'],
+            subjects_per_student=options['subjects_per_student'],
+            sessions=[s.strip() for s in options['sessions'].split(',') if s.strip()],
+            terms=terms,
+            results=not options['no_results'],
+            prefix=prefix,
+            batch_size=options['batch_size'],
+        )
+
+        def progress(stats):
+            rate = stats['results'] / stats['elapsed'] if stats['elapsed'] else 0
+            self.stdout.write(
+                f"{stats['students']} students, {stats['results']} results ({rate:,.0f} results/s)"
+            )
+
+        if options['fast']:
+            with fast_sqlite_writes():
+                stats = generator.run(options['total'], progress=progress)
+        else:
+            stats = generator.run(options['total'], progress=progress)
+
+        if stats['results'] and not options['skip_summaries']:
+            self.stdout.write("Rebuilding summaries...")
+            rebuild_summaries()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {stats['students']} students and {stats['results']} results in {stats['elapsed']:.1f}s"
+        ))
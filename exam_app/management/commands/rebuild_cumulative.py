@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from exam_app.summaries import check_cumulative, rebuild_cumulative
+
+
+class Command(BaseCommand):
+    help = "Rebuild CumulativeResult (annual per-subject totals) from Result, or --check it without writing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session', default='', help='Only this session, e.g. 2024/2025')
+        parser.add_argument('--check', action='store_true',
+                            help='Compare the stored rows with a from-scratch computation; exit 1 on differences')
+        parser.add_argument('--limit', type=int, default=20, help='Differences to report with --check')
+
+    def handle(self, *args, **options):
+        session = options['session'] or None
+        if not options['check']:
+            created = rebuild_cumulative(session)
+            self.stdout.write(self.style.SUCCESS(f'{created} CumulativeResult rows rebuilt'))
+            return
+
+        checked, problems = check_cumulative(session, limit=options['limit'])
+        for (student_id, subject_id, row_session), message in problems:
+            self.stdout.write(f"student {student_id}, subject {subject_id}, {row_session}: {message}")
+        if problems:
+            raise CommandError(f"{len(problems)} differences found (showing at most {options['limit']}); "
+                               f"run rebuild_cumulative to fix them.")
+        self.stdout.write(self.style.SUCCESS(f'{checked} CumulativeResult rows match the results'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from exam_app.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild TermSummary, ClassSubjectSummary and CumulativeResult from the Result table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session', default='', help='Only rebuild this session, e.g. 2024/2025')
+
+    def handle(self, *args, **options):
+        created = rebuild_summaries(session=options['session'] or None)
+        for name, count in created.items():
+            self.stdout.write(self.style.SUCCESS(f'{count} {name} rows rebuilt'))
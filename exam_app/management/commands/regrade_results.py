@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from exam_app.grading import clear_scale_cache, get_scale, regrade_session
+
+
+class Command(BaseCommand):
+    help = "Regrade every result of a session after its grade boundaries change"
+
+    def add_arguments(self, parser):
+        parser.add_argument('session', help='Session to regrade, e.g. 2024/2025')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        session = options['session']
+        clear_scale_cache(session)
+        scale = get_scale(session)
+        self.stdout.write("Grade scale: " + ", ".join(f"{grade} >= {low}" for low, grade in scale.boundaries))
+
+        started = time.perf_counter()
+        checked, changed = regrade_session(session, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{checked} results checked, {changed} regraded in {elapsed:.2f}s"
+        ))
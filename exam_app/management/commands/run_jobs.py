@@ -0,0 +1,45 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from exam_app.jobs import JOB_KINDS, maybe_sweep_job_files, requeue_stale, work
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs (exports, regrades, report cards); the database is the queue. "
+        "Result files are deleted EXAM_JOB_RETENTION_DAYS after their job finished."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Jobs run at the same time (threads)')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds between checks of an empty queue')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--kinds', default='', help='Comma-separated job kinds to run (default: all)')
+
+    def handle(self, *args, **options):
+        kinds = [kind.strip() for kind in options['kinds'].split(',') if kind.strip()]
+        unknown = set(kinds) - set(JOB_KINDS)
+        if unknown:
+            raise CommandError(f"Unknown job kinds: {', '.join(sorted(unknown))}")
+
+        requeued, failed = requeue_stale()
+        if requeued or failed:
+            self.stdout.write(f"Stale jobs: {requeued} queued again, {failed} failed")
+        removed = maybe_sweep_job_files()  # then hourly while the workers run
+        if removed:
+            self.stdout.write(f"Removed {removed} expired job files")
+
+        workers = max(1, options['workers'])
+        stop = threading.Event()
+        self.stdout.write(f"Running jobs with {workers} workers" + (" until the queue is empty" if options['once'] else
+                                                                     " (Ctrl-C to stop)"))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(work, stop, options['poll'], options['once'], kinds) for _ in range(workers)]
+            try:
+                processed = sum(future.result() for future in futures)
+            except KeyboardInterrupt:
+                # Running jobs finish first; queued ones wait for the next worker
+                self.stdout.write("Stopping after the running jobs...")
+                stop.set()
+                processed = sum(future.result() for future in futures)
+        self.stdout.write(self.style.SUCCESS(f"{processed} jobs processed"))
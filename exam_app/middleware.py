@@ -0,0 +1,211 @@
+import threading
+import time
+from collections import OrderedDict
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.gzip import GZipMiddleware
+from .caching import aget_version, bump_version_on_commit, get_version
+from .models import TeacherProfile
+from .routers import WROTE_AT_SESSION_KEY, begin_request, end_request
+
+# ---------------------------
+# Logged-in teacher, resolved once per request
+# ---------------------------
+# Lookup order: per-process LRU -> shared cache -> database. Both caches are
+# keyed by a version that TeacherProfile saves/deletes bump (signals.py). With
+# a shared cache every process sees the new version on its next request; with
+# the per-process LocMem cache only the saving process does, so local entries
+# also expire after LOCAL_CACHE_TTL seconds to bound how long others lag.
+
+TEACHER_CACHE_KEY = 'exam_app:teacher:{id}:v{version}'
+TEACHER_CACHE_TIMEOUT = 60 * 60
+LOCAL_CACHE_SIZE = 1024
+LOCAL_CACHE_TTL = 30
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize=LOCAL_CACHE_SIZE, ttl=LOCAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.data:
+                return default
+            expires, value = self.data[key]
+            if expires <= time.monotonic():
+                del self.data[key]
+                return default
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+local_teachers = LRUCache()
+
+
+def teacher_scope(teacher_id):
+    return f'teacher:{teacher_id}'
+
+
+def invalidate_teacher(teacher_id):
+    bump_version_on_commit(teacher_scope(teacher_id))
+
+
+def cached_teacher(teacher_id):
+    """(cache key, teacher or _MISSING) from the local LRU or the shared cache."""
+    key = TEACHER_CACHE_KEY.format(id=teacher_id, version=get_version(teacher_scope(teacher_id)))
+    teacher = local_teachers.get(key, _MISSING)
+    if teacher is not _MISSING:
+        return key, teacher
+    teacher = cache.get(key, _MISSING)
+    if teacher is not _MISSING:
+        local_teachers.set(key, teacher)
+    return key, teacher
+
+
+async def acached_teacher(teacher_id):
+    key = TEACHER_CACHE_KEY.format(id=teacher_id, version=await aget_version(teacher_scope(teacher_id)))
+    teacher = local_teachers.get(key, _MISSING)
+    if teacher is not _MISSING:
+        return key, teacher
+    teacher = await cache.aget(key, _MISSING)
+    if teacher is not _MISSING:
+        local_teachers.set(key, teacher)
+    return key, teacher
+
+
+def remember_teacher(key, teacher):
+    cache.set(key, teacher, TEACHER_CACHE_TIMEOUT)
+    local_teachers.set(key, teacher)
+
+
+async def aremember_teacher(key, teacher):
+    await cache.aset(key, teacher, TEACHER_CACHE_TIMEOUT)
+    local_teachers.set(key, teacher)
+
+
+def load_teacher(teacher_id):
+    """The TeacherProfile for ``teacher_id`` (or None), served from cache where possible."""
+    key, teacher = cached_teacher(teacher_id)
+    if teacher is _MISSING:
+        teacher = TeacherProfile.objects.filter(id=teacher_id).first()
+        remember_teacher(key, teacher)
+    return teacher
+
+
+async def aload_teacher(teacher_id):
+    key, teacher = await acached_teacher(teacher_id)
+    if teacher is _MISSING:
+        teacher = await TeacherProfile.objects.filter(id=teacher_id).afirst()
+        await aremember_teacher(key, teacher)
+    return teacher
+
+
+def resolve_teacher(request):
+    teacher_id = request.session.get('teacher_id')
+    if not teacher_id:
+        return None
+    teacher = load_teacher(teacher_id)
+    if teacher is None:
+        request.session.flush()
+    return teacher
+
+
+async def aresolve_teacher(request):
+    teacher_id = await request.session.aget('teacher_id')
+    if not teacher_id:
+        return None
+    teacher = await aload_teacher(teacher_id)
+    if teacher is None:
+        await request.session.aflush()
+    return teacher
+
+
+class TeacherMiddleware:
+    """Sets ``request.teacher`` (a TeacherProfile or None). Must follow SessionMiddleware."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.teacher = resolve_teacher(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.teacher = await aresolve_teacher(request)
+        return await self.get_response(request)
+
+
+# ---------------------------
+# Read-your-writes for replica routing (exam_app.routers)
+# ---------------------------
+class ReplicaRoutingMiddleware:
+    """Pins sessions that wrote recently to the primary. Must follow SessionMiddleware."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = begin_request(request.session.get(WROTE_AT_SESSION_KEY))
+        try:
+            response = self.get_response(request)
+        finally:
+            if end_request(token):
+                request.session[WROTE_AT_SESSION_KEY] = time.time()
+        return response
+
+    async def __acall__(self, request):
+        token = begin_request(await request.session.aget(WROTE_AT_SESSION_KEY))
+        try:
+            response = await self.get_response(request)
+        finally:
+            if end_request(token):
+                await request.session.aset(WROTE_AT_SESSION_KEY, time.time())
+        return response
+
+
+# ---------------------------
+# Compression without BREACH (production profile)
+# ---------------------------
+# A compressed page that reflects user input next to a secret lets an
+# attacker who can watch response sizes recover the secret byte by byte
+# (BREACH). Our secret on a page is the CSRF token, so pages that rendered
+# one (forms: login, result entry, the EO dashboard) go out uncompressed;
+# Django's own random padding only slows the attack down. The big pages
+# (results, broadsheet, analytics, CSV exports) have no form and stay gzipped.
+class CsrfSafeGZipMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        # CsrfViewMiddleware (re)sends the cookie exactly when the page used a token
+        if settings.CSRF_COOKIE_NAME in response.cookies:
+            return response
+        return super().process_response(request, response)
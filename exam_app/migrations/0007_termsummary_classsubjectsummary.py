@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam_app', '0006_teacherprofile_password'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassSubjectSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('result_count', models.PositiveIntegerField(default=0)),
+                ('total_score', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sum_squares', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('average', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('minimum', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('maximum', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('grade_counts', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('class_level', models.CharField(choices=[('SS1', 'SS1'), ('SS2', 'SS2'), ('SS3', 'SS3')], max_length=3)),
+                ('term', models.CharField(choices=[('1', 'First Term'), ('2', 'Second Term'), ('3', 'Third Term')], max_length=1)),
+                ('session', models.CharField(max_length=20)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='exam_app.subject')),
+            ],
+            options={
+                'unique_together': {('class_level', 'subject', 'term', 'session')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TermSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('result_count', models.PositiveIntegerField(default=0)),
+                ('total_score', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sum_squares', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('average', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('minimum', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('maximum', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('grade_counts', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('term', models.CharField(choices=[('1', 'First Term'), ('2', 'Second Term'), ('3', 'Third Term')], max_length=1)),
+                ('session', models.CharField(max_length=20)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='term_summaries', to='exam_app.student')),
+            ],
+            options={
+                'unique_together': {('student', 'term', 'session')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam_app', '0007_termsummary_classsubjectsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeBoundary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session', models.CharField(blank=True, help_text='e.g. 2024/2025; leave blank for the default scale', max_length=20)),
+                ('grade', models.CharField(max_length=2)),
+                ('min_score', models.DecimalField(decimal_places=2, help_text='Lowest total score that earns this grade', max_digits=5)),
+            ],
+            options={
+                'ordering': ('session', '-min_score'),
+                'unique_together': {('session', 'grade')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+
+def fill_name_normalized(apps, schema_editor):
+    TeacherProfile = apps.get_model('exam_app', 'TeacherProfile')
+    teachers = list(TeacherProfile.objects.all())
+    for teacher in teachers:
+        teacher.name_normalized = ' '.join((teacher.name or '').split()).casefold()
+    TeacherProfile.objects.bulk_update(teachers, ['name_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam_app', '0008_gradeboundary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teacherprofile',
+            name='name_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=150),
+        ),
+        migrations.RunPython(fill_name_normalized, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam_app', '0009_teacherprofile_name_normalized'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['session', 'term', 'subject'], include=('total_score', 'grade'), name='result_session_term_subj_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(condition=models.Q(('entered_by__isnull', False)), fields=['entered_by', '-created_at'], name='result_teacher_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(condition=models.Q(('entered_by__isnull', False)), fields=['entered_by', 'subject'], include=('student', 'total_score'), name='result_teacher_subject_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['class_level', 'last_name', 'first_name'], name='student_class_name_idx'),
+        ),
+    ]
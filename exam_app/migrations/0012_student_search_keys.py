@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:45
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def search_key(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ' '.join(''.join(c for c in decomposed if not unicodedata.combining(c)).split()).casefold()
+
+
+def fill_search_keys(apps, schema_editor):
+    Student = apps.get_model('exam_app', 'Student')
+    last_id = 0
+    while True:
+        students = list(Student.objects.filter(id__gt=last_id).order_by('id')[:5000])
+        if not students:
+            break
+        for student in students:
+            student.reg_no_normalized = search_key(student.reg_no)
+            student.name_normalized = search_key(f'{student.first_name} {student.last_name}')
+            student.surname_normalized = search_key(f'{student.last_name} {student.first_name}')
+        Student.objects.bulk_update(students, ['reg_no_normalized', 'name_normalized', 'surname_normalized'])
+        last_id = students[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam_app', '0011_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='name_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=201),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='reg_no_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='surname_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=201),
+        ),
+        # Filled before the indexes exist, so the backfill does not maintain them row by row
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['reg_no_normalized'], name='student_reg_prefix_idx', opclasses=['text_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['name_normalized'], name='student_name_prefix_idx', opclasses=['text_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['surname_normalized'], name='student_surname_prefix_idx', opclasses=['text_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['class_level', 'reg_no_normalized'], name='student_cls_reg_pfx_idx', opclasses=['text_pattern_ops', 'text_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['class_level', 'name_normalized'], name='student_cls_name_pfx_idx', opclasses=['text_pattern_ops', 'text_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['class_level', 'surname_normalized'], name='student_cls_surname_pfx_idx', opclasses=['text_pattern_ops', 'text_pattern_ops']),
+        ),
+    ]
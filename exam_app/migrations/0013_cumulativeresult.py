@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam_app', '0012_student_search_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CumulativeResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('result_count', models.PositiveIntegerField(default=0)),
+                ('total_score', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sum_squares', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('average', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('minimum', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('maximum', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('grade_counts', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.CharField(max_length=20)),
+                ('term_scores', models.JSONField(blank=True, default=dict)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cumulative_results', to='exam_app.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cumulative_results', to='exam_app.subject')),
+            ],
+            options={
+                'unique_together': {('student', 'subject', 'session')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam_app', '0013_cumulativeresult'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('results_csv', 'Results CSV export'), ('regrade', 'Regrade session'), ('report_cards', 'Report cards'), ('snapshot', 'Session snapshot (columnar)')], max_length=20),
+        ),
+    ]
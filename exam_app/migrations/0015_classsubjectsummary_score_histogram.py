@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:09
+
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, Value
+from django.db.models.functions import Cast, Floor, Least
+
+
+def fill_score_histograms(apps, schema_editor):
+    Result = apps.get_model('exam_app', 'Result')
+    ClassSubjectSummary = apps.get_model('exam_app', 'ClassSubjectSummary')
+    key_fields = ('student__class_level', 'subject_id', 'term', 'session')
+    bucket = Least(Cast(Floor(F('total_score') / 10), IntegerField()) * 10, Value(90))
+    rows = Result.objects.annotate(bucket=bucket).values(*key_fields, 'bucket').annotate(n=Count('id'))
+    histograms = {}
+    for row in rows.order_by(*key_fields, 'bucket').iterator():
+        key = tuple(row[field] for field in key_fields)
+        histograms.setdefault(key, {})[str(int(row['bucket']))] = row['n']
+
+    summaries = list(ClassSubjectSummary.objects.all())
+    for summary in summaries:
+        summary.score_histogram = histograms.get(
+            (summary.class_level, summary.subject_id, summary.term, summary.session), {})
+    ClassSubjectSummary.objects.bulk_update(summaries, ['score_histogram'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam_app', '0014_job_kind_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classsubjectsummary',
+            name='score_histogram',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(fill_score_histograms, migrations.RunPython.noop),
+    ]
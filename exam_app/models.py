@@ -1,6 +1,8 @@
+import unicodedata
+from decimal import Decimal
 from django.db import models
 from django.urls import reverse
-from django.contrib.auth.hashers import make_password, check_password
+from django.contrib.auth.hashers import make_password, check_password, identify_hasher
 
 CLASS_CHOICES = [
     ('SS1', 'SS1'),
@@ -17,8 +19,20 @@ TERM_CHOICES = [
 # ---------------------------
 # Teacher Profile
 # ---------------------------
+def normalize_name(name):
+    """Login key for a teacher name: case-folded, whitespace collapsed."""
+    return ' '.join((name or '').split()).casefold()
+
+
+def normalize_search(text):
+    """Search key: accents stripped, case-folded, whitespace collapsed ("Adé  OBI" -> "ade obi")."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ' '.join(''.join(c for c in decomposed if not unicodedata.combining(c)).split()).casefold()
+
+
 class TeacherProfile(models.Model):
     name = models.CharField(max_length=150, blank=True)  # full name
+    name_normalized = models.CharField(max_length=150, blank=True, editable=False, db_index=True)
     phone = models.CharField(max_length=20, blank=True)
     class_level = models.CharField(max_length=3, choices=CLASS_CHOICES, blank=True)
     is_eo = models.BooleanField(default=False, help_text="Check if this user is an Examination Officer (EO)")
@@ -29,12 +43,23 @@ class TeacherProfile(models.Model):
         self.save()
 
     def check_password(self, raw_password):
-        return check_password(raw_password, self.password)
+        # Re-hash with the current hasher policy when the stored hash is outdated
+        def setter(raw_password):
+            self.password = make_password(raw_password)
+            self.save(update_fields=['password'])
+        return check_password(raw_password, self.password, setter)
 
     def save(self, *args, **kwargs):
         # Hash only if it's not already hashed
-        if self.password and not self.password.startswith('pbkdf2_sha256$'):
-            self.password = make_password(self.password)
+        if self.password:
+            try:
+                identify_hasher(self.password)
+            except ValueError:
+                self.password = make_password(self.password)
+        self.name_normalized = normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'name_normalized'}
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -50,6 +75,44 @@ class Student(models.Model):
     reg_no = models.CharField(max_length=30, unique=True)
     class_level = models.CharField(max_length=3, choices=CLASS_CHOICES, default='SS1')
     teacher = models.ForeignKey(TeacherProfile, on_delete=models.SET_NULL, null=True, related_name='students')
+    # Prefix-search keys (search.py), kept in step with the fields above by save()
+    reg_no_normalized = models.CharField(max_length=30, blank=True, editable=False)
+    name_normalized = models.CharField(max_length=201, blank=True, editable=False)     # "first last"
+    surname_normalized = models.CharField(max_length=201, blank=True, editable=False)  # "last first"
+
+    SEARCH_SOURCES = ('reg_no', 'first_name', 'last_name')
+    SEARCH_KEYS = ('reg_no_normalized', 'name_normalized', 'surname_normalized')
+
+    class Meta:
+        indexes = [
+            # Class lists: filter by class_level, ordered by name
+            models.Index(fields=['class_level', 'last_name', 'first_name'], name='student_class_name_idx'),
+            # Autocomplete prefix lookups. text_pattern_ops lets PostgreSQL use them for LIKE 'abc%'
+            # (other backends ignore it and search.py queries them by range).
+            models.Index(fields=['reg_no_normalized'], opclasses=['text_pattern_ops'], name='student_reg_prefix_idx'),
+            models.Index(fields=['name_normalized'], opclasses=['text_pattern_ops'], name='student_name_prefix_idx'),
+            models.Index(fields=['surname_normalized'], opclasses=['text_pattern_ops'],
+                         name='student_surname_prefix_idx'),
+            # The same per class, for teachers (who only search their own class)
+            models.Index(fields=['class_level', 'reg_no_normalized'], opclasses=['text_pattern_ops'] * 2,
+                         name='student_cls_reg_pfx_idx'),
+            models.Index(fields=['class_level', 'name_normalized'], opclasses=['text_pattern_ops'] * 2,
+                         name='student_cls_name_pfx_idx'),
+            models.Index(fields=['class_level', 'surname_normalized'], opclasses=['text_pattern_ops'] * 2,
+                         name='student_cls_surname_pfx_idx'),
+        ]
+
+    def set_search_keys(self):
+        self.reg_no_normalized = normalize_search(self.reg_no)
+        self.name_normalized = normalize_search(f'{self.first_name} {self.last_name}')
+        self.surname_normalized = normalize_search(f'{self.last_name} {self.first_name}')
+
+    def save(self, *args, **kwargs):
+        self.set_search_keys()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.SEARCH_SOURCES):
+            kwargs['update_fields'] = set(update_fields) | set(self.SEARCH_KEYS)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.reg_no} — {self.first_name} {self.last_name}"
@@ -83,22 +146,173 @@ class Result(models.Model):
 
     class Meta:
         unique_together = ('student', 'subject', 'term', 'session')
+        indexes = [
+            # Term/session browsing, rankings and regrading; subject narrows the EO results sections.
+            # INCLUDE makes it covering on PostgreSQL; other backends build a plain index.
+            models.Index(fields=['session', 'term', 'subject'], include=['total_score', 'grade'],
+                         name='result_session_term_subj_idx'),
+            # Teacher dashboard: a teacher's most recent entries. Rows with no entered_by
+            # (added in the admin, left by a deleted teacher, or generated for a class with
+            # no teacher) are never looked up by teacher, so they are left out of the index.
+            models.Index(fields=['entered_by', '-created_at'], condition=models.Q(entered_by__isnull=False),
+                         name='result_teacher_recent_idx'),
+            # Graded students: a teacher's results grouped by subject
+            models.Index(fields=['entered_by', 'subject'], include=['student', 'total_score'],
+                         condition=models.Q(entered_by__isnull=False), name='result_teacher_subject_idx'),
+        ]
 
     def save(self, *args, **kwargs):
+        from .grading import grade_for
         self.total_score = self.test_score + self.exam_score
-        if self.total_score >= 70:
-            self.grade = 'A'
-        elif self.total_score >= 60:
-            self.grade = 'B'
-        elif self.total_score >= 50:
-            self.grade = 'C'
-        elif self.total_score >= 45:
-            self.grade = 'D'
-        elif self.total_score >= 40:
-            self.grade = 'E'
-        else:
-            self.grade = 'F'
+        self.grade = grade_for(self.total_score, self.session)
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.student} - {self.subject}: {self.total_score} ({self.grade})"
+
+
+# ---------------------------
+# Grade Boundary (see grading.py)
+# ---------------------------
+class GradeBoundary(models.Model):
+    session = models.CharField(max_length=20, blank=True,
+                               help_text="e.g. 2024/2025; leave blank for the default scale")
+    grade = models.CharField(max_length=2)
+    min_score = models.DecimalField(max_digits=5, decimal_places=2,
+                                    help_text="Lowest total score that earns this grade")
+
+    class Meta:
+        unique_together = ('session', 'grade')
+        ordering = ('session', '-min_score')
+
+    def __str__(self):
+        return f"{self.session or 'Default'}: {self.grade} >= {self.min_score}"
+
+
+# ---------------------------
+# Summaries (maintained incrementally, see summaries.py)
+# ---------------------------
+class ResultSummary(models.Model):
+    result_count = models.PositiveIntegerField(default=0)
+    total_score = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    sum_squares = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    average = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    minimum = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    maximum = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    grade_counts = models.JSONField(default=dict, blank=True)  # {"A": 3, "B": 5, ...}
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def stddev(self):
+        if not self.result_count:
+            return None
+        mean = self.total_score / self.result_count
+        variance = self.sum_squares / self.result_count - mean * mean
+        return max(variance, Decimal(0)).sqrt()
+
+
+class TermSummary(ResultSummary):
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='term_summaries')
+    term = models.CharField(max_length=1, choices=TERM_CHOICES)
+    session = models.CharField(max_length=20)
+
+    class Meta:
+        unique_together = ('student', 'term', 'session')
+
+    def __str__(self):
+        return f"{self.student} - Term {self.term} ({self.session}): {self.average}"
+
+
+class ClassSubjectSummary(ResultSummary):
+    class_level = models.CharField(max_length=3, choices=CLASS_CHOICES)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='summaries')
+    term = models.CharField(max_length=1, choices=TERM_CHOICES)
+    session = models.CharField(max_length=20)
+    # Total scores in 10-point buckets keyed by their lower bound: {"40": 12, "50": 30, ...} (analytics.py)
+    score_histogram = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        unique_together = ('class_level', 'subject', 'term', 'session')
+
+    def __str__(self):
+        return f"{self.class_level} {self.subject} - Term {self.term} ({self.session}): {self.average}"
+
+
+
+class CumulativeResult(ResultSummary):
+    """One student's running totals in one subject across the terms of a session."""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='cumulative_results')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='cumulative_results')
+    session = models.CharField(max_length=20)
+    term_scores = models.JSONField(default=dict, blank=True)  # {"1": "65.00", "2": "70.50"}
+
+    class Meta:
+        unique_together = ('student', 'subject', 'session')
+
+    def __str__(self):
+        return f"{self.student} {self.subject} ({self.session}): {self.average} over {self.result_count} terms"
+
+    def to_date(self, term):
+        """(total, average) over the terms up to and including ``term``; (None, None) if none."""
+        scores = [Decimal(score) for t, score in self.term_scores.items() if t <= term]
+        if not scores:
+            return None, None
+        total = sum(scores)
+        return total, (total / len(scores)).quantize(Decimal('0.01'))
+
+# ---------------------------
+# Background jobs (run by manage.py run_jobs, see jobs.py)
+# ---------------------------
+JOB_KIND_CHOICES = [
+    ('results_csv', 'Results CSV export'),
+    ('regrade', 'Regrade session'),
+    ('report_cards', 'Report cards'),
+    ('snapshot', 'Session snapshot (columnar)'),
+]
+
+
+class Job(models.Model):
+    QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    FINISHED = (SUCCEEDED, FAILED)
+
+    kind = models.CharField(max_length=20, choices=JOB_KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    message = models.TextField(blank=True)
+    result_file = models.FileField(upload_to='jobs/%Y/%m/', blank=True)
+    requested_by = models.ForeignKey(TeacherProfile, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='jobs')
+    worker = models.CharField(max_length=100, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest queued job and look for stale running ones
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+        ]
+
+    @property
+    def percent(self):
+        if self.status == self.SUCCEEDED:
+            return 100
+        if not self.total:
+            return 0
+        return min(100, self.progress * 100 // self.total)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
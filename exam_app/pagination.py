@@ -0,0 +1,67 @@
+import base64
+import json
+from django.db.models import Q
+
+# ---------------------------
+# Keyset (seek) pagination
+# ---------------------------
+# Order of the EO results browser; ``id`` last makes every key unique.
+RESULT_KEYSET = ('student__class_level', 'subject__name', 'student__last_name', 'student__first_name', 'id')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, fields=RESULT_KEYSET):
+    """Turn a cursor back into key values; raises ValueError if it was tampered with."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise ValueError("Invalid cursor.")
+    return values
+
+
+def keyset_filter(fields, values):
+    """Q for rows strictly after ``values`` in (fields...) lexicographic order."""
+    condition = Q(**{f'{fields[-1]}__gt': values[-1]})
+    for field, value in zip(reversed(fields[:-1]), reversed(values[:-1])):
+        condition = Q(**{f'{field}__gt': value}) | (Q(**{field: value}) & condition)
+    return condition
+
+
+def keyset_page(queryset, fields=RESULT_KEYSET, after=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Return (rows, next_cursor) for one page of a ``.values()`` queryset.
+    The key fields are always selected so the next cursor can be built.
+    """
+    queryset, limit = page_query(queryset, fields, after, limit)
+    return finish_page(list(queryset), fields, limit)
+
+
+async def akeyset_page(queryset, fields=RESULT_KEYSET, after=None, limit=DEFAULT_PAGE_SIZE):
+    queryset, limit = page_query(queryset, fields, after, limit)
+    return finish_page([row async for row in queryset], fields, limit)
+
+
+def page_query(queryset, fields, after, limit):
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    queryset = queryset.order_by(*fields)
+    if after:
+        queryset = queryset.filter(keyset_filter(fields, decode_cursor(after, fields)))
+    return queryset[:limit + 1], limit
+
+
+def finish_page(rows, fields, limit):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][field] for field in fields)
+    return rows, next_cursor
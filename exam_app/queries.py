@@ -0,0 +1,253 @@
+import asyncio
+from decimal import Decimal
+from django.db.models import Avg, Count, DecimalField, Max, Min, StdDev, Sum
+from .caching import (
+    REBUILD_SCOPE, acached, aentry_timeout, aget_versions, cached, entry_timeout, get_versions, section_scope,
+)
+from .models import ClassSubjectSummary, Result
+
+# ---------------------------
+# Shared result filters
+# ---------------------------
+def filter_results(queryset, params):
+    """Apply the optional ?term=, ?session= and ?class_level= filters."""
+    term = params.get('term')
+    session = params.get('session')
+    class_level = params.get('class_level')
+    if term:
+        queryset = queryset.filter(term=term)
+    if session:
+        queryset = queryset.filter(session=session)
+    if class_level:
+        queryset = queryset.filter(student__class_level=class_level)
+    return queryset
+
+
+def section_rows(params, subject_id):
+    """Rows of one class/subject section of the EO results browser (paged by the caller)."""
+    return (
+        filter_results(Result.objects.all(), params)
+        .filter(subject_id=subject_id)
+        .values(
+            'id', 'student__class_level', 'subject__name', 'student__last_name', 'student__first_name',
+            'student__reg_no', 'total_score', 'grade', 'term', 'session',
+        )
+    )
+
+
+def graded_by_teacher(teacher):
+    """Per-student totals of the results ``teacher`` entered, grouped for graded_students."""
+    return (
+        Result.objects
+        .filter(entered_by=teacher)
+        .values(
+            'subject__name',
+            'student__id',
+            'student__reg_no',
+            'student__first_name',
+            'student__last_name',
+            'student__class_level'
+        )
+        .annotate(total_marks=Sum('total_score'))
+        .order_by('subject__name')
+    )
+
+
+# ---------------------------
+# Result statistics (computed in SQL)
+# ---------------------------
+class ResultStatistics:
+    """
+    Count / average / min / max / standard deviation of ``total_score``,
+    grouped in the database. Every method runs exactly one query.
+    """
+
+    CLASS = 'student__class_level'
+    SUBJECT = 'subject__name'
+
+    def __init__(self, queryset=None, params=None):
+        if queryset is None:
+            queryset = Result.objects.all()
+        if params:
+            queryset = filter_results(queryset, params)
+        self.queryset = queryset
+
+    @staticmethod
+    def aggregates():
+        return {
+            'count': Count('id'),
+            'average': Avg('total_score'),
+            'minimum': Min('total_score'),
+            'maximum': Max('total_score'),
+            'stddev': StdDev('total_score'),
+        }
+
+    def grouped(self, *fields):
+        return list(
+            self.queryset
+            .values(*fields)
+            .annotate(**self.aggregates())
+            .order_by(*fields)
+        )
+
+    def overall(self):
+        return self.queryset.aggregate(**self.aggregates())
+
+    def by_class(self):
+        return self.grouped(self.CLASS)
+
+    def by_subject(self):
+        return self.grouped(self.SUBJECT)
+
+    def by_class_subject(self):
+        # subject_id rides along so callers can link to a section
+        return self.grouped(self.CLASS, self.SUBJECT, 'subject_id')
+
+
+# ---------------------------
+# Summary statistics (read from ClassSubjectSummary)
+# ---------------------------
+class SummaryStatistics:
+    """
+    Same interface as ResultStatistics, but served from the precomputed
+    ClassSubjectSummary rows: O(classes x subjects x terms) rows read,
+    independent of how many results exist.
+    """
+
+    CLASS = 'class_level'
+    SUBJECT = 'subject__name'
+
+    def __init__(self, params=None):
+        queryset = ClassSubjectSummary.objects.all()
+        params = params or {}
+        for field in ('term', 'session', 'class_level'):
+            if params.get(field):
+                queryset = queryset.filter(**{field: params[field]})
+        self.queryset = queryset
+
+    @staticmethod
+    def aggregates():
+        total = DecimalField(max_digits=20, decimal_places=4)
+        return {
+            'count': Sum('result_count'),
+            'total': Sum('total_score', output_field=total),
+            'squares': Sum('sum_squares', output_field=total),
+            'minimum': Min('minimum'),
+            'maximum': Max('maximum'),
+        }
+
+    @staticmethod
+    def finish(row):
+        count = row['count'] or 0
+        row['average'] = row['stddev'] = None
+        if count:
+            mean = row['total'] / count
+            row['average'] = mean
+            row['stddev'] = max(row['squares'] / count - mean * mean, Decimal(0)).sqrt()
+        return row
+
+    def grouped_queryset(self, *fields):
+        return self.queryset.values(*fields).annotate(**self.aggregates()).order_by(*fields)
+
+    def grouped(self, *fields):
+        return [self.finish(row) for row in self.grouped_queryset(*fields)]
+
+    async def agrouped(self, *fields):
+        return [self.finish(row) async for row in self.grouped_queryset(*fields)]
+
+    def overall(self):
+        return self.finish(self.queryset.aggregate(**self.aggregates()))
+
+    def by_class(self):
+        return self.grouped(self.CLASS)
+
+    def by_subject(self):
+        return self.grouped(self.SUBJECT)
+
+    def by_class_subject(self):
+        return self.grouped(self.CLASS, self.SUBJECT, 'subject_id')
+
+
+# ---------------------------
+# EO results page data (cached per section scope)
+# ---------------------------
+def overview_classes(by_class, by_class_subject, statistics=SummaryStatistics):
+    classes = []
+    for cls in by_class:
+        classes.append(dict(cls, class_name=cls[statistics.CLASS], subjects=[]))
+    by_name = {cls['class_name']: cls for cls in classes}
+    for section in by_class_subject:
+        by_name[section[statistics.CLASS]]['subjects'].append(
+            dict(section, id=section['subject_id'], name=section[statistics.SUBJECT])
+        )
+    return classes
+
+
+def build_results_overview(filters):
+    statistics = SummaryStatistics(params=filters)
+    return overview_classes(statistics.by_class(), statistics.by_class_subject())
+
+
+async def abuild_results_overview(filters):
+    statistics = SummaryStatistics(params=filters)
+    # The two groupings are independent queries
+    by_class, by_class_subject = await asyncio.gather(
+        statistics.agrouped(statistics.CLASS),
+        statistics.agrouped(statistics.CLASS, statistics.SUBJECT, 'subject_id'),
+    )
+    return overview_classes(by_class, by_class_subject)
+
+
+FRAGMENT_TIMEOUT = 60 * 60
+
+
+def overview_cache_args(filters):
+    term, session, class_level = filters.get('term'), filters.get('session'), filters.get('class_level')
+    return (
+        'results-overview',
+        (class_level or '*', term or '*', session or '*'),
+        (section_scope(class_level, '', term, session), REBUILD_SCOPE),
+    )
+
+
+def results_overview(filters):
+    """
+    Class headers and their subject sections for the EO results page. Each
+    class and section gets a ``fragment_key`` that changes only when results
+    in that class/section change, for the template's {% cache %} blocks, and
+    the ``fragment_timeout`` to cache them for.
+    """
+    classes = cached(*overview_cache_args(filters), lambda: build_results_overview(filters))
+    scopes = fragment_scopes(classes, filters)
+    return add_fragment_keys(classes, filters, get_versions(scopes), entry_timeout(scopes, FRAGMENT_TIMEOUT))
+
+
+async def aresults_overview(filters):
+    classes = await acached(*overview_cache_args(filters), lambda: abuild_results_overview(filters))
+    scopes = fragment_scopes(classes, filters)
+    return add_fragment_keys(classes, filters, await aget_versions(scopes),
+                             await aentry_timeout(scopes, FRAGMENT_TIMEOUT))
+
+
+def fragment_scopes(classes, filters):
+    term, session = filters.get('term'), filters.get('session')
+    scopes = [REBUILD_SCOPE]
+    for cls in classes:
+        scopes.append(section_scope(cls['class_name'], '', term, session))
+        scopes.extend(section_scope(cls['class_name'], subject['id'], term, session) for subject in cls['subjects'])
+    return scopes
+
+
+def add_fragment_keys(classes, filters, versions, timeout):
+    term, session = filters.get('term'), filters.get('session')
+
+    def fragment_key(scope):
+        return f'{scope}:v{versions[scope]}.{versions[REBUILD_SCOPE]}'
+
+    for cls in classes:
+        cls['fragment_key'] = fragment_key(section_scope(cls['class_name'], '', term, session))
+        cls['fragment_timeout'] = timeout
+        for subject in cls['subjects']:
+            subject['fragment_key'] = fragment_key(section_scope(cls['class_name'], subject['id'], term, session))
+            subject['fragment_timeout'] = timeout
+    return classes
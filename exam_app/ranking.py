@@ -0,0 +1,82 @@
+from django.db.models import Avg, Count, DecimalField, F, Sum, Window
+from django.db.models.functions import Rank
+from .caching import STUDENTS_SCOPE, cached, results_scope
+from .models import Result
+
+# ---------------------------
+# Class positions
+# ---------------------------
+# Positions use standard competition ranking ("1, 2, 2, 4"): students with
+# the same average share a position and the next one is skipped. Everything
+# is computed by the database in one window-function query.
+
+AGGREGATE_TOTAL = DecimalField(max_digits=8, decimal_places=2)
+
+
+def class_positions_query(term, session, class_level=None):
+    results = Result.objects.filter(term=term, session=session)
+    if class_level:
+        results = results.filter(student__class_level=class_level)
+    return (
+        results
+        .values('student_id', 'student__reg_no', 'student__first_name', 'student__last_name',
+                'student__class_level')
+        .annotate(
+            total=Sum('total_score', output_field=AGGREGATE_TOTAL),
+            average=Avg('total_score'),
+            subjects=Count('id'),
+        )
+        .annotate(position=Window(
+            Rank(),
+            partition_by=[F('student__class_level')],
+            order_by=F('average').desc(),
+        ))
+        .order_by('student__class_level', 'position', 'student__last_name', 'student__first_name')
+    )
+
+
+def subject_positions_query(term, session, class_level=None):
+    results = Result.objects.filter(term=term, session=session)
+    if class_level:
+        results = results.filter(student__class_level=class_level)
+    return (
+        results
+        .annotate(position=Window(
+            Rank(),
+            partition_by=[F('student__class_level'), F('subject_id')],
+            order_by=F('total_score').desc(),
+        ))
+        .values('student_id', 'student__class_level', 'subject_id', 'subject__name', 'total_score',
+                'grade', 'position')
+        .order_by('student__class_level', 'subject__name', 'position')
+    )
+
+
+def class_positions(term, session, class_level=None):
+    """Per-student total, average, subject count and class position (cached)."""
+    return cached(
+        'class-positions', (term, session, class_level or '*'),
+        (results_scope(term, session), STUDENTS_SCOPE),
+        lambda: list(class_positions_query(term, session, class_level)),
+    )
+
+
+def subject_positions(term, session, class_level=None):
+    """Per-result position within its class and subject (cached)."""
+    return cached(
+        'subject-positions', (term, session, class_level or '*'),
+        (results_scope(term, session), STUDENTS_SCOPE),
+        lambda: list(subject_positions_query(term, session, class_level)),
+    )
+
+
+def positions_by_student(term, session, class_level=None):
+    """{student_id: {'position': ..., 'total': ..., 'average': ..., 'subjects': {subject_id: position}}}"""
+    students = {
+        row['student_id']: dict(row, subject_positions={})
+        for row in class_positions(term, session, class_level)
+    }
+    for row in subject_positions(term, session, class_level):
+        if row['student_id'] in students:
+            students[row['student_id']]['subject_positions'][row['subject_id']] = row['position']
+    return students
@@ -0,0 +1,241 @@
+import json
+import os
+import shutil
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from django.template.loader import render_to_string
+from .models import CumulativeResult, Result, Student, TERM_CHOICES
+from .ranking import positions_by_student
+
+# ---------------------------
+# Batch report-card generation
+# ---------------------------
+# Students are streamed in id order, chunk_size at a time; each chunk's
+# results come from one query and the contexts are plain dicts, so they can
+# be shipped to a process pool for rendering. Every finished card is written
+# to <output>.parts/ and recorded in <output>.manifest.json, which lets an
+# interrupted run pick up where it stopped. The zip is packed at the end.
+
+DEFAULT_CHUNK_SIZE = 200
+
+RESULT_FIELDS = ('student_id', 'subject__name', 'subject_id', 'test_score', 'exam_score', 'total_score', 'grade')
+
+
+def load_weasyprint():
+    try:
+        import weasyprint
+    except ImportError:
+        raise RuntimeError("PDF report cards need WeasyPrint installed; use the html format instead.")
+    return weasyprint
+
+
+def html_to_pdf(html):
+    return load_weasyprint().HTML(string=html).write_pdf()
+
+
+def render_card(context):
+    """Render one report card; runs inside the worker processes."""
+    html = render_to_string('report_card.html', context)
+    if context['format'] == 'pdf':
+        return context['filename'], html_to_pdf(html)
+    return context['filename'], html.encode('utf-8')
+
+
+def init_worker():
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'exam_system.settings')
+    django.setup()
+
+
+def report_students(term, session, class_level=None):
+    students = Student.objects.filter(results__term=term, results__session=session).distinct()
+    if class_level:
+        students = students.filter(class_level=class_level)
+    return students.order_by('id')
+
+
+def iter_student_chunks(students, chunk_size=DEFAULT_CHUNK_SIZE):
+    last_id = 0
+    while True:
+        chunk = list(
+            students.filter(id__gt=last_id)
+            .values('id', 'reg_no', 'first_name', 'last_name', 'class_level')[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]['id']
+
+
+def card_filename(student, fmt):
+    """Path inside the zip; the id keeps reg numbers that differ only in '/' vs '-' apart."""
+    reg_no = student['reg_no'].replace('/', '-')
+    return f"{student['class_level']}/{reg_no}_{student['id']}.{fmt}"
+
+
+def build_contexts(students, term, session, fmt='html'):
+    """Plain-dict contexts for a chunk of students, from one results query."""
+    results = {}
+    rows = (
+        Result.objects
+        .filter(student_id__in=[s['id'] for s in students], term=term, session=session)
+        .order_by('subject__name')
+        .values(*RESULT_FIELDS)
+    )
+    for row in rows:
+        results.setdefault(row['student_id'], []).append(row)
+
+    # Earlier terms of the session, read from the running totals (one row per student and subject)
+    earlier_terms = [(value, name) for value, name in TERM_CHOICES if value < term]
+    cumulative = {}
+    if earlier_terms:
+        rows = (
+            CumulativeResult.objects
+            .filter(student_id__in=[s['id'] for s in students], session=session)
+            .only('student_id', 'subject_id', 'term_scores')
+        )
+        cumulative = {(row.student_id, row.subject_id): row for row in rows}
+
+    positions, class_sizes = {}, {}
+    for class_level in {s['class_level'] for s in students}:
+        ranked = positions_by_student(term, session, class_level)
+        positions.update(ranked)
+        class_sizes[class_level] = len(ranked)
+
+    term_name = dict(TERM_CHOICES).get(term, term)
+    contexts = []
+    for student in students:
+        ranking = positions.get(student['id'], {})
+        subject_positions = ranking.get('subject_positions', {})
+        subjects = [
+            dict(row, position=subject_positions.get(row['subject_id'], ''))
+            for row in results.get(student['id'], [])
+        ]
+        for row in subjects:
+            running = cumulative.get((student['id'], row['subject_id']))
+            if running is not None:
+                row['earlier_scores'] = [running.term_scores.get(value, '') for value, _ in earlier_terms]
+                row['cumulative_average'] = running.to_date(term)[1]
+        cumulative_averages = [row['cumulative_average'] for row in subjects
+                               if row.get('cumulative_average') is not None]
+        contexts.append({
+            'student': student,
+            'subjects': subjects,
+            'grade_counts': sorted(Counter(row['grade'] for row in subjects).items()),
+            'total': ranking.get('total'),
+            'average': ranking.get('average'),
+            'position': ranking.get('position'),
+            'class_size': class_sizes.get(student['class_level']),
+            'earlier_terms': [name for _, name in earlier_terms],
+            'cumulative_average': (
+                sum(cumulative_averages) / len(cumulative_averages) if cumulative_averages else None
+            ),
+            'term': term_name,
+            'session': session,
+            'format': fmt,
+            'filename': card_filename(student, fmt),
+        })
+    return contexts
+
+
+class ReportCardRun:
+    """One (possibly resumed) generation run writing to ``output`` (a .zip path)."""
+
+    def __init__(self, output, term, session, class_level=None, fmt='html'):
+        self.output = output
+        self.parts_dir = output + '.parts'
+        self.manifest_path = output + '.manifest.json'
+        self.params = {'term': term, 'session': session, 'class_level': class_level or '', 'format': fmt}
+        self.done = set()
+
+    def load_manifest(self, restart=False):
+        if restart:
+            self.discard()
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as fh:
+                manifest = json.load(fh)
+            if manifest.get('params') != self.params:
+                raise ValueError(
+                    f"{self.manifest_path} belongs to a different run; restart to overwrite it."
+                )
+            self.done = set(manifest.get('done', []))
+        os.makedirs(self.parts_dir, exist_ok=True)
+
+    def save_manifest(self):
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump({'params': self.params, 'done': sorted(self.done)}, fh)
+        os.replace(tmp, self.manifest_path)
+
+    def write_card(self, filename, content):
+        path = os.path.join(self.parts_dir, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as fh:
+            fh.write(content)
+        os.replace(path + '.tmp', path)
+
+    def pack(self):
+        tmp = self.output + '.tmp'
+        with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for root, _, files in os.walk(self.parts_dir):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    archive.write(path, os.path.relpath(path, self.parts_dir))
+        os.replace(tmp, self.output)
+        self.discard()
+
+    def discard(self):
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+
+def generate_report_cards(output, term, session, class_level=None, fmt='html', workers=None,
+                          chunk_size=DEFAULT_CHUNK_SIZE, restart=False, progress=None):
+    """
+    Render a report card for every student with results in (term, session)
+    into the zip at ``output``. ``workers=0`` renders in this process.
+    ``progress(done, total)`` is called after every chunk. Returns run stats.
+    """
+    if fmt == 'pdf':
+        load_weasyprint()  # fail before any work is done
+
+    run = ReportCardRun(output, term, session, class_level, fmt)
+    run.load_manifest(restart=restart)
+    students = report_students(term, session, class_level)
+    total = students.count()
+    skipped = len(run.done)
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker) if workers != 0 else None
+    started = time.perf_counter()
+    rendered = 0
+    try:
+        for chunk in iter_student_chunks(students, chunk_size):
+            chunk = [s for s in chunk if s['id'] not in run.done]
+            if not chunk:
+                continue
+            contexts = build_contexts(chunk, term, session, fmt)
+            cards = executor.map(render_card, contexts, chunksize=16) if executor else map(render_card, contexts)
+            for student, (filename, content) in zip(chunk, cards):
+                run.write_card(filename, content)
+                run.done.add(student['id'])
+            rendered += len(chunk)
+            run.save_manifest()
+            if progress:
+                progress(len(run.done), total)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - started
+    run.pack()
+    return {
+        'total': total,
+        'rendered': rendered,
+        'skipped': skipped,
+        'elapsed': elapsed,
+        'rate': rendered / elapsed if elapsed else 0,
+        'output': output,
+    }
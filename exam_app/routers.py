@@ -0,0 +1,123 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+# ---------------------------
+# Read-replica routing for EO reporting
+# ---------------------------
+# Only reads made inside reporting_reads() (the EO results pages, exports
+# and graded_students) go to settings.EXAM_REPLICA_DATABASE; everything else,
+# and every write, stays on the primary. A session that wrote anything is
+# pinned to the primary for EXAM_REPLICA_STICKY_SECONDS afterwards, so a
+# teacher sees their own results straight away whatever the replica lag.
+# Other sessions may read data up to one replication delay old. A cached
+# entry computed from the replica within EXAM_REPLICA_STICKY_SECONDS of a
+# write to its scopes is kept only until that window ends (caching.py), so
+# rows the replica had not received yet don't stay cached under the new version.
+#
+# State lives in context variables, so it follows a request through threads
+# (sync_to_async) and async tasks alike.
+
+WROTE_AT_SESSION_KEY = '_db_wrote_at'
+
+_reporting = ContextVar('exam_app_reporting_reads', default=False)
+_request = ContextVar('exam_app_request_routing', default=None)
+
+
+class RequestRouting:
+    """Per-request routing state: pinned to the primary, and whether it wrote."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replica_alias():
+    return getattr(settings, 'EXAM_REPLICA_DATABASE', None)
+
+
+def sticky_seconds():
+    return getattr(settings, 'EXAM_REPLICA_STICKY_SECONDS', 10)
+
+
+@contextmanager
+def reporting_reads():
+    """Send reads in the block to the replica (unless the request is pinned)."""
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+def reporting_view(view):
+    """View decorator for reporting_reads(); works on sync and async views."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            with reporting_reads():
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with reporting_reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def pin_database(queryset):
+    """
+    Fix the database a lazy queryset will read from now: a streamed response
+    body is evaluated after the view, and its reporting_reads() block, return.
+    """
+    return queryset.using(queryset.db)
+
+
+# Request lifecycle (ReplicaRoutingMiddleware)
+def begin_request(wrote_at):
+    """Start routing a request whose session last wrote at ``wrote_at`` (a timestamp or None)."""
+    pinned = wrote_at is not None and time.time() - wrote_at < sticky_seconds()
+    return _request.set(RequestRouting(pinned=pinned))
+
+
+def end_request(token):
+    """Finish the request; True if it wrote, so the caller stamps the session."""
+    routing = _request.get()
+    _request.reset(token)
+    return routing.wrote
+
+
+def reading_replica():
+    """True if a read made here and now goes to the replica."""
+    if not replica_alias() or not _reporting.get():
+        return False
+    routing = _request.get()
+    return routing is None or not routing.pinned
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return replica_alias() if reading_replica() else None
+
+    def db_for_write(self, model, **hints):
+        routing = _request.get()
+        if routing is not None:
+            # Read-your-writes: the rest of this request and the sticky window stay on the primary
+            routing.wrote = routing.pinned = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        alias = replica_alias()
+        if alias and {obj1._state.db, obj2._state.db} <= {'default', alias}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # A replica receives the schema from its primary
+        if db == replica_alias():
+            return False
+        return None
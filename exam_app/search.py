@@ -0,0 +1,62 @@
+from django.db import connection
+from django.db.models import Q
+from .models import Student, normalize_search
+
+# ---------------------------
+# Student prefix search (autocomplete)
+# ---------------------------
+# Matches a prefix of the registration number, "first last" or "last first",
+# on the normalized columns Student.save() maintains. Each key is searched
+# with its own bounded, index-ordered query and the hits are merged, so a
+# lookup reads at most 3 x limit index entries whatever the table size.
+# A prefix needs nothing fancier than a B-tree: PostgreSQL walks it for
+# LIKE 'abc%' (text_pattern_ops indexes); elsewhere the same prefix is
+# queried as the range ['abc', 'abc\U0010ffff'), which any index serves.
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+MAX_QUERY_LENGTH = 100
+
+SEARCH_FIELDS = ('id', 'reg_no', 'first_name', 'last_name', 'class_level')
+
+_LAST_CHAR = '\U0010ffff'
+
+
+def prefix_filter(field, prefix):
+    if connection.vendor == 'postgresql':
+        return Q(**{f'{field}__startswith': prefix})
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + _LAST_CHAR})
+
+
+def search_students(query, class_level=None, limit=DEFAULT_LIMIT, queryset=None):
+    """Up to ``limit`` students (dicts of SEARCH_FIELDS) matching the prefix ``query``."""
+    prefix = normalize_search(query)[:MAX_QUERY_LENGTH]
+    if not prefix:
+        return []
+    limit = max(1, min(limit, MAX_LIMIT))
+    queryset = Student.objects.all() if queryset is None else queryset
+    if class_level:
+        queryset = queryset.filter(class_level=class_level)
+
+    # Reg no first: typing a number puts that student at the top
+    found = {}
+    for key in Student.SEARCH_KEYS:
+        rows = queryset.filter(prefix_filter(key, prefix)).order_by(key, 'id').values(*SEARCH_FIELDS)[:limit]
+        for row in rows:
+            found.setdefault(row['id'], row)
+        if len(found) >= limit:
+            break
+    return list(found.values())[:limit]
+
+
+def search_filter(query):
+    """One Q matching any search key, for callers that paginate themselves (the admin)."""
+    prefix = normalize_search(query)[:MAX_QUERY_LENGTH]
+    condition = Q()
+    for key in Student.SEARCH_KEYS:
+        condition |= prefix_filter(key, prefix)
+    return condition
+
+
+def student_label(row):
+    return f"{row['reg_no']} — {row['first_name']} {row['last_name']}".strip()
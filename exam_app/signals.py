@@ -1,10 +1,111 @@
-from django.db.models.signals import post_save
+from django.db import connections
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import TeacherProfile
+from .caching import STUDENTS_SCOPE, bump_version_on_commit, class_students_scope
+from .grading import clear_scale_cache
+from .middleware import invalidate_teacher
+from .models import ClassSubjectSummary, CumulativeResult, GradeBoundary, Result, Student, TeacherProfile
+from .summaries import apply_result_changes, rebuild_cumulative, rebuild_summaries, stored_state, stored_states
 
 @receiver(post_save, sender=User)
 def create_teacher_profile(sender, instance, created, **kwargs):
     if created:
         # create a TeacherProfile for every new user (admin-created teachers will get a profile)
         TeacherProfile.objects.create(user=instance)
+
+
+# ---------------------------
+# Keep TermSummary / ClassSubjectSummary / CumulativeResult in step with Result
+# ---------------------------
+@receiver(pre_save, sender=Result)
+def remember_previous_result(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None if raw else stored_state(instance.pk)
+
+@receiver(post_save, sender=Result)
+def update_summaries_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    apply_result_changes(
+        removed=[getattr(instance, '_previous_state', None)],
+        added=[stored_state(instance.pk)],
+    )
+
+@receiver(pre_delete, sender=Result)
+def remember_deleted_result(sender, instance, **kwargs):
+    # Read while the student row is still there (cascades delete it afterwards)
+    instance._deleted_state = stored_state(instance.pk)
+
+@receiver(post_delete, sender=Result)
+def update_summaries_on_delete(sender, instance, **kwargs):
+    apply_result_changes(removed=[getattr(instance, '_deleted_state', None)])
+
+
+# Student names / classes appear in cached rankings, report sections and teacher pages.
+# A class change also moves the student's results to the new class's summaries.
+@receiver(pre_save, sender=Student)
+def remember_previous_class(sender, instance, raw=False, **kwargs):
+    instance._previous_class_level = None
+    instance._moved_result_states = []
+    if instance.pk and not raw:
+        instance._previous_class_level = (
+            Student.objects.filter(pk=instance.pk).values_list('class_level', flat=True).first()
+        )
+        if instance._previous_class_level not in (None, instance.class_level):
+            instance._moved_result_states = stored_states(Result.objects.filter(student_id=instance.pk))
+
+@receiver(post_save, sender=Student)
+def move_results_to_new_class(sender, instance, raw=False, **kwargs):
+    moved = getattr(instance, '_moved_result_states', [])
+    if moved and not raw:
+        apply_result_changes(removed=moved, added=stored_states(Result.objects.filter(student_id=instance.pk)))
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def student_changed(sender, instance, **kwargs):
+    classes = {instance.class_level, getattr(instance, '_previous_class_level', None)} - {None}
+    bump_version_on_commit(STUDENTS_SCOPE, *(class_students_scope(c) for c in classes))
+
+
+# Cached logged-in teacher (middleware.py)
+@receiver(post_save, sender=TeacherProfile)
+@receiver(post_delete, sender=TeacherProfile)
+def teacher_profile_changed(sender, instance, **kwargs):
+    invalidate_teacher(instance.pk)
+
+
+# ---------------------------
+# Grade scales are cached; drop them when a boundary changes
+# ---------------------------
+@receiver(pre_save, sender=GradeBoundary)
+def remember_previous_session(sender, instance, raw=False, **kwargs):
+    instance._previous_session = None
+    if instance.pk and not raw:
+        instance._previous_session = (
+            GradeBoundary.objects.filter(pk=instance.pk).values_list('session', flat=True).first()
+        )
+
+@receiver(post_save, sender=GradeBoundary)
+@receiver(post_delete, sender=GradeBoundary)
+def grade_boundary_changed(sender, instance, **kwargs):
+    # A boundary moved to another session changes both scales
+    previous = getattr(instance, '_previous_session', None)
+    clear_scale_cache(*{instance.session} | ({previous} if previous is not None else set()))
+
+
+def build_missing_summaries(sender, using='default', plan=None, **kwargs):
+    """post_migrate: fill the summary tables the first time they appear."""
+    if using != 'default':
+        return
+    # Migrating backwards may leave the summary tables (or their newer columns) missing
+    if plan and any(backwards for _, backwards in plan):
+        return
+    tables = set(connections[using].introspection.table_names())
+    if not {model._meta.db_table for model in (Result, ClassSubjectSummary, CumulativeResult)} <= tables:
+        return
+    if not Result.objects.exists():
+        return
+    if not ClassSubjectSummary.objects.exists():
+        rebuild_summaries()
+    elif not CumulativeResult.objects.exists():
+        rebuild_cumulative()  # added after the other summaries
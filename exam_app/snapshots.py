@@ -0,0 +1,336 @@
+import ast
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import zipfile
+from array import array
+from decimal import Decimal
+from .models import CLASS_CHOICES, TERM_CHOICES, Result, Subject
+from .routers import reporting_reads
+
+# ---------------------------
+# Columnar session snapshots (offline analytics)
+# ---------------------------
+# One session's results as typed columns instead of CSV text:
+#   - class_level, subject, term and grade are dictionary-encoded: small
+#     integer codes plus the list of values they index;
+#   - scores are fixed-point integers in hundredths (SCORE_SCALE);
+#   - id and student_id are 64-bit integers.
+# With pyarrow installed the snapshot is an Arrow IPC file (.arrow) with
+# real dictionary columns. Otherwise it is an uncompressed .npz: one .npy
+# file per column, plus snapshot.json with the dictionaries. It is written
+# with the standard library only, np.load() reads it, and load_snapshot()
+# memory-maps the columns in place (no copy) with or without numpy.
+# Rows are read with a chunked cursor and written chunk by chunk, so memory
+# stays flat however large the session is.
+
+SCORE_SCALE = 100
+DEFAULT_CHUNK_SIZE = 50000
+MANIFEST_NAME = 'snapshot.json'
+
+SNAPSHOT_FIELDS = ('id', 'student_id', 'student__class_level', 'subject_id', 'term', 'grade',
+                   'test_score', 'exam_score', 'total_score')
+
+# (column, array typecode) in file order; the codes are fixed-size on every platform we build on
+COLUMNS = (
+    ('id', 'q'),
+    ('student_id', 'q'),
+    ('class_level', 'b'),
+    ('subject', 'h'),
+    ('term', 'b'),
+    ('grade', 'b'),
+    ('test_score', 'i'),
+    ('exam_score', 'i'),
+    ('total_score', 'i'),
+)
+DICTIONARY_COLUMNS = ('class_level', 'subject', 'term', 'grade')
+SCORE_COLUMNS = ('test_score', 'exam_score', 'total_score')
+
+_ENDIAN = '<' if sys.byteorder == 'little' else '>'
+NPY_DESCR = {'q': _ENDIAN + 'i8', 'i': _ENDIAN + 'i4', 'h': _ENDIAN + 'i2', 'b': '|i1'}
+TYPECODES = {descr: code for code, descr in NPY_DESCR.items()}
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+NPY_HEADER_SIZE = 128  # fixed, so the row count can be filled in after the data
+
+
+def load_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def snapshot_extension():
+    return 'arrow' if load_pyarrow() else 'npz'
+
+
+def snapshot_filename(session, extension=None):
+    return 'results_{}.{}'.format(session.replace('/', '-'), extension or snapshot_extension())
+
+
+def snapshot_dictionaries(session):
+    """Code -> value lists for the dictionary columns (two small queries)."""
+    subjects = list(Subject.objects.order_by('id').values_list('id', 'name'))
+    grades = sorted(set(Result.objects.filter(session=session).values_list('grade', flat=True).distinct()))
+    return {
+        'class_level': [value for value, _ in CLASS_CHOICES],
+        'subject': [name for _, name in subjects],
+        'subject_id': [subject_id for subject_id, _ in subjects],
+        'term': [value for value, _ in TERM_CHOICES],
+        'grade': grades,
+    }
+
+
+def iter_snapshot_chunks(session, dictionaries, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield {column: array} chunks of at most ``chunk_size`` rows, in id order."""
+    codes = {
+        'class_level': {value: n for n, value in enumerate(dictionaries['class_level'])},
+        'subject': {subject_id: n for n, subject_id in enumerate(dictionaries['subject_id'])},
+        'term': {value: n for n, value in enumerate(dictionaries['term'])},
+        'grade': {value: n for n, value in enumerate(dictionaries['grade'])},
+    }
+    rows = (
+        Result.objects.filter(session=session)
+        .order_by('id')
+        .values_list(*SNAPSHOT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+    def empty():
+        return {name: array(code) for name, code in COLUMNS}
+
+    chunk = empty()
+    for result_id, student_id, class_level, subject_id, term, grade, test, exam, total in rows:
+        chunk['id'].append(result_id)
+        chunk['student_id'].append(student_id)
+        chunk['class_level'].append(codes['class_level'].get(class_level, -1))
+        chunk['subject'].append(codes['subject'].get(subject_id, -1))
+        chunk['term'].append(codes['term'].get(term, -1))
+        chunk['grade'].append(codes['grade'].get(grade, -1))
+        chunk['test_score'].append(int(test * SCORE_SCALE))
+        chunk['exam_score'].append(int(exam * SCORE_SCALE))
+        chunk['total_score'].append(int(total * SCORE_SCALE))
+        if len(chunk['id']) >= chunk_size:
+            yield chunk
+            chunk = empty()
+    if len(chunk['id']):
+        yield chunk
+
+
+def snapshot_manifest(session, dictionaries, rows):
+    return {
+        'session': session,
+        'rows': rows,
+        'score_scale': SCORE_SCALE,
+        'columns': [name for name, _ in COLUMNS],
+        'dictionaries': dictionaries,
+    }
+
+
+# Writing
+def npy_header(typecode, rows):
+    header = "{{'descr': '{}', 'fortran_order': False, 'shape': ({},), }}".format(NPY_DESCR[typecode], rows)
+    header = header.ljust(NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - 1) + '\n'
+    return NPY_MAGIC + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+def write_npz_snapshot(path, session, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    dictionaries = snapshot_dictionaries(session)
+    workdir = tempfile.mkdtemp()
+    try:
+        files = {name: open(os.path.join(workdir, name + '.npy'), 'wb') for name, _ in COLUMNS}
+        rows = 0
+        try:
+            for name, code in COLUMNS:
+                files[name].write(npy_header(code, 0))
+            for chunk in iter_snapshot_chunks(session, dictionaries, chunk_size):
+                for name, _ in COLUMNS:
+                    chunk[name].tofile(files[name])
+                rows += len(chunk['id'])
+                if progress:
+                    progress(rows)
+            for name, code in COLUMNS:
+                files[name].seek(0)
+                files[name].write(npy_header(code, rows))
+        finally:
+            for fh in files.values():
+                fh.close()
+
+        # Stored, not deflated: members must stay memory-mappable inside the archive
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+            archive.writestr(MANIFEST_NAME, json.dumps(snapshot_manifest(session, dictionaries, rows)))
+            for name, _ in COLUMNS:
+                archive.write(os.path.join(workdir, name + '.npy'), name + '.npy')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return rows
+
+
+def write_arrow_snapshot(path, session, pa, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    dictionaries = snapshot_dictionaries(session)
+    index_types = {'b': pa.int8(), 'h': pa.int16(), 'i': pa.int32(), 'q': pa.int64()}
+    values = {name: pa.array(dictionaries[name], pa.string()) for name in DICTIONARY_COLUMNS}
+    fields = [
+        pa.field(name, pa.dictionary(index_types[code], pa.string()) if name in DICTIONARY_COLUMNS
+                 else index_types[code])
+        for name, code in COLUMNS
+    ]
+    manifest = snapshot_manifest(session, dictionaries, None)
+    schema = pa.schema(fields, metadata={'exam_app': json.dumps(manifest)})
+
+    rows = 0
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for chunk in iter_snapshot_chunks(session, dictionaries, chunk_size):
+            columns = []
+            for name, code in COLUMNS:
+                column = pa.array(chunk[name], index_types[code])
+                if name in DICTIONARY_COLUMNS:
+                    # Unknown values were coded -1: null in Arrow
+                    column = pa.DictionaryArray.from_arrays(column, values[name],
+                                                            mask=pa.compute.less(column, 0))
+                columns.append(column)
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+            rows += len(chunk['id'])
+            if progress:
+                progress(rows)
+    return rows
+
+
+def write_snapshot(path, session, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Write ``session``'s results to ``path`` (.arrow or .npz by extension); returns the row count."""
+    with reporting_reads():
+        if path.endswith('.arrow'):
+            pa = load_pyarrow()
+            if pa is None:
+                raise ValueError("Arrow snapshots need pyarrow installed; write an .npz snapshot instead.")
+            import pyarrow.compute  # noqa: F401
+            return write_arrow_snapshot(path, session, pa, chunk_size, progress)
+        return write_npz_snapshot(path, session, chunk_size, progress)
+
+
+# ---------------------------
+# Loading (memory-mapped, zero copy)
+# ---------------------------
+class Snapshot:
+    """
+    Memory-mapped columns of a snapshot. ``columns`` holds numpy arrays (npz
+    with numpy installed), memoryviews (npz without numpy) or a pyarrow Table
+    (.arrow); in each case the data still lives in the mapped file.
+    """
+
+    def __init__(self, manifest, columns, mapping=None):
+        self.manifest = manifest
+        self.columns = columns
+        self.mapping = mapping
+
+    @property
+    def session(self):
+        return self.manifest['session']
+
+    @property
+    def dictionaries(self):
+        return self.manifest['dictionaries']
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def decode(self, name, code):
+        """The value behind one dictionary code (or a score in hundredths)."""
+        if name in SCORE_COLUMNS:
+            return Decimal(int(code)) / self.manifest['score_scale']
+        return self.dictionaries[name][code] if code >= 0 else None
+
+    def values(self, name):
+        """Column ``name`` decoded to Python values; a copy, for checks and small sessions."""
+        column = self.columns[name]
+        if hasattr(column, 'to_pylist'):  # Arrow decodes its own dictionaries
+            values = column.to_pylist()
+            return [self.decode(name, value) for value in values] if name in SCORE_COLUMNS else values
+        if name in DICTIONARY_COLUMNS or name in SCORE_COLUMNS:
+            return [self.decode(name, int(code)) for code in column]
+        return [int(value) for value in column]
+
+    def close(self):
+        self.columns = {}
+        if self.mapping is not None:
+            self.mapping.close()
+            self.mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_npy_header(buffer, offset):
+    if bytes(buffer[offset:offset + len(NPY_MAGIC) - 2]) != NPY_MAGIC[:-2]:
+        raise ValueError("Not an .npy column")
+    major = buffer[offset + 6]
+    size_format, size_bytes = ('<H', 2) if major == 1 else ('<I', 4)
+    start = offset + 8
+    (length,) = struct.unpack(size_format, buffer[start:start + size_bytes])
+    header = ast.literal_eval(bytes(buffer[start + size_bytes:start + size_bytes + length]).decode('latin1'))
+    return header, start + size_bytes + length
+
+
+def load_npz_snapshot(path):
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+        members = {info.filename: info for info in archive.infolist()}
+    fh = open(path, 'rb')
+    try:
+        mapping = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        fh.close()  # the mapping stays valid without the file handle
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+
+    columns = {}
+    for name in manifest['columns']:
+        info = members[name + '.npy']
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"{name}.npy is compressed; snapshots must be stored uncompressed to be mapped")
+        # Local file header: 30 fixed bytes, then the name and extra field, then the data
+        name_length, extra_length = struct.unpack('<HH', mapping[info.header_offset + 26:info.header_offset + 30])
+        offset = info.header_offset + 30 + name_length + extra_length
+        header, data_start = parse_npy_header(mapping, offset)
+        rows = header['shape'][0]
+        if numpy is not None:
+            columns[name] = numpy.frombuffer(mapping, dtype=header['descr'], count=rows, offset=data_start)
+        else:
+            if header['descr'] not in TYPECODES:
+                raise ValueError(f"{name}: cannot map {header['descr']} without numpy")
+            code = TYPECODES[header['descr']]
+            size = array(code).itemsize
+            columns[name] = memoryview(mapping)[data_start:data_start + rows * size].cast(code)
+    return Snapshot(manifest, columns, None if numpy is not None else mapping)
+
+
+def load_arrow_snapshot(path):
+    pa = load_pyarrow()
+    if pa is None:
+        raise ValueError("Reading .arrow snapshots needs pyarrow installed.")
+    source = pa.memory_map(path, 'r')
+    table = pa.ipc.open_file(source).read_all()
+    manifest = json.loads(table.schema.metadata[b'exam_app'])
+    manifest['rows'] = table.num_rows
+    return Snapshot(manifest, {name: table.column(name) for name in table.column_names}, source)
+
+
+def load_snapshot(path):
+    """Memory-map a snapshot written by write_snapshot()."""
+    if path.endswith('.arrow'):
+        return load_arrow_snapshot(path)
+    return load_npz_snapshot(path)
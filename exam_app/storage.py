@@ -0,0 +1,51 @@
+import gzip
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # .gz files only
+    brotli = None
+
+# ---------------------------
+# Hashed, precompressed static files (production profile)
+# ---------------------------
+# collectstatic writes every file under its content hash (style.<hash>.css,
+# cacheable forever) and, for text assets, a .gz (and a .br when brotli is
+# installed) next to it, so the web server (nginx gzip_static / brotli_static)
+# sends the compressed bytes without compressing on each request.
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.txt', '.map')
+MIN_COMPRESS_SIZE = 256  # smaller files gain nothing over the headers
+
+
+def compressors():
+    yield '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', brotli.compress
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield name, hashed_name, processed
+        if not dry_run:
+            for hashed_name in sorted(hashed_names):
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        with self.open(name) as fh:
+            data = fh.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, compress in compressors():
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
@@ -0,0 +1,406 @@
+from collections import Counter, namedtuple
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, IntegerField, Max, Min, Sum, Value
+from django.db.models.functions import Cast, Floor, Least
+from django.utils import timezone
+from .caching import REBUILD_SCOPE, bump_version_on_commit, results_scope, section_scopes, teacher_results_scope
+from .models import ClassSubjectSummary, CumulativeResult, Result, TermSummary, TERM_CHOICES
+
+# ---------------------------
+# Incremental summary maintenance
+# ---------------------------
+# TermSummary / ClassSubjectSummary / CumulativeResult are kept in step with
+# Result by applying deltas: each saved or deleted result only touches its
+# own three summary rows. A batch of results (bulk entry) is merged in memory
+# and written back with one locked read and bulk writes per summary model.
+# Anything that writes results without Result.save() (bulk_create, queryset
+# update/delete) must call apply_result_changes() itself, after the write.
+
+TWO_PLACES = Decimal('0.01')
+
+STATE_FIELDS = ('student_id', 'student__class_level', 'subject_id', 'term', 'session', 'total_score', 'grade',
+                'entered_by_id')
+
+# Everything needed to place one result in its summaries and cache scopes
+ResultState = namedtuple('ResultState', ['student_id', 'class_level', 'subject_id', 'term', 'session',
+                                         'total_score', 'grade', 'entered_by_id'], defaults=(None,))
+
+SUMMARY_TOTAL = DecimalField(max_digits=20, decimal_places=4)
+
+# ClassSubjectSummary.score_histogram: 10-point buckets keyed by their lower bound
+HISTOGRAM_WIDTH = 10
+HISTOGRAM_BUCKETS = tuple(range(0, 100, HISTOGRAM_WIDTH))  # the last bucket also holds 100
+
+# Written back by apply_deltas(); summary keys are looked up LOOKUP_CHUNK at a time
+SUMMARY_FIELDS = ('result_count', 'total_score', 'sum_squares', 'average', 'minimum', 'maximum', 'grade_counts',
+                  'updated_at')
+EXTRA_SUMMARY_FIELDS = {ClassSubjectSummary: ('score_histogram',), CumulativeResult: ('term_scores',)}
+LOOKUP_CHUNK = 500
+
+
+def score_bucket(score):
+    """Lower bound of the histogram bucket for a total score."""
+    return min(int(Decimal(score) // HISTOGRAM_WIDTH) * HISTOGRAM_WIDTH, HISTOGRAM_BUCKETS[-1])
+
+
+def score_bucket_expression(field='total_score'):
+    """score_bucket() in SQL, for the rebuild."""
+    return Least(
+        Cast(Floor(F(field) / HISTOGRAM_WIDTH), IntegerField()) * HISTOGRAM_WIDTH,
+        Value(HISTOGRAM_BUCKETS[-1]),
+    )
+
+
+def stored_state(pk):
+    """The summary-relevant state of result ``pk`` as it is in the database now."""
+    if pk is None:
+        return None
+    row = Result.objects.filter(pk=pk).values_list(*STATE_FIELDS).first()
+    return ResultState(*row) if row else None
+
+
+def stored_states(queryset):
+    return [ResultState(*row) for row in queryset.values_list(*STATE_FIELDS).iterator()]
+
+
+def summary_keys(state):
+    yield TermSummary, (
+        ('student_id', state.student_id), ('term', state.term), ('session', state.session),
+    )
+    yield ClassSubjectSummary, (
+        ('class_level', state.class_level), ('subject_id', state.subject_id),
+        ('term', state.term), ('session', state.session),
+    )
+    yield CumulativeResult, (
+        ('student_id', state.student_id), ('subject_id', state.subject_id), ('session', state.session),
+    )
+
+
+def result_filter(model, key):
+    """Result lookup for the rows behind one summary key."""
+    lookups = dict(key)
+    if model is ClassSubjectSummary:
+        lookups['student__class_level'] = lookups.pop('class_level')
+    return lookups
+
+
+def apply_result_changes(removed=(), added=()):
+    """
+    Fold removed and added result states into the summaries.
+    An edited result is one removed (old) state plus one added (new) state.
+    """
+    deltas = {}
+    for sign, states in ((-1, removed), (1, added)):
+        for state in states:
+            if state is None:
+                continue
+            total = Decimal(state.total_score)
+            for model, key in summary_keys(state):
+                delta = deltas.setdefault((model, key), {
+                    'count': 0, 'total': Decimal(0), 'squares': Decimal(0),
+                    'grades': Counter(), 'buckets': Counter(), 'added': [], 'removed': [], 'terms': [],
+                })
+                delta['count'] += sign
+                delta['total'] += sign * total
+                delta['squares'] += sign * total * total
+                delta['grades'][state.grade] += sign
+                delta['buckets'][str(score_bucket(total))] += sign
+                delta['added' if sign > 0 else 'removed'].append(total)
+                delta['terms'].append((sign, state.term, total))
+
+    by_model = {}
+    for (model, key), delta in deltas.items():
+        by_model.setdefault(model, {})[key] = delta
+
+    with transaction.atomic():
+        for model, model_deltas in by_model.items():
+            apply_deltas(model, model_deltas)
+        # Cached rankings, report sections and teacher pages touching these results are now stale
+        bump_version_on_commit(*(
+            scope
+            for states in (removed, added) for state in states if state is not None
+            for scope in state_scopes(state)
+        ))
+
+
+def state_scopes(state):
+    yield results_scope(state.term, state.session)
+    yield from section_scopes(state.class_level, state.subject_id, state.term, state.session)
+    if state.entered_by_id:
+        yield teacher_results_scope(state.entered_by_id)
+
+
+def locked_summaries(model, keys):
+    """
+    {key: summary} of the existing rows for ``keys``, locked for update.
+    One query per LOOKUP_CHUNK keys: each key column is matched with IN and
+    the few extra rows that combination lets through are dropped here.
+    """
+    keys = list(keys)
+    found = {}
+    for start in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[start:start + LOOKUP_CHUNK]
+        names = [name for name, _ in chunk[0]]
+        lookups = {f'{name}__in': {dict(key)[name] for key in chunk} for name in names}
+        wanted = set(chunk)
+        for summary in model.objects.select_for_update().filter(**lookups):
+            key = tuple((name, getattr(summary, name)) for name in names)
+            if key in wanted:
+                found[key] = summary
+    return found
+
+
+def apply_deltas(model, deltas):
+    """Fold {key: delta} into ``model``'s rows: one locked read, then bulk writes."""
+    existing = locked_summaries(model, deltas)
+    now = timezone.now()
+    created, updated, emptied = [], [], []
+    for key, delta in deltas.items():
+        summary = existing.get(key)
+        if summary is None:
+            if delta['count'] <= 0:
+                continue
+            summary = model(**dict(key))
+        if not merge_delta(model, key, summary, delta):
+            if summary.pk:
+                emptied.append(summary.pk)
+            continue
+        summary.updated_at = now  # bulk_update() skips auto_now
+        (updated if summary.pk else created).append(summary)
+
+    if emptied:
+        model.objects.filter(pk__in=emptied).delete()
+    model.objects.bulk_create(created, batch_size=LOOKUP_CHUNK)
+    model.objects.bulk_update(updated, SUMMARY_FIELDS + EXTRA_SUMMARY_FIELDS.get(model, ()),
+                              batch_size=LOOKUP_CHUNK)
+
+
+def merge_delta(model, key, summary, delta):
+    """Apply ``delta`` to ``summary`` in memory; False when no results are left behind it."""
+    summary.result_count += delta['count']
+    if summary.result_count <= 0:
+        return False
+
+    summary.total_score += delta['total']
+    summary.sum_squares += delta['squares']
+    grades = Counter(summary.grade_counts)
+    grades.update(delta['grades'])
+    summary.grade_counts = {grade: n for grade, n in sorted(grades.items()) if n > 0}
+    if model is ClassSubjectSummary:
+        buckets = Counter(summary.score_histogram)
+        buckets.update(delta['buckets'])
+        summary.score_histogram = {low: n for low, n in sorted(buckets.items(), key=lambda item: int(item[0]))
+                                   if n > 0}
+    if model is CumulativeResult:
+        # Removals come first, so an edited result ends up with its new score
+        for sign, term, total in delta['terms']:
+            if sign > 0:
+                summary.term_scores[term] = str(total)
+            else:
+                summary.term_scores.pop(term, None)
+        summary.term_scores = dict(sorted(summary.term_scores.items()))
+
+    if any(value in (summary.minimum, summary.maximum) for value in delta['removed']):
+        # An extreme value went away: re-read min/max for this key only
+        bounds = Result.objects.filter(**result_filter(model, key)).aggregate(
+            low=Min('total_score'), high=Max('total_score'))
+        summary.minimum, summary.maximum = bounds['low'], bounds['high']
+    else:
+        values = delta['added'] + [v for v in (summary.minimum, summary.maximum) if v is not None]
+        if values:
+            summary.minimum, summary.maximum = min(values), max(values)
+
+    summary.average = (summary.total_score / summary.result_count).quantize(TWO_PLACES)
+    return True
+
+
+# ---------------------------
+# Full rebuild
+# ---------------------------
+SUMMARY_SOURCES = (
+    (TermSummary, ('student_id', 'term', 'session'), ('student_id', 'term', 'session')),
+    (ClassSubjectSummary, ('student__class_level', 'subject_id', 'term', 'session'),
+     ('class_level', 'subject_id', 'term', 'session')),
+)
+
+
+def rebuild_summaries(session=None, batch_size=1000):
+    """Recreate every summary row (optionally for one session) from Result."""
+    results = Result.objects.all()
+    if session:
+        results = results.filter(session=session)
+
+    created = {}
+    with transaction.atomic():
+        for model, group_fields, model_fields in SUMMARY_SOURCES:
+            existing = model.objects.all()
+            if session:
+                existing = existing.filter(session=session)
+            existing.delete()
+
+            rows = (
+                results.values(*group_fields, 'grade')
+                .annotate(
+                    n=Count('id'),
+                    total=Sum('total_score', output_field=SUMMARY_TOTAL),
+                    squares=Sum(F('total_score') * F('total_score'), output_field=SUMMARY_TOTAL),
+                    low=Min('total_score'),
+                    high=Max('total_score'),
+                )
+                .order_by(*group_fields, 'grade')
+            )
+
+            batch = []
+            summary = None
+            created[model.__name__] = 0
+            for row in rows.iterator():
+                key = dict(zip(model_fields, (row[field] for field in group_fields)))
+                if summary is None or any(getattr(summary, f) != v for f, v in key.items()):
+                    if summary is not None:
+                        batch.append(finish_summary(summary))
+                    summary = model(**key, minimum=row['low'], maximum=row['high'])
+                summary.result_count += row['n']
+                summary.total_score += row['total']
+                summary.sum_squares += row['squares']
+                summary.grade_counts[row['grade']] = row['n']
+                summary.minimum = min(summary.minimum, row['low'])
+                summary.maximum = max(summary.maximum, row['high'])
+                if len(batch) >= batch_size:
+                    model.objects.bulk_create(batch)
+                    created[model.__name__] += len(batch)
+                    batch = []
+            if summary is not None:
+                batch.append(finish_summary(summary))
+            model.objects.bulk_create(batch)
+            created[model.__name__] += len(batch)
+
+        fill_score_histograms(results, batch_size)
+        created[CumulativeResult.__name__] = rebuild_cumulative(session, batch_size)
+
+        sessions = [session] if session else set(results.values_list('session', flat=True).distinct())
+        bump_version_on_commit(
+            REBUILD_SCOPE, *(results_scope(term, s) for s in sessions for term, _ in TERM_CHOICES)
+        )
+    return created
+
+
+def fill_score_histograms(results, batch_size=1000):
+    """Set ClassSubjectSummary.score_histogram for ``results`` from one aggregated query."""
+    key_fields = ('student__class_level', 'subject_id', 'term', 'session')
+    rows = (
+        results.annotate(bucket=score_bucket_expression())
+        .values(*key_fields, 'bucket')
+        .annotate(n=Count('id'))
+        .order_by(*key_fields, 'bucket')
+    )
+    histograms = {}
+    for row in rows.iterator():
+        key = tuple(row[field] for field in key_fields)
+        histograms.setdefault(key, {})[str(int(row['bucket']))] = row['n']
+
+    summaries = ClassSubjectSummary.objects.filter(session__in={key[3] for key in histograms})
+    batch = []
+    for summary in summaries.iterator():
+        summary.score_histogram = histograms.get(
+            (summary.class_level, summary.subject_id, summary.term, summary.session), {})
+        batch.append(summary)
+        if len(batch) >= batch_size:
+            ClassSubjectSummary.objects.bulk_update(batch, ['score_histogram'])
+            batch = []
+    ClassSubjectSummary.objects.bulk_update(batch, ['score_histogram'])
+
+
+def finish_summary(summary):
+    summary.average = (summary.total_score / summary.result_count).quantize(TWO_PLACES)
+    return summary
+
+
+# ---------------------------
+# Cumulative (annual) results: rebuild and consistency check
+# ---------------------------
+# Recomputed from one ordered pass over the results, (student, subject,
+# session) group by group, so neither needs more than one group in memory.
+
+CUMULATIVE_KEY = ('student_id', 'subject_id', 'session')
+CUMULATIVE_FIELDS = ('result_count', 'total_score', 'sum_squares', 'average', 'minimum', 'maximum',
+                     'grade_counts', 'term_scores')
+
+
+def compute_cumulative(session=None):
+    """Unsaved CumulativeResult rows computed from Result, in CUMULATIVE_KEY order."""
+    results = Result.objects.all()
+    if session:
+        results = results.filter(session=session)
+    rows = results.order_by(*CUMULATIVE_KEY, 'term').values_list(*CUMULATIVE_KEY, 'term', 'total_score', 'grade')
+    summary = None
+    for student_id, subject_id, row_session, term, total, grade in rows.iterator():
+        if summary is None or (summary.student_id, summary.subject_id, summary.session) != (
+                student_id, subject_id, row_session):
+            if summary is not None:
+                yield finish_summary(summary)
+            summary = CumulativeResult(student_id=student_id, subject_id=subject_id, session=row_session,
+                                       minimum=total, maximum=total)
+        summary.result_count += 1
+        summary.total_score += total
+        summary.sum_squares += total * total
+        summary.grade_counts[grade] = summary.grade_counts.get(grade, 0) + 1
+        summary.term_scores[term] = str(total)
+        summary.minimum, summary.maximum = min(summary.minimum, total), max(summary.maximum, total)
+    if summary is not None:
+        yield finish_summary(summary)
+
+
+def rebuild_cumulative(session=None, batch_size=1000):
+    """Recreate CumulativeResult (optionally for one session) from Result; returns the row count."""
+    created = 0
+    with transaction.atomic():
+        existing = CumulativeResult.objects.all()
+        if session:
+            existing = existing.filter(session=session)
+        existing.delete()
+        batch = []
+        for summary in compute_cumulative(session):
+            summary.grade_counts = dict(sorted(summary.grade_counts.items()))
+            batch.append(summary)
+            if len(batch) >= batch_size:
+                CumulativeResult.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        CumulativeResult.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def check_cumulative(session=None, limit=20):
+    """
+    Compare the stored CumulativeResult rows with a from-scratch computation.
+    Returns (rows checked, [(key, message)] for up to ``limit`` differences).
+    """
+    stored = CumulativeResult.objects.all()
+    if session:
+        stored = stored.filter(session=session)
+    stored = stored.order_by(*CUMULATIVE_KEY).iterator()
+    expected = compute_cumulative(session)
+
+    def key(summary):
+        return None if summary is None else (summary.student_id, summary.subject_id, summary.session)
+
+    checked, problems = 0, []
+    have, want = next(stored, None), next(expected, None)
+    while (have or want) and len(problems) < limit:
+        checked += 1
+        if want is None or (have is not None and key(have) < key(want)):
+            problems.append((key(have), "stored row has no results behind it"))
+            have = next(stored, None)
+        elif have is None or key(want) < key(have):
+            problems.append((key(want), "missing"))
+            want = next(expected, None)
+        else:
+            for field in CUMULATIVE_FIELDS:
+                if getattr(have, field) != getattr(want, field):
+                    problems.append((key(want), f"{field} is {getattr(have, field)!r}, "
+                                                f"expected {getattr(want, field)!r}"))
+                    break
+            have, want = next(stored, None), next(expected, None)
+    return checked, problems
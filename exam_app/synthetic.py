@@ -0,0 +1,213 @@
+import random
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from .grading import get_scale
+from .models import CLASS_CHOICES, TERM_CHOICES, Result, Student, Subject, TeacherProfile, normalize_name
+
+# ---------------------------
+# Synthetic dataset generator
+# ---------------------------
+# Everything is drawn from one seeded random.Random, so the same arguments
+# always produce the same students, scores and grades. Generated teachers and
+# subjects are found by name and picked by position, so the rows don't depend
+# on the ids the database hands out or on other teachers already in the table.
+# Teachers, subjects and grade scales are loaded once up front; students and their results are then
+# inserted batch_size students at a time, one transaction per batch.
+# Results are written with executemany() on pre-adapted tuples: building
+# 50M model instances costs several times more than the inserts themselves.
+# That skips Result.save() and the signals, so summaries are rebuilt in one
+# pass at the end.
+
+FIRST_NAMES = [
+    'Adaeze', 'Chinedu', 'Ngozi', 'Emeka', 'Funmilayo', 'Tunde', 'Aisha', 'Ibrahim', 'Zainab', 'Musa',
+    'Chioma', 'Obinna', 'Yetunde', 'Segun', 'Halima', 'Abdullahi', 'Ifeoma', 'Kelechi', 'Bisi', 'Femi',
+    'John', 'Jane', 'Michael', 'Sarah', 'David', 'Emily', 'Daniel', 'Laura', 'James', 'Olivia',
+]
+LAST_NAMES = [
+    'Okafor', 'Adeyemi', 'Bello', 'Okonkwo', 'Balogun', 'Eze', 'Abubakar', 'Nwosu', 'Ogunleye', 'Usman',
+    'Afolabi', 'Obi', 'Lawal', 'Chukwu', 'Olawale', 'Danjuma', 'Nnamdi', 'Ajayi', 'Yusuf', 'Onyeka',
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Miller', 'Davis', 'Garcia', 'Wilson', 'Taylor',
+]
+SUBJECT_NAMES = [
+    'Mathematics', 'English Language', 'Biology', 'Chemistry', 'Physics', 'Economics',
+    'Geography', 'Government', 'Literature in English', 'Civic Education', 'Agricultural Science',
+    'Further Mathematics',
+]
+DEFAULT_SESSIONS = ('2023/2024', '2024/2025')
+TEACHER_PASSWORD = 'password'
+
+TEST_MAX, EXAM_MAX = 30, 70
+SCORES = [Decimal(n) for n in range(TEST_MAX + EXAM_MAX + 1)]
+
+RESULT_FIELDS = ('student', 'subject', 'test_score', 'exam_score', 'total_score', 'grade', 'term', 'session',
+                 'entered_by', 'created_at')
+
+
+@contextmanager
+def fast_sqlite_writes():
+    """
+    WAL journal and synchronous=OFF while the block runs (SQLite only).
+    A crash mid-load can lose the load, never earlier data; synchronous is
+    restored afterwards, WAL stays on (it is a property of the file).
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        previous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=OFF')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA synchronous={int(previous)}')
+
+
+class DatasetGenerator:
+    def __init__(self, seed=42, teachers_per_class=2, subjects=len(SUBJECT_NAMES), subjects_per_student=9,
+                 sessions=DEFAULT_SESSIONS, terms=None, results=True, prefix='STU', batch_size=5000, result_batch_size=20000):
+        self.random = random.Random(seed)
+        self.teachers_per_class = teachers_per_class
+        self.subject_count = max(1, min(subjects, len(SUBJECT_NAMES)))
+        self.subjects_per_student = max(1, min(subjects_per_student, self.subject_count))
+        self.sessions = list(sessions)
+        self.terms = list(terms or [term for term, _ in TERM_CHOICES])
+        self.with_results = results
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.result_batch_size = result_batch_size
+
+    # Reference data, loaded once
+    def ensure_teachers(self):
+        """
+        {class_level: [teacher ids]} of the generated teachers, creating the
+        missing ones. Ids are listed in teacher-number order, whatever other
+        teachers exist, so the same seed assigns the same teachers.
+        """
+        names = {
+            class_level: [f'{class_level} Teacher {n}' for n in range(1, self.teachers_per_class + 1)]
+            for class_level, _ in CLASS_CHOICES
+        }
+        wanted = [normalize_name(name) for pool in names.values() for name in pool]
+        existing = dict(TeacherProfile.objects.filter(name_normalized__in=wanted)
+                        .values_list('name_normalized', 'id'))
+        password = None
+        missing = []
+        for class_level, pool in names.items():
+            for name in pool:
+                if normalize_name(name) in existing:
+                    continue
+                password = password or make_password(TEACHER_PASSWORD)  # hash once, not per teacher
+                missing.append(TeacherProfile(
+                    name=name, name_normalized=normalize_name(name), class_level=class_level, password=password,
+                ))
+        if missing:
+            TeacherProfile.objects.bulk_create(missing)
+            existing = dict(TeacherProfile.objects.filter(name_normalized__in=wanted)
+                            .values_list('name_normalized', 'id'))
+        return {
+            class_level: [existing[normalize_name(name)] for name in pool]
+            for class_level, pool in names.items()
+        }
+
+    def ensure_subjects(self):
+        """Subject ids in SUBJECT_NAMES order; the generator only ever picks them by position."""
+        names = SUBJECT_NAMES[:self.subject_count]
+        existing = dict(Subject.objects.filter(name__in=names).values_list('name', 'id'))
+        Subject.objects.bulk_create([Subject(name=name) for name in names if name not in existing])
+        existing = dict(Subject.objects.filter(name__in=names).values_list('name', 'id'))
+        return [existing[name] for name in names]
+
+    def grade_tables(self):
+        """Scores are whole numbers, so every session's grades fit in a lookup list."""
+        return {session: [get_scale(session).grade(score) for score in SCORES] for session in self.sessions}
+
+    # Row generation
+    def make_student(self, number, teachers):
+        rnd = self.random
+        class_level = rnd.choice(CLASS_CHOICES)[0]
+        pool = teachers[class_level]
+        student = Student(
+            first_name=rnd.choice(FIRST_NAMES),
+            last_name=rnd.choice(LAST_NAMES),
+            reg_no=f'{self.prefix}{number:07d}',
+            class_level=class_level,
+            teacher_id=rnd.choice(pool) if pool else None,
+        )
+        student.set_search_keys()  # bulk_create skips save()
+        return student
+
+    def make_results(self, student, subjects, difficulty, grades, scores, created_at):
+        """
+        Result rows (tuples in RESULT_FIELDS order) for one student. Scores follow
+        student ability plus subject difficulty plus noise, so rankings look real.
+        """
+        rnd = self.random
+        ability = rnd.gauss(0, 1)
+        taken = rnd.sample(subjects, self.subjects_per_student)
+        for session in self.sessions:
+            for term in self.terms:
+                for subject_id in taken:
+                    level = 0.55 + 0.15 * (ability + difficulty[subject_id] + rnd.gauss(0, 0.6))
+                    test = min(TEST_MAX, max(0, round(TEST_MAX * (level + rnd.gauss(0, 0.08)))))
+                    exam = min(EXAM_MAX, max(0, round(EXAM_MAX * (level + rnd.gauss(0, 0.08)))))
+                    yield (student.id, subject_id, scores[test], scores[exam], scores[test + exam],
+                           grades[session][test + exam], term, session, student.teacher_id, created_at)
+
+    def insert_students(self, students):
+        Student.objects.bulk_create(students)
+        if students and students[0].id is None:  # backend cannot return ids from bulk inserts
+            ids = dict(Student.objects.filter(reg_no__in=[s.reg_no for s in students]).values_list('reg_no', 'id'))
+            for student in students:
+                student.id = ids[student.reg_no]
+
+    def insert_results(self, rows):
+        fields = [Result._meta.get_field(name) for name in RESULT_FIELDS]
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(Result._meta.db_table),
+            ', '.join(connection.ops.quote_name(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+    def run(self, total, start=1, progress=None):
+        """Insert ``total`` students numbered from ``start`` (plus results). Returns counts."""
+        teachers = self.ensure_teachers()
+        subjects = self.ensure_subjects()
+        difficulty = {subject_id: self.random.gauss(0, 0.5) for subject_id in subjects}
+        grades = self.grade_tables()
+        # Adapted once for the backend; every row reuses these values
+        scores = [connection.ops.adapt_decimalfield_value(score, 5, 2) for score in SCORES]
+        created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+
+        stats = {'students': 0, 'results': 0, 'elapsed': 0.0}
+        started = time.perf_counter()
+        for batch_start in range(start, start + total, self.batch_size):
+            batch_end = min(batch_start + self.batch_size, start + total)
+            with transaction.atomic():
+                students = [self.make_student(n, teachers) for n in range(batch_start, batch_end)]
+                self.insert_students(students)
+                stats['students'] += len(students)
+                if self.with_results:
+                    pending = []
+                    for student in students:
+                        pending.extend(self.make_results(student, subjects, difficulty, grades, scores, created_at))
+                        if len(pending) >= self.result_batch_size:
+                            self.insert_results(pending)
+                            stats['results'] += len(pending)
+                            pending = []
+                    if pending:
+                        self.insert_results(pending)
+                        stats['results'] += len(pending)
+            stats['elapsed'] = time.perf_counter() - started
+            if progress:
+                progress(stats)
+        return stats
@@ -1,3 +1,1832 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import gzip
+import io
+import json
+import os
+import re
+import runpy
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages.storage import default_storage
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.backends.utils import CursorWrapper
+from django.db.models import Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.urls import include, path
+from django.test import AsyncRequestFactory, Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from . import async_views, bulk, views
+from .benchmarking import compare_reports, latency_summary, measure_request, percentiles
+from .instrumentation import RequestMetrics
+from .jobs import claim_job, enqueue, requeue_stale, run_job, sweep_job_files
+from .middleware import CsrfSafeGZipMiddleware, LRUCache, ReplicaRoutingMiddleware, local_teachers
+from .analytics import grade_analytics
+from .bulk import BulkEntryError, save_results
+from .broadsheet import Broadsheet, competition_ranks, iter_broadsheet_csv
+from .caching import DEFAULT_TIMEOUT, bump_version, entry_timeout, section_scope, section_scopes
+from .exports import iter_results_csv
+from .forms import ResultForm
+from .grading import DEFAULT_BOUNDARIES, get_scale, grade_for, regrade_session
+from .models import (
+    ClassSubjectSummary, CumulativeResult, GradeBoundary, Job, Result, Student, Subject, TeacherProfile, TermSummary,
+)
+from .pagination import RESULT_KEYSET, decode_cursor, encode_cursor, keyset_page
+from .queries import ResultStatistics, SummaryStatistics, results_overview, section_rows
+from .ranking import class_positions_query, positions_by_student, subject_positions_query
+from .report_cards import build_contexts
+from .routers import ReplicaRouter, pin_database, reporting_reads, reporting_view
+from .search import prefix_filter, search_students
+from .signals import build_missing_summaries
+from .snapshots import load_pyarrow, load_snapshot, write_snapshot
+from .summaries import check_cumulative, rebuild_cumulative, rebuild_summaries, score_bucket
+from .synthetic import DatasetGenerator
+from .throttle import client_ip
+from .urls import app_urlpatterns
 
-# Create your tests here.
+# ---------------------------
+# Streaming CSV export
+# ---------------------------
+class ResultExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        TeacherProfile.objects.create(name='Export EO', password='pw', is_eo=True)
+        maths = Subject.objects.create(name='Mathematics')
+        for n, (class_level, term) in enumerate([('SS1', '1'), ('SS1', '2'), ('SS2', '1')]):
+            student = Student.objects.create(first_name=f'S{n}', last_name='Obi', reg_no=f'E/{n}',
+                                             class_level=class_level)
+            Result.objects.create(student=student, subject=maths, test_score=20, exam_score=40 + n, term=term,
+                                  session='2024/2025')
+
+    def setUp(self):
+        cache.clear()
+        local_teachers.clear()
+        self.client.post('/login/', {'name': 'export eo', 'password': 'pw'})
+
+    def export(self, **params):
+        response = self.client.get('/eo/view-results/', dict(params, download='csv'))
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode().splitlines()
+
+    def test_all_rows_in_class_order(self):
+        response, lines = self.export()
+        self.assertEqual(lines[0], 'Student,Class,Subject,Total Score,Grade,Term,Session')
+        self.assertEqual(lines[1:], [
+            'S0 Obi,SS1,Mathematics,60.00,B,1,2024/2025',
+            'S1 Obi,SS1,Mathematics,61.00,B,2,2024/2025',
+            'S2 Obi,SS2,Mathematics,62.00,B,1,2024/2025',
+        ])
+        self.assertIn('filename="all_results.csv"', response['Content-Disposition'])
+
+    def test_filters_and_filename(self):
+        response, lines = self.export(class_level='SS1', term='1', session='2024/2025')
+        self.assertEqual(lines[1:], ['S0 Obi,SS1,Mathematics,60.00,B,1,2024/2025'])
+        self.assertIn('filename="all_results_SS1_1_2024-2025.csv"', response['Content-Disposition'])
+
+    def test_rows_come_from_one_chunked_cursor(self):
+        queryset = Result.objects.all()
+        with self.assertNumQueries(1):
+            lines = list(iter_results_csv(queryset, chunk_size=1))
+        self.assertEqual(len(lines), 4)
+
+
+# ---------------------------
+# Keyset pagination
+# ---------------------------
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        TeacherProfile.objects.create(name='Page EO', password='pw', is_eo=True)
+        cls.maths = Subject.objects.create(name='Mathematics')
+        # Duplicate names, so only the id keeps the order total
+        for n in range(7):
+            student = Student.objects.create(first_name='Ada' if n % 2 else 'Bola', last_name='Obi' if n < 4 else 'Eze',
+                                             reg_no=f'P/{n}', class_level='SS1')
+            Result.objects.create(student=student, subject=cls.maths, test_score=20, exam_score=40 + n, term='1',
+                                  session='2024/2025')
+
+    def setUp(self):
+        cache.clear()
+        local_teachers.clear()
+
+    def test_pages_cover_every_row_once_in_order(self):
+        queryset = section_rows({}, self.maths.id)
+        expected = [row['id'] for row in queryset.order_by(*RESULT_KEYSET)]
+        seen, after = [], None
+        while True:
+            rows, after = keyset_page(queryset, after=after, limit=3)
+            self.assertLessEqual(len(rows), 3)
+            seen += [row['id'] for row in rows]
+            if not after:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_cursor_round_trip_and_tampering(self):
+        values = ['SS1', 'Mathematics', 'Obi', 'Ada', 12]
+        self.assertEqual(decode_cursor(encode_cursor(values)), values)
+        for token in ('not base64!', encode_cursor(['SS1']), encode_cursor({'a': 1})):
+            with self.assertRaises(ValueError):
+                decode_cursor(token)
+
+    def test_section_endpoint(self):
+        self.client.post('/login/', {'name': 'page eo', 'password': 'pw'})
+        url = '/eo/view-results/section/'
+        first = self.client.get(url, {'class_level': 'SS1', 'subject': self.maths.id, 'limit': 5}).json()
+        self.assertEqual(first['count'], 5)
+        rest = self.client.get(url, {'class_level': 'SS1', 'subject': self.maths.id, 'limit': 5,
+                                     'after': first['next']}).json()
+        self.assertEqual((rest['count'], rest['next']), (2, None))
+        bad = self.client.get(url, {'class_level': 'SS1', 'subject': self.maths.id, 'after': 'xx'})
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(self.client.get(url, {'class_level': 'SS1'}).status_code, 400)
+
+
+# ---------------------------
+# Result statistics
+# ---------------------------
+class ResultStatisticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        TeacherProfile.objects.create(name='Stats Export EO', password='pw', is_eo=True)
+        maths, physics = Subject.objects.create(name='Mathematics'), Subject.objects.create(name='Physics')
+        scores = {('SS1', maths): (50, 60, 70), ('SS1', physics): (40,), ('SS2', maths): (80, 90)}
+        n = 0
+        for (class_level, subject), totals in scores.items():
+            for total in totals:
+                n += 1
+                student = Student.objects.create(first_name=f'S{n}', last_name='Obi', reg_no=f'ST/{n}',
+                                                 class_level=class_level)
+                Result.objects.create(student=student, subject=subject, test_score=0, exam_score=total, term='1',
+                                      session='2024/2025')
+
+    def test_grouped_in_one_query(self):
+        statistics = ResultStatistics()
+        with self.assertNumQueries(1):
+            rows = statistics.by_class_subject()
+        ss1_maths = rows[0]
+        self.assertEqual((ss1_maths['student__class_level'], ss1_maths['subject__name']), ('SS1', 'Mathematics'))
+        self.assertEqual((ss1_maths['count'], ss1_maths['minimum'], ss1_maths['maximum']), (3, 50, 70))
+        self.assertAlmostEqual(float(ss1_maths['average']), 60)
+        self.assertAlmostEqual(float(ss1_maths['stddev']), (200 / 3) ** 0.5)  # population standard deviation
+        self.assertEqual([row['count'] for row in statistics.by_class()], [4, 2])
+        self.assertEqual(ResultStatistics(params={'class_level': 'SS2'}).overall()['count'], 2)
+
+    def test_summaries_give_the_same_figures(self):
+        for exact, summary in zip(ResultStatistics().by_class_subject(), SummaryStatistics().by_class_subject()):
+            self.assertEqual((exact['count'], exact['minimum'], exact['maximum']),
+                             (summary['count'], summary['minimum'], summary['maximum']))
+            self.assertAlmostEqual(float(exact['average']), float(summary['average']))
+            self.assertAlmostEqual(float(exact['stddev']), float(summary['stddev']))
+
+    def test_statistics_export(self):
+        cache.clear()
+        local_teachers.clear()
+        self.client.post('/login/', {'name': 'stats export eo', 'password': 'pw'})
+        response = self.client.get('/eo/view-results/', {'download': 'stats', 'class_level': 'SS1'})
+        self.assertIn('result_statistics_SS1.csv', response['Content-Disposition'])
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), [
+            'Class,Subject,Results,Average,Minimum,Maximum,Std Dev',
+            'SS1,Mathematics,3,60.00,50.00,70.00,8.16',
+            'SS1,Physics,1,40.00,40.00,40.00,0.00',
+            'SS1,All subjects,4,55.00,40.00,70.00,11.18',
+        ])
+
+
+# ---------------------------
+# Incremental summaries
+# ---------------------------
+class SummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.maths = Subject.objects.create(name='Mathematics')
+        cls.student = Student.objects.create(first_name='Ada', last_name='Obi', reg_no='SU/1', class_level='SS1')
+
+    def add(self, score, student=None, term='1'):
+        return Result.objects.create(student=student or self.student, subject=self.maths, test_score=0,
+                                     exam_score=score, term=term, session='2024/2025')
+
+    def class_summaries(self):
+        return sorted(ClassSubjectSummary.objects.values_list('class_level', 'term', 'result_count'))
+
+    def snapshot(self):
+        return [
+            sorted(tuple(str(v) for k, v in row.items() if k not in ('id', 'updated_at'))
+                   for row in model.objects.values())
+            for model in (TermSummary, ClassSubjectSummary, CumulativeResult)
+        ]
+
+    def test_deltas_match_a_full_rebuild(self):
+        students = [self.student] + [
+            Student.objects.create(first_name=f'S{n}', last_name='Obi', reg_no=f'SU/{n}', class_level='SS1')
+            for n in (2, 3)
+        ]
+        results = [self.add(score, student=student) for score, student in zip((45, 62, 80), students)]
+        self.add(71, student=students[1], term='2')
+        results[0].exam_score = 90  # new maximum
+        results[0].save()
+        results[2].delete()  # old maximum
+        summary = ClassSubjectSummary.objects.get(term='1')
+        self.assertEqual((summary.result_count, summary.minimum, summary.maximum, summary.average),
+                         (2, Decimal('62.00'), Decimal('90.00'), Decimal('76.00')))
+        self.assertEqual(summary.grade_counts, {'A': 1, 'B': 1})
+
+        incremental = self.snapshot()
+        rebuild_summaries()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_last_result_removes_the_row(self):
+        result = self.add(60)
+        result.delete()
+        self.assertFalse(ClassSubjectSummary.objects.exists())
+        self.assertFalse(TermSummary.objects.exists())
+
+    def test_one_save_touches_only_its_rows(self):
+        self.add(60)
+        other = Subject.objects.create(name='Physics')
+        Result.objects.create(student=self.student, subject=other, test_score=0, exam_score=50, term='1',
+                              session='2024/2025')
+        before = ClassSubjectSummary.objects.get(subject=self.maths).updated_at
+        Result.objects.create(student=self.student, subject=other, test_score=0, exam_score=55, term='2',
+                              session='2024/2025')
+        self.assertEqual(ClassSubjectSummary.objects.get(subject=self.maths).updated_at, before)
+
+    def test_class_change_moves_results(self):
+        self.add(60)
+        self.add(70, term='2')
+        self.student.class_level = 'SS2'
+        self.student.save()
+        self.assertEqual(self.class_summaries(), [('SS2', '1', 1), ('SS2', '2', 1)])
+        summary = ClassSubjectSummary.objects.get(class_level='SS2', term='1')
+        self.assertEqual((summary.score_histogram, summary.grade_counts), ({'60': 1}, {'B': 1}))
+        self.assertEqual(TermSummary.objects.get(term='1').result_count, 1)
+
+    def test_no_rebuild_on_backward_migration(self):
+        self.add(60)
+        ClassSubjectSummary.objects.all().delete()
+        build_missing_summaries(sender=None, plan=[(None, True)])
+        self.assertFalse(ClassSubjectSummary.objects.exists())
+        build_missing_summaries(sender=None, plan=[(None, False)])
+        self.assertTrue(ClassSubjectSummary.objects.exists())
+
+
+# ---------------------------
+# Bulk result entry
+# ---------------------------
+class BulkEntryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = TeacherProfile.objects.create(name='Bulk Teacher', password='pw', class_level='SS1')
+        cls.maths = Subject.objects.create(name='Mathematics')
+        cls.students = [Student.objects.create(first_name=f'S{n}', last_name='Obi', reg_no=f'BK/{n}',
+                                               class_level='SS1') for n in range(3)]
+        cls.outsider = Student.objects.create(first_name='Out', last_name='Side', reg_no='BK/X', class_level='SS2')
+
+    def setUp(self):
+        cache.clear()
+        local_teachers.clear()
+        self.client.post('/login/', {'name': 'bulk teacher', 'password': 'pw'})
+
+    def row(self, reg_no, exam_score=50, **extra):
+        return dict({'reg_no': reg_no, 'subject': 'mathematics', 'test_score': 20, 'exam_score': exam_score,
+                     'term': '1', 'session': '2024/2025'}, **extra)
+
+    def upload(self, name, content):
+        return self.client.post('/teacher/upload-results/', {'file': SimpleUploadedFile(name, content)})
+
+    def test_grid_saves_graded_results_and_summaries(self):
+        data = {'subject': self.maths.id, 'term': '1', 'session': '2024/2025'}
+        data.update({f'test_{s.id}': '20' for s in self.students[:2]})
+        data.update({f'exam_{s.id}': '55' for s in self.students[:2]})
+        response = self.client.post('/teacher/input-results/bulk/', data)
+        self.assertRedirects(response, '/teacher/dashboard/', fetch_redirect_response=False)
+        self.assertEqual(list(Result.objects.values_list('total_score', 'grade', 'entered_by')),
+                         [(Decimal('75.00'), 'A', self.teacher.id)] * 2)
+        self.assertEqual(ClassSubjectSummary.objects.get().result_count, 2)
+
+    def test_summary_writes_do_not_grow_with_the_rows(self):
+        def summary_queries(rows):
+            with CaptureQueriesContext(connection) as queries:
+                save_results(self.teacher, rows)
+            return len([q for q in queries if 'summary' in q['sql'] or 'cumulative' in q['sql']])
+
+        save_results(self.teacher, [self.row('BK/0')])
+        rows = [self.row(s.reg_no, term='2') for s in self.students] + [
+            self.row(s.reg_no, term='3', exam_score=10 * n) for n, s in enumerate(self.students)]
+        # At most one locked read, one insert and one update per summary model, whatever the rows
+        self.assertLessEqual(summary_queries(rows), 9)
+
+        def stored():
+            return [list(model.objects.order_by(*fields[:2]).values_list(*fields)) for model, fields in (
+                (TermSummary, ('student', 'term', 'result_count', 'total_score', 'grade_counts')),
+                (ClassSubjectSummary, ('subject', 'term', 'result_count', 'minimum', 'maximum', 'score_histogram')),
+            )]
+        incremental = stored()
+        rebuild_summaries()
+        self.assertEqual(stored(), incremental)
+        self.assertEqual(check_cumulative()[1], [])
+
+    def test_every_bad_row_is_reported_and_nothing_saved(self):
+        Result.objects.create(student=self.students[0], subject=self.maths, test_score=1, exam_score=1, term='1',
+                              session='2024/2025')
+        rows = [self.row('BK/0'), self.row('BK/1', exam_score='x'), self.row('BK/X'), self.row('BK/2', term='9'),
+                self.row('BK/2'), self.row('BK/2')]
+        with self.assertRaises(BulkEntryError) as caught:
+            save_results(self.teacher, rows)
+        self.assertEqual([number for number, _ in caught.exception.errors], [1, 2, 3, 4, 6])
+        self.assertEqual(Result.objects.count(), 1)
+
+    def test_concurrent_entry_is_a_row_error(self):
+        def validate_then_race(teacher, rows):
+            results = real_build_results(teacher, rows)
+            if not Result.objects.exists():  # another teacher saves the same result meanwhile
+                Result.objects.create(student=self.students[0], subject=self.maths, test_score=1, exam_score=1,
+                                      term='1', session='2024/2025')
+            return results
+
+        real_build_results = bulk.build_results
+        with mock.patch.object(bulk, 'build_results', side_effect=validate_then_race):
+            with self.assertRaises(BulkEntryError) as caught:
+                save_results(self.teacher, [self.row('BK/0'), self.row('BK/1')])
+        self.assertIn('already exists', caught.exception.errors[0][1])
+        self.assertEqual(Result.objects.count(), 1)
+
+    def test_csv_upload(self):
+        response = self.upload('results.csv', b'reg_no,subject,test_score,exam_score,term,session\n'
+                                              b'BK/0,Mathematics,20,50,1,2024/2025\n\nBK/1,Mathematics,10,30,1,2024/2025\n')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(sorted(Result.objects.values_list('grade', flat=True)), ['A', 'E'])
+
+    def test_unreadable_files_are_form_errors(self):
+        files = (('results.csv', b'reg_no,subject\n"' + b'x' * 200_000 + b'\n'),  # csv.Error: field too large
+                 ('results.xlsx', b'PK\x03\x04junk'), ('results.txt', b'reg_no\n'))
+        for name, content in files:
+            response = self.upload(name, content)
+            self.assertEqual(response.status_code, 200, name)
+            errors = [str(m) for m in response.context['messages'] if m.level_tag == 'error']
+            self.assertEqual(len(errors), 1, name)
+        self.assertFalse(Result.objects.exists())
+
+    def test_json_api(self):
+        response = self.client.post('/api/results/bulk/', json.dumps({'rows': [self.row('BK/0')]}),
+                                    content_type='application/json')
+        self.assertEqual((response.status_code, response.json()), (201, {'created': 1}))
+        response = self.client.post('/api/results/bulk/', json.dumps({'rows': [self.row('BK/0')]}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['row'], 1)
+        self.assertEqual(self.client.post('/api/results/bulk/', '[]', content_type='application/json').status_code,
+                         400)
+
+    def test_non_finite_scores_are_row_errors(self):
+        rows = [self.row('BK/0', exam_score='NaN'), self.row('BK/1', test_score='Infinity'),
+                self.row('BK/2', exam_score='sNaN')]
+        response = self.client.post('/api/results/bulk/', json.dumps({'rows': rows}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.json()['errors']], [1, 2, 3])
+        data = {'subject': self.maths.id, 'term': '1', 'session': '2024/2025',
+                f'test_{self.students[0].id}': '20', f'exam_{self.students[0].id}': 'NaN'}
+        self.assertEqual(self.client.post('/teacher/input-results/bulk/', data).status_code, 200)
+        self.assertFalse(Result.objects.exists())
+
+
+# ---------------------------
+# Grade scales
+# ---------------------------
+class GradeScaleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.maths = Subject.objects.create(name='Mathematics')
+        cls.student = Student.objects.create(first_name='Ada', last_name='Obi', reg_no='GS/1', class_level='SS1')
+
+    def setUp(self):
+        cache.clear()
+
+    def boundaries(self, session, *pairs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [GradeBoundary.objects.create(session=session, min_score=low, grade=grade) for low, grade in pairs]
+
+    def test_default_scale(self):
+        scale = get_scale('2024/2025')
+        self.assertEqual(scale.boundaries, DEFAULT_BOUNDARIES)
+        scores = [0, '39.99', 40, 45, '69.99', 70, 100]
+        self.assertEqual(scale.grade_many(scores), ['F', 'F', 'E', 'D', 'B', 'A', 'A'])
+        self.assertEqual([scale.grade(score) for score in scores], scale.grade_many(scores))
+
+    def test_session_scale_then_school_default(self):
+        self.boundaries('', (50, 'P'), (0, 'F'))
+        self.boundaries('2024/2025', (80, 'A'), (0, 'B'))
+        self.assertEqual(grade_for(75, '2024/2025'), 'B')
+        self.assertEqual(grade_for(75, '2023/2024'), 'P')
+        result = Result.objects.create(student=self.student, subject=self.maths, test_score=30, exam_score=55,
+                                       term='1', session='2024/2025')
+        self.assertEqual(result.grade, 'A')
+
+    def test_boundary_changes_reach_the_cached_scale(self):
+        boundary, _ = self.boundaries('2024/2025', (80, 'A'), (0, 'B'))
+        self.assertEqual(grade_for(75, '2024/2025'), 'B')
+        boundary.min_score = 70
+        with self.captureOnCommitCallbacks(execute=True):
+            boundary.save()
+        self.assertEqual(grade_for(75, '2024/2025'), 'A')
+
+        # Moving boundaries to another session changes both sessions' scales
+        self.assertEqual(grade_for(55, '2025/2026'), 'C')  # the built-in default
+        with self.captureOnCommitCallbacks(execute=True):
+            for row in GradeBoundary.objects.all():
+                row.session = '2025/2026'
+                row.save()
+        self.assertEqual((grade_for(55, '2024/2025'), grade_for(55, '2025/2026')), ('C', 'B'))
+
+    def test_regrade_session(self):
+        result = Result.objects.create(student=self.student, subject=self.maths, test_score=30, exam_score=35,
+                                       term='1', session='2024/2025')
+        self.assertEqual(result.grade, 'B')
+        self.boundaries('2024/2025', (60, 'P'), (0, 'F'))
+        self.assertEqual(regrade_session('2024/2025'), (1, 1))
+        self.assertEqual(Result.objects.get().grade, 'P')
+        self.assertEqual(ClassSubjectSummary.objects.get().grade_counts, {'P': 1})
+        self.assertEqual(regrade_session('2024/2025'), (1, 0))
+
+    def test_rerun_after_interruption_rebuilds_summaries(self):
+        Result.objects.create(student=self.student, subject=self.maths, test_score=30, exam_score=35, term='1',
+                              session='2024/2025')
+        self.boundaries('2024/2025', (60, 'P'), (0, 'F'))
+        with mock.patch('exam_app.grading.rebuild_summaries', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                regrade_session('2024/2025')
+        self.assertEqual(Result.objects.get().grade, 'P')  # the batch committed...
+        self.assertEqual(ClassSubjectSummary.objects.get().grade_counts, {'B': 1})  # ...the rebuild didn't run
+        self.assertEqual(regrade_session('2024/2025'), (1, 0))
+        self.assertEqual(ClassSubjectSummary.objects.get().grade_counts, {'P': 1})
+        self.assertEqual(TermSummary.objects.get().grade_counts, {'P': 1})
+
+
+# ---------------------------
+# Class and subject positions
+# ---------------------------
+class RankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.maths = Subject.objects.create(name='Mathematics')
+        cls.physics = Subject.objects.create(name='Physics')
+        # SS1 averages 70, 65, 65, 50 -> positions 1, 2, 2, 4; SS2 is ranked on its own
+        scores = {'Ada': (40, 40), 'Bola': (40, 30), 'Chidi': (30, 40), 'Dayo': (20, 20)}
+        cls.students = {}
+        for n, (name, (maths, physics)) in enumerate(scores.items()):
+            student = Student.objects.create(first_name=name, last_name='Obi', reg_no=f'RK/{n}', class_level='SS1')
+            cls.students[name] = student
+            for subject, exam_score in ((cls.maths, maths), (cls.physics, physics)):
+                Result.objects.create(student=student, subject=subject, test_score=30, exam_score=exam_score,
+                                      term='1', session='2024/2025')
+        cls.students['Eze'] = Student.objects.create(first_name='Eze', last_name='Obi', reg_no='RK/9',
+                                                     class_level='SS2')
+        Result.objects.create(student=cls.students['Eze'], subject=cls.maths, test_score=10, exam_score=10,
+                              term='1', session='2024/2025')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_class_positions_share_ties_and_skip(self):
+        ranked = positions_by_student('1', '2024/2025')
+        positions = {name: ranked[student.id]['position'] for name, student in self.students.items()}
+        self.assertEqual(positions, {'Ada': 1, 'Bola': 2, 'Chidi': 2, 'Dayo': 4, 'Eze': 1})
+        ada = ranked[self.students['Ada'].id]
+        self.assertEqual((ada['total'], ada['average'], ada['subjects']), (Decimal('140.00'), 70, 2))
+
+    def test_subject_positions_within_class(self):
+        ranked = positions_by_student('1', '2024/2025', 'SS1')
+        self.assertNotIn(self.students['Eze'].id, ranked)
+        subject_positions = {
+            name: ranked[student.id]['subject_positions']
+            for name, student in self.students.items() if name != 'Eze'
+        }
+        self.assertEqual(subject_positions, {
+            'Ada': {self.maths.id: 1, self.physics.id: 1},
+            'Bola': {self.maths.id: 1, self.physics.id: 3},
+            'Chidi': {self.maths.id: 3, self.physics.id: 1},
+            'Dayo': {self.maths.id: 4, self.physics.id: 4},
+        })
+
+    def test_positions_follow_result_changes(self):
+        self.assertEqual(positions_by_student('1', '2024/2025')[self.students['Dayo'].id]['position'], 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            for result in Result.objects.filter(student=self.students['Dayo']):
+                result.exam_score = 70
+                result.save()
+        ranked = positions_by_student('1', '2024/2025')
+        self.assertEqual([ranked[self.students[name].id]['position'] for name in ('Dayo', 'Ada', 'Bola')],
+                         [1, 2, 3])
+
+
+# ---------------------------
+# Report cards
+# ---------------------------
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='exam_app_cards_'))
+class ReportCardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        TeacherProfile.objects.create(name='Card EO', password='pw', is_eo=True)
+        maths = Subject.objects.create(name='Mathematics')
+        # Reg numbers that only differ in '/' vs '-' must still get a card each
+        for n, reg_no in enumerate(['RC/1', 'RC-1', 'RC/2']):
+            student = Student.objects.create(first_name=f'S{n}', last_name='Obi', reg_no=reg_no, class_level='SS1')
+            Result.objects.create(student=student, subject=maths, test_score=20, exam_score=40 + 10 * n,
+                                  term='1', session='2024/2025')
+
+    def setUp(self):
+        cache.clear()
+        local_teachers.clear()
+
+    def test_contexts(self):
+        students = list(Student.objects.order_by('id').values('id', 'reg_no', 'first_name', 'last_name',
+                                                                'class_level'))
+        contexts = build_contexts(students, '1', '2024/2025')
+        self.assertEqual([(c['position'], c['class_size'], c['total']) for c in contexts],
+                         [(3, 3, Decimal('60.00')), (2, 3, Decimal('70.00')), (1, 3, Decimal('80.00'))])
+        self.assertEqual(len({c['filename'] for c in contexts}), 3)
+        self.assertEqual(contexts[0]['filename'], f"SS1/RC-1_{students[0]['id']}.html")
+
+    def test_view_enqueues_a_job(self):
+        self.client.post('/login/', {'name': 'card eo', 'password': 'pw'})
+        response = self.client.post('/eo/report-cards/', {'term': '1', 'session': '2024/2025'})
+        self.assertRedirects(response, '/eo/report-cards/')
+        job = Job.objects.get()
+        self.assertEqual((job.kind, job.params, job.status), ('report_cards', {'term': '1', 'session': '2024/2025'},
+                                                              'queued'))
+
+        run_job(claim_job('test-worker'))
+        page = self.client.get('/eo/report-cards/')
+        self.assertContains(page, '3 report cards rendered')
+        download = self.client.get(f'/eo/jobs/{job.id}/download/')
+        with zipfile.ZipFile(io.BytesIO(b''.join(download.streaming_content))) as archive:
+            names = archive.namelist()
+        self.assertEqual(len(names), 3)
+        self.assertTrue(all(name.startswith('SS1/RC-') for name in names))
+
+    def test_term_and_session_required(self):
+        self.client.post('/login/', {'name': 'card eo', 'password': 'pw'})
+        response = self.client.post('/eo/report-cards/', {'term': '1'})
+        self.assertContains(response, 'Choose a term and a session.')
+        self.assertFalse(Job.objects.exists())
+
+
+# ---------------------------
+# Logged-in teacher and access decorators
+# ---------------------------
+class TeacherMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.eo = TeacherProfile.objects.create(name='Gate EO', password='pw', is_eo=True)
+        cls.teacher = TeacherProfile.objects.create(name='Gate Teacher', password='pw', class_level='SS1')
+
+    def setUp(self):
+        cache.clear()
+        local_teachers.clear()
+
+    def login(self, name):
+        self.client.post('/login/', {'name': name, 'password': 'pw'})
+
+    def test_identity_needs_no_queries(self):
+        self.login('gate teacher')
+        self.client.get('/teacher/dashboard/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/teacher/dashboard/')
+        self.assertEqual(response.context['teacher'], self.teacher)
+        tables = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('exam_app_teacherprofile', tables)
+        self.assertNotIn('django_session', tables)
+
+    def test_decorators(self):
+        self.assertRedirects(self.client.get('/teacher/dashboard/'), '/login/')
+        self.assertRedirects(self.client.get('/eo/dashboard/'), '/login/')
+        self.login('gate teacher')
+        self.assertRedirects(self.client.get('/eo/dashboard/'), '/teacher/dashboard/')
+        self.assertEqual(self.client.get('/teacher/dashboard/').status_code, 200)
+
+    def test_profile_edits_reach_the_next_request(self):
+        self.login('gate teacher')
+        self.assertRedirects(self.client.get('/eo/dashboard/'), '/teacher/dashboard/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.is_eo = True
+            self.teacher.save()
+        self.assertEqual(self.client.get('/eo/dashboard/').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.delete()
+        self.assertRedirects(self.client.get('/teacher/dashboard/'), '/login/')
+
+    def test_logout_revokes_the_session(self):
+        self.login('gate eo')
+        cookie = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.client.get('/logout/')
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = cookie
+        self.assertRedirects(self.client.get('/eo/dashboard/'), '/login/')
+
+    def test_local_entries_expire(self):
+        local = LRUCache(maxsize=2, ttl=30)
+        with mock.patch('exam_app.middleware.time.monotonic', return_value=100):
+            local.set('a', 1)
+            local.set('b', 2)
+            local.get('a')
+            local.set('c', 3)  # evicts 'b', the least recently used
+            self.assertEqual((local.get('a'), local.get('b'), local.get('c')), (1, None, 3))
+        with mock.patch('exam_app.middleware.time.monotonic', return_value=130):
+            self.assertIsNone(local.get('a'))
+
+    def test_cleared_cache_does_not_revive_local_entries(self):
+        self.login('gate teacher')
+        self.client.get('/teacher/dashboard/')
+        cache.clear()  # another process can't see this one's LRU, and versions restart
+        TeacherProfile.objects.filter(id=self.teacher.id).update(is_eo=True)
+        self.assertEqual(self.client.get('/eo/dashboard/').status_code, 200)
+
+
+# ---------------------------
+# Login throttle
+# ---------------------------
+@override_settings(LOGIN_RATE_LIMITS={'name_ip': (3, 300), 'ip': (5, 300)}, LOGIN_CLIENT_IP_HEADER='')
+class LoginThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        TeacherProfile.objects.create(name='Locked Teacher', password='pw', class_level='SS1')
+
+    def setUp(self):
+        cache.clear()
+        local_teachers.clear()
+
+    def attempt(self, password, ip='10.0.0.1', **extra):
+        response = self.client.post('/login/', {'name': 'Locked Teacher', 'password': password},
+                                    REMOTE_ADDR=ip, **extra)
+        if response.status_code != 200:
+            return []  # logged in and redirected
+        return response.context['form'].non_field_errors()
+
+    def test_locks_name_from_one_ip(self):
+        for _ in range(3):
+            self.assertIn('Incorrect password.', self.attempt('wrong'))
+        with mock.patch('exam_app.models.TeacherProfile.check_password') as check:
+            errors = self.attempt('pw')
+        check.assert_not_called()
+        self.assertIn('Too many login attempts. Try again in 5 minutes.', errors)
+        # The same teacher from another address is not locked out
+        self.assertEqual(self.attempt('pw', ip='10.0.0.2'), [])
+
+    def test_reports_the_time_left(self):
+        with mock.patch('exam_app.throttle.time.time', return_value=1000):
+            for _ in range(3):
+                self.attempt('wrong')
+        with mock.patch('exam_app.throttle.time.time', return_value=1000 + 250):
+            self.assertIn('Too many login attempts. Try again in 1 minute.', self.attempt('pw'))
+
+    def test_limits_an_ip_across_names(self):
+        for n in range(5):
+            self.client.post('/login/', {'name': f'Nobody {n}', 'password': 'x'}, REMOTE_ADDR='10.0.0.3')
+        self.assertIn('Too many login attempts. Try again in 5 minutes.', self.attempt('pw', ip='10.0.0.3'))
+
+    def test_success_clears_the_name_counter(self):
+        for _ in range(2):
+            self.attempt('wrong')
+        self.assertEqual(self.attempt('pw'), [])
+        self.client.get('/logout/')
+        for _ in range(2):
+            self.assertIn('Incorrect password.', self.attempt('wrong'))
+
+    def test_client_ip(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.9', HTTP_X_FORWARDED_FOR='1.2.3.4, 5.6.7.8')
+        self.assertEqual(client_ip(request), '10.0.0.9')
+        with self.settings(LOGIN_CLIENT_IP_HEADER='HTTP_X_FORWARDED_FOR'):
+            self.assertEqual(client_ip(request), '5.6.7.8')
+            self.assertEqual(client_ip(RequestFactory().get('/', REMOTE_ADDR='10.0.0.9')), '10.0.0.9')
+
+
+# ---------------------------
+# Synthetic dataset generator
+# ---------------------------
+class DatasetGeneratorTests(TestCase):
+    def generate(self, seed=7):
+        DatasetGenerator(seed=seed, teachers_per_class=2, subjects=5, subjects_per_student=3,
+                         sessions=['2024/2025'], terms=['1', '2'], prefix='GEN', batch_size=8).run(20)
+        return list(
+            Result.objects.order_by('student__reg_no', 'subject__name', 'term')
+            .values_list('student__reg_no', 'student__first_name', 'student__class_level',
+                         'student__teacher__name', 'subject__name', 'term', 'test_score', 'exam_score', 'grade')
+        )
+
+    def clear_students(self):
+        Result.objects.all().delete()
+        Student.objects.all().delete()
+
+    def test_same_seed_same_rows(self):
+        first = self.generate()
+        self.assertEqual(len(first), 20 * 3 * 2)
+        self.assertTrue(all(row[3] for row in first))
+
+        self.clear_students()
+        TeacherProfile.objects.all().delete()
+        Subject.objects.all().delete()
+        # Other teachers and subjects first, so every id differs from the first run
+        TeacherProfile.objects.create(name='SS1 Head', password='pw', class_level='SS1')
+        Subject.objects.create(name='Zoology')
+        self.assertEqual(self.generate(), first)
+
+        self.clear_students()
+        self.assertNotEqual(self.generate(seed=8), first)
+
+    def test_command_rejects_unknown_terms(self):
+        for terms in ('1,4', 'x', ','):
+            with self.assertRaisesMessage(CommandError, '--terms'):
+                call_command('generate_students', total=2, terms=terms, stdout=io.StringIO())
+        self.assertFalse(Student.objects.exists())
+        call_command('generate_students', total=2, terms='1, 3', subjects_per_student=1, sessions='2024/2025',
+                     stdout=io.StringIO())
+        self.assertEqual(sorted(set(Result.objects.values_list('term', flat=True))), ['1', '3'])
+
+
+# ---------------------------
+# Benchmark helpers
+# ---------------------------
+class BenchmarkingTests(TestCase):
+    def test_percentiles(self):
+        self.assertEqual(percentiles(range(1, 101)), {'p50': 51, 'p90': 90, 'p95': 95, 'p99': 99})
+        self.assertEqual(percentiles([]), {'p50': None, 'p90': None, 'p95': None, 'p99': None})
+        summary = latency_summary([0.001, 0.002, 0.003])
+        self.assertEqual((summary['min'], summary['p50'], summary['mean'], summary['max']), (1.0, 2.0, 2.0, 3.0))
+
+    def test_measure_request(self):
+        Subject.objects.create(name='Mathematics')
+
+        def send():
+            return StreamingHttpResponse(name.encode() for name in Subject.objects.values_list('name', flat=True))
+
+        run = measure_request(send, trace_memory=True)
+        self.assertEqual((run['status'], run['queries'], run['bytes']), (200, 1, len('Mathematics')))
+        self.assertGreater(run['peak'], 0)
+
+    def test_compare_reports(self):
+        def report(**scenarios):
+            return {'scenarios': {
+                name: {'latency_ms': {'p50': p50}, 'queries': queries, 'bytes': 100}
+                for name, (p50, queries) in scenarios.items()
+            }}
+
+        baseline = report(slower=(10.0, 2), jitter=(0.5, 2), more_queries=(10.0, 2), same=(10.0, 2))
+        current = report(slower=(13.0, 2), jitter=(0.9, 2), more_queries=(10.0, 3), same=(10.5, 2), new=(1.0, 1))
+        regressed = {name: flag for name, _, flag in compare_reports(baseline, current, tolerance=0.2)}
+        self.assertEqual(regressed, {'slower': True, 'jitter': False, 'more_queries': True, 'same': False})
+
+
+# ---------------------------
+# Query plans of the hot paths
+# ---------------------------
+# Each test EXPLAINs a query the views run on every request and fails if the
+# plan falls back to reading a whole table (or, where an index provides the
+# order, to sorting the rows afterwards). On PostgreSQL sequential scans are
+# disabled for the check, since the planner would prefer them on tiny test
+# tables whatever indexes exist.
+
+FULL_SCAN = {
+    'sqlite': re.compile(r'\bSCAN (\w+)(?! USING)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+EXTRA_SORT = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    'postgresql': re.compile(r'^\s*(?:->\s*)?(?:Incremental )?Sort\b', re.MULTILINE),
+}
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = TeacherProfile.objects.create(name='Plan Teacher', password='x', class_level='SS1')
+        cls.subject = Subject.objects.create(name='Mathematics')
+        student = Student.objects.create(first_name='Ada', last_name='Obi', reg_no='PLAN/1', class_level='SS1')
+        Result.objects.create(student=student, subject=cls.subject, test_score=20, exam_score=50,
+                              term='1', session='2024/2025', entered_by=cls.teacher)
+
+    def query_plan(self, queryset):
+        if connection.vendor not in FULL_SCAN:
+            self.skipTest(f"No plan check for {connection.vendor}")
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertNoFullScan(self, queryset, sorted_by_index=False):
+        plan = self.query_plan(queryset)
+        tables = {model._meta.db_table for model in (Result, Student, Subject, TeacherProfile)}
+        scanned = [table for table in FULL_SCAN[connection.vendor].findall(plan) if table in tables]
+        self.assertFalse(scanned, f"Full table scan of {', '.join(scanned)}:\n{plan}")
+        if sorted_by_index:
+            self.assertIsNone(EXTRA_SORT[connection.vendor].search(plan), f"Rows sorted after the scan:\n{plan}")
+
+    def test_teacher_recent_results(self):
+        self.assertNoFullScan(
+            Result.objects.filter(entered_by=self.teacher).order_by('-created_at')[:8],
+            sorted_by_index=True,
+        )
+
+    def test_teacher_graded_students(self):
+        self.assertNoFullScan(
+            Result.objects.filter(entered_by=self.teacher)
+            .values('subject__name', 'student__id', 'student__reg_no', 'student__first_name',
+                    'student__last_name', 'student__class_level')
+            .annotate(total_marks=Sum('total_score'))
+            .order_by('subject__name')
+        )
+
+    def test_class_students(self):
+        self.assertNoFullScan(
+            Student.objects.filter(class_level='SS1').order_by('last_name', 'first_name'),
+            sorted_by_index=True,
+        )
+
+    def test_results_section_page(self):
+        self.assertNoFullScan(
+            Result.objects
+            .filter(term='1', session='2024/2025', subject=self.subject, student__class_level='SS1')
+            .values('id', 'student__last_name', 'student__first_name', 'total_score', 'grade')
+            .order_by(*RESULT_KEYSET)[:51]
+        )
+
+    def test_class_positions(self):
+        self.assertNoFullScan(class_positions_query('1', '2024/2025', 'SS1'))
+
+    def test_subject_positions(self):
+        self.assertNoFullScan(subject_positions_query('1', '2024/2025', 'SS1'))
+
+    def test_session_regrade_batch(self):
+        self.assertNoFullScan(Result.objects.filter(session='2024/2025', id__gt=0).order_by('id')[:500])
+
+    def test_teacher_login_lookup(self):
+        self.assertNoFullScan(TeacherProfile.objects.filter(name_normalized='plan teacher'))
+
+    def test_student_prefix_search(self):
+        for key in Student.SEARCH_KEYS:
+            with self.subTest(key=key):
+                self.assertNoFullScan(Student.objects.filter(prefix_filter(key, 'ad')).order_by(key, 'id')[:20])
+                self.assertNoFullScan(
+                    Student.objects.filter(prefix_filter(key, 'ad'), class_level='SS1').order_by(key, 'id')[:20]
+                )
+
+
+# ---------------------------
+# Instrumentation middleware
+# ---------------------------
+class InstrumentationTests(TestCase):
+    def test_disabled_by_default(self):
+        response = self.client.get('/login/')
+        self.assertNotIn('X-DB-Queries', response)
+
+    @override_settings(EXAM_INSTRUMENTATION=True)
+    def test_headers_and_log_line(self):
+        TeacherProfile.objects.create(name='Timed Teacher', password='pw', class_level='SS1')
+        with self.assertLogs('exam_app.instrumentation', 'INFO') as logs:
+            response = self.client.post('/login/', {'name': 'timed teacher', 'password': 'pw'})
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['path'], '/login/')
+        self.assertEqual(line['status'], 302)
+        self.assertEqual(response['X-DB-Queries'], str(line['queries']))
+        self.assertGreater(line['queries'], 0)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_repeated_shapes(self):
+        metrics = RequestMetrics()
+        execute = lambda sql, params, many, context: None
+        for student_id in range(4):
+            metrics(execute, 'SELECT * FROM exam_app_student WHERE id IN (%s, %s)', (student_id, 0), False, {})
+        metrics(execute, 'SELECT * FROM exam_app_student WHERE id IN (%s)', (1,), False, {})
+        metrics(execute, 'SELECT * FROM exam_app_subject', (), False, {})
+        self.assertEqual(metrics.queries, 6)
+        self.assertEqual(metrics.repeated(5), [('SELECT * FROM exam_app_student WHERE id IN (%s...)', 5)])
+
+
+# ---------------------------
+# Result-set caching
+# ---------------------------
+class ResultCachingTests(TestCase):
+    """Runs against local-memory caching; FileCacheResultCachingTests repeats it on disk."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.eo = TeacherProfile.objects.create(name='Cache EO', password='pw', is_eo=True)
+        cls.teacher = TeacherProfile.objects.create(name='Cache Teacher', password='pw', class_level='SS1')
+        cls.maths = Subject.objects.create(name='Mathematics')
+        cls.physics = Subject.objects.create(name='Physics')
+        cls.student = Student.objects.create(first_name='Ada', last_name='Obi', reg_no='C/1', class_level='SS1')
+        cls.results = {
+            subject.id: Result.objects.create(student=cls.student, subject=subject, test_score=20,
+                                              exam_score=40, term='1', session='2024/2025', entered_by=cls.teacher)
+            for subject in (cls.maths, cls.physics)
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, name):
+        self.client.post('/login/', {'name': name, 'password': 'pw'})
+
+    def fragment_keys(self):
+        classes = results_overview({'term': '1', 'session': '2024/2025', 'class_level': ''})
+        keys = {'class': classes[0]['fragment_key']}
+        keys.update({subject['id']: subject['fragment_key'] for subject in classes[0]['subjects']})
+        return keys
+
+    def edit(self, subject, exam_score):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.results[subject.id]
+            result.exam_score = exam_score
+            result.save()
+
+    def test_edit_changes_only_its_section_fragment(self):
+        before = self.fragment_keys()
+        self.edit(self.maths, 55)
+        after = self.fragment_keys()
+        self.assertNotEqual(before[self.maths.id], after[self.maths.id])
+        self.assertNotEqual(before['class'], after['class'])
+        self.assertEqual(before[self.physics.id], after[self.physics.id])
+
+    def test_results_page_and_section_are_served_from_cache(self):
+        self.login('cache eo')
+        url = f'/eo/view-results/section/?class_level=SS1&subject={self.maths.id}&term=1&session=2024/2025'
+        self.client.get('/eo/view-results/?term=1&session=2024/2025')
+        first = self.client.get(url).json()
+        with self.assertNumQueries(0):
+            self.client.get('/eo/view-results/?term=1&session=2024/2025')
+            self.assertEqual(self.client.get(url).json(), first)
+
+        self.edit(self.maths, 55)
+        self.assertIn('75.00', self.client.get(url).json()['html'])
+        self.assertContains(self.client.get('/eo/view-results/?term=1&session=2024/2025'), '75.00')
+
+    def graded_totals(self):
+        grouped = self.client.get('/graded-students/').context['grouped_by_subject']
+        return {subject: [row['total_marks'] for row in rows] for subject, rows in grouped.items()}
+
+    def test_graded_students_follows_new_results(self):
+        self.login('cache teacher')
+        self.assertEqual(self.graded_totals(), {'Mathematics': [60], 'Physics': [60]})
+        with self.assertNumQueries(0):
+            self.client.get('/graded-students/')
+        self.edit(self.physics, 10)
+        self.assertEqual(self.graded_totals(), {'Mathematics': [60], 'Physics': [30]})
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'exam_app_test_cache'),
+}})
+class FileCacheResultCachingTests(ResultCachingTests):
+    pass
+
+
+# ---------------------------
+# Concurrent writers
+# ---------------------------
+class ConcurrentWriteTests(TransactionTestCase):
+    """Teachers saving results at the same time: nothing is lost or locked out."""
+
+    writers = 6
+    results_per_writer = 8
+
+    def setUp(self):
+        cache.clear()
+        TeacherProfile.objects.create(name='Writer', password='pw', class_level='SS1')
+        self.subject = Subject.objects.create(name='Mathematics')
+        self.students = [
+            Student.objects.create(first_name='W', last_name=str(i), reg_no=f'W/{i}', class_level='SS1')
+            for i in range(self.writers * self.results_per_writer)
+        ]
+
+    def write(self, students):
+        client = Client()
+        try:
+            client.post('/login/', {'name': 'writer', 'password': 'pw'})
+            return [
+                client.post('/teacher/input-results/', {
+                    'student': student.id, 'subject': self.subject.id, 'test_score': '20',
+                    'exam_score': str(40 + i % 10), 'term': '1', 'session': '2024/2025',
+                }).status_code
+                for i, student in enumerate(students)
+            ]
+        finally:
+            connections.close_all()
+
+    def test_parallel_writers(self):
+        chunks = [self.students[i::self.writers] for i in range(self.writers)]
+        with ThreadPoolExecutor(max_workers=self.writers) as pool:
+            statuses = [status for chunk in pool.map(self.write, chunks) for status in chunk]
+
+        total = len(self.students)
+        self.assertEqual(statuses, [302] * total)
+        self.assertEqual(Result.objects.count(), total)
+        summary = ClassSubjectSummary.objects.get(class_level='SS1', subject=self.subject, term='1',
+                                                  session='2024/2025')
+        self.assertEqual(summary.result_count, total)
+        self.assertEqual(summary.total_score, Result.objects.aggregate(total=Sum('total_score'))['total'])
+
+
+# ---------------------------
+# Async read-only views
+# ---------------------------
+class AsyncViewTests(TestCase):
+    """Each async view must return exactly what its sync counterpart does."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.eo = TeacherProfile.objects.create(name='Async EO', password='pw', is_eo=True)
+        cls.teacher = TeacherProfile.objects.create(name='Async Teacher', password='pw', class_level='SS1')
+        cls.subject = Subject.objects.create(name='Mathematics')
+        for i in range(5):
+            student = Student.objects.create(first_name='Ada', last_name=f'Obi{i}', reg_no=f'A/{i}', class_level='SS1')
+            Result.objects.create(student=student, subject=cls.subject, test_score=10 + i, exam_score=50,
+                                  term='1', session='2024/2025', entered_by=cls.teacher)
+
+    def setUp(self):
+        cache.clear()
+
+    def request(self, factory, teacher, query=''):
+        request = factory.get(f'/?{query}')
+        request.session = SessionStore()
+        request._messages = default_storage(request)
+        request.teacher = teacher
+        return request
+
+    async def content(self, response):
+        if not response.streaming:
+            return response.content
+        if response.is_async:
+            return b''.join([chunk async for chunk in response.streaming_content])
+        return await sync_to_async(b''.join)(response.streaming_content)
+
+    async def assertSameResponse(self, name, teacher, query=''):
+        sync_view = sync_to_async(getattr(views, name))
+        expected = await sync_view(self.request(RequestFactory(), teacher, query))
+        cache.clear()
+        response = await getattr(async_views, name)(self.request(AsyncRequestFactory(), teacher, query))
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(await self.content(response), await self.content(expected))
+        return response
+
+    async def test_teacher_views(self):
+        for name in ('teacher_dashboard', 'view_students', 'graded_students'):
+            with self.subTest(name):
+                await self.assertSameResponse(name, self.teacher)
+
+    async def test_results_browser(self):
+        filters = 'term=1&session=2024/2025'
+        await self.assertSameResponse('view_all_results', self.eo, filters)
+        await self.assertSameResponse('view_all_results', self.eo, f'{filters}&download=stats')
+        await self.assertSameResponse('results_section', self.eo,
+                                      f'{filters}&class_level=SS1&subject={self.subject.id}&limit=2')
+
+    async def test_results_csv_streams_asynchronously(self):
+        response = await self.assertSameResponse('view_all_results', self.eo, 'download=csv')
+        self.assertTrue(response.is_async)
+
+    async def test_access_checks(self):
+        response = await async_views.view_all_results(self.request(AsyncRequestFactory(), self.teacher))
+        self.assertEqual(response.status_code, 302)
+        response = await async_views.teacher_dashboard(self.request(AsyncRequestFactory(), None))
+        self.assertEqual(response.status_code, 302)
+
+
+class AsyncURLConf:
+    """The site's URLs as asgi.py serves them, with the async read-only views."""
+    urlpatterns = [path('', include(app_urlpatterns(async_views)))]
+
+
+def off_the_event_loop(method):
+    """Wrap a blocking cache method so calling it from the event loop fails the test."""
+    def guarded(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return method(*args, **kwargs)
+        raise AssertionError(f"Blocking cache.{method.__name__}() called inside the event loop")
+    return guarded
+
+
+async def subject_count_in_worker_thread(request):
+    """One query on a thread of its own, with its own connection (thread_sensitive=False code)."""
+    def count():
+        try:
+            return Subject.objects.count()
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(1) as pool:
+        return HttpResponse(str(await sync_to_async(count, thread_sensitive=False, executor=pool)()))
+
+
+class WorkerThreadURLConf:
+    urlpatterns = [path('subjects/count/', subject_count_in_worker_thread)]
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf)
+class AsyncStackTests(TestCase):
+    """Async views behind the full middleware stack, as ASGI runs them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        TeacherProfile.objects.create(name='Stack EO', password='pw', is_eo=True)
+        TeacherProfile.objects.create(name='Stack Teacher', password='pw', class_level='SS1')
+        subject = Subject.objects.create(name='Mathematics')
+        student = Student.objects.create(first_name='Ada', last_name='Obi', reg_no='AS/1', class_level='SS1')
+        Result.objects.create(student=student, subject=subject, test_score=25, exam_score=50, term='1',
+                              session='2024/2025')
+
+    def setUp(self):
+        cache.clear()
+        local_teachers.clear()
+        stack = contextlib.ExitStack()
+        self.addCleanup(stack.close)
+        for name in ('get', 'set', 'add', 'get_many', 'incr', 'delete'):
+            stack.enter_context(mock.patch.object(LocMemCache, name, off_the_event_loop(getattr(LocMemCache, name))))
+
+    async def test_pages_through_the_middleware(self):
+        response = await self.async_client.get('/eo/view-results/?term=1&session=2024/2025')
+        self.assertRedirects(response, '/login/', fetch_redirect_response=False)
+
+        response = await self.async_client.post('/login/', {'name': 'stack eo', 'password': 'pw'})
+        self.assertEqual(response.status_code, 302)
+        for _ in range(2):  # the second time from cache
+            response = await self.async_client.get('/eo/view-results/?term=1&session=2024/2025')
+            self.assertContains(response, '75.00')
+        self.assertEqual(response.context['teacher'].name, 'Stack EO')
+
+        response = await self.async_client.get('/teacher/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get('/graded-students/')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(EXAM_INSTRUMENTATION=True)
+    async def test_instrumentation_counts_the_async_views_queries(self):
+        await self.async_client.post('/login/', {'name': 'stack eo', 'password': 'pw'})
+        # Count every query whatever thread or connection runs it
+        executed = []
+        real_execute = CursorWrapper._execute
+
+        def execute(cursor, sql, *args):
+            executed.append(sql)
+            return real_execute(cursor, sql, *args)
+
+        with mock.patch.object(CursorWrapper, '_execute', execute):
+            response = await self.async_client.get('/eo/view-results/?term=1&session=2024/2025')
+        self.assertContains(response, '75.00')
+        self.assertGreater(len(executed), 0)
+        self.assertEqual(response['X-DB-Queries'], str(len(executed)))
+
+    async def test_teacher_is_denied_eo_pages(self):
+        await self.async_client.post('/login/', {'name': 'stack teacher', 'password': 'pw'})
+        response = await self.async_client.get('/eo/view-results/')
+        self.assertRedirects(response, '/teacher/dashboard/', fetch_redirect_response=False)
+        response = await self.async_client.get('/eo/view-results/section/?class_level=SS1&subject=1')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(EXAM_INSTRUMENTATION=True, ROOT_URLCONF=WorkerThreadURLConf)
+class AsyncInstrumentationTests(TestCase):
+    async def test_queries_on_other_threads_are_counted(self):
+        response = await self.async_client.get('/subjects/count/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-DB-Queries'], '1')
+
+
+# ---------------------------
+# Read-replica routing
+# ---------------------------
+@override_settings(EXAM_REPLICA_DATABASE='replica', EXAM_REPLICA_STICKY_SECONDS=60)
+class ReplicaRoutingTests(TestCase):
+    router = ReplicaRouter()
+
+    def test_only_reporting_reads_go_to_the_replica(self):
+        self.assertIsNone(self.router.db_for_read(Result))
+        with reporting_reads():
+            self.assertEqual(self.router.db_for_read(Result), 'replica')
+            self.assertIsNone(self.router.db_for_write(Result))
+        self.assertIsNone(self.router.db_for_read(Result))
+
+    @override_settings(EXAM_REPLICA_DATABASE=None)
+    def test_no_replica_configured(self):
+        with reporting_reads():
+            self.assertIsNone(self.router.db_for_read(Result))
+
+    def test_streamed_querysets_keep_the_replica(self):
+        with reporting_reads():
+            queryset = pin_database(Result.objects.all())
+        self.assertEqual(queryset.db, 'replica')
+
+    def test_replica_is_never_migrated(self):
+        self.assertIs(self.router.allow_migrate('replica', 'exam_app'), False)
+        self.assertIsNone(self.router.allow_migrate('default', 'exam_app'))
+
+    def route(self, session, write=False):
+        """Send one request through ReplicaRoutingMiddleware; the databases its reads were routed to."""
+        decisions = []
+
+        @reporting_view
+        def view(request):
+            decisions.append(self.router.db_for_read(Result))
+            if write:
+                Subject.objects.create(name='Written in the request')
+                decisions.append(self.router.db_for_read(Result))
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.session = session
+        ReplicaRoutingMiddleware(view)(request)
+        return decisions
+
+    def test_session_reads_its_own_writes(self):
+        session, other = SessionStore(), SessionStore()
+        self.assertEqual(self.route(session), ['replica'])
+        self.assertEqual(self.route(session, write=True), ['replica', None])
+        self.assertEqual(self.route(session), [None])
+        self.assertEqual(self.route(other), ['replica'])
+        with override_settings(EXAM_REPLICA_STICKY_SECONDS=0):
+            self.assertEqual(self.route(session), ['replica'])
+
+
+# The "replica" is the test database itself: a lagging replica is simulated by
+# bumping a section's versions before its rows change.
+@override_settings(EXAM_REPLICA_DATABASE='default', EXAM_REPLICA_STICKY_SECONDS=10)
+class ReplicaCachingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        TeacherProfile.objects.create(name='Lag EO', password='pw', is_eo=True)
+        cls.subject = Subject.objects.create(name='Mathematics')
+        student = Student.objects.create(first_name='Ada', last_name='Obi', reg_no='LAG/1', class_level='SS1')
+        cls.result = Result.objects.create(student=student, subject=cls.subject, test_score=20, exam_score=40,
+                                           term='1', session='2024/2025')
+
+    def setUp(self):
+        cache.clear()
+        local_teachers.clear()
+        self.now = 1_000_000.0
+        patcher = mock.patch('time.time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.post('/login/', {'name': 'lag eo', 'password': 'pw'})
+        self.now += 11  # past the window the login's session write pinned
+
+    def section(self):
+        url = f'/eo/view-results/section/?class_level=SS1&subject={self.subject.id}&term=1&session=2024/2025'
+        return self.client.get(url).json()['html']
+
+    def test_replica_entries_computed_after_a_bump_expire_with_the_window(self):
+        self.assertIn('60.00', self.section())
+        # The primary committed a change; the replica hasn't received it yet
+        bump_version(*section_scopes('SS1', self.subject.id, '1', '2024/2025'))
+        self.assertIn('60.00', self.section())
+        page = self.client.get('/eo/view-results/?term=1&session=2024/2025')
+        self.assertEqual(page.context['classes'][0]['fragment_timeout'], 10)
+        Result.objects.filter(id=self.result.id).update(exam_score=55, total_score=75)  # replica catches up
+
+        self.now += 5
+        self.assertIn('60.00', self.section())
+        self.now += 6
+        self.assertIn('75.00', self.section())
+
+    def test_entry_timeout(self):
+        scopes = [section_scope('SS1'), section_scope('SS2')]
+        with reporting_reads():
+            bump_version(section_scope('SS1'))
+            self.now += 11
+            self.assertEqual(entry_timeout(scopes), DEFAULT_TIMEOUT)
+            bump_version(section_scope('SS1'))
+            self.now += 4
+            self.assertEqual(entry_timeout(scopes), 6)
+            self.assertEqual(entry_timeout([section_scope('SS2')]), DEFAULT_TIMEOUT)
+        self.assertEqual(entry_timeout(scopes), DEFAULT_TIMEOUT)  # read from the primary
+
+
+# ---------------------------
+# Background jobs
+# ---------------------------
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='exam_app_jobs_'))
+class JobQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.eo = TeacherProfile.objects.create(name='Job EO', password='pw', is_eo=True)
+        subject = Subject.objects.create(name='Mathematics')
+        for i in range(3):
+            student = Student.objects.create(first_name='Ada', last_name=f'Obi{i}', reg_no=f'J/{i}', class_level='SS1')
+            Result.objects.create(student=student, subject=subject, test_score=20, exam_score=40 + i,
+                                  term='1', session='2024/2025')
+
+    def test_enqueue_and_poll(self):
+        self.client.post('/login/', {'name': 'job eo', 'password': 'pw'})
+        response = self.client.post('/eo/jobs/', {'kind': 'results_csv', 'term': '1', 'session': '2024/2025'})
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.params, job.requested_by), ('queued', {'term': '1', 'session': '2024/2025'},
+                                                                      self.eo))
+
+        run_job(claim_job('test-worker'))
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual((status['status'], status['percent'], status['message']), ('succeeded', 100,
+                                                                                    '3 results exported'))
+        download = self.client.get(status['download_url'])
+        lines = b''.join(download.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertIn('Ada Obi0', lines[1])
+
+    def test_eo_only(self):
+        response = self.client.post('/eo/jobs/', {'kind': 'results_csv'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_required_params(self):
+        with self.assertRaisesMessage(ValueError, 'report_cards jobs need: term, session'):
+            enqueue('report_cards', {})
+
+    def test_claims_oldest_job_once(self):
+        first, second = enqueue('results_csv', {}), enqueue('regrade', {'session': '2024/2025'})
+        self.assertEqual(claim_job('a').id, first.id)
+        self.assertEqual(claim_job('b').id, second.id)
+        self.assertIsNone(claim_job('c'))
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.worker, first.attempts), ('running', 'a', 1))
+
+    def test_regrade_job(self):
+        enqueue('regrade', {'session': '2024/2025'})
+        job = run_job(claim_job('w'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.message), ('succeeded', '3 results checked, 0 regraded'))
+
+    def test_regrade_reports_progress_per_batch(self):
+        GradeBoundary.objects.create(session='2024/2025', min_score=61, grade='P')
+        GradeBoundary.objects.create(session='2024/2025', min_score=0, grade='F')
+        cache.clear()
+        calls = []
+        self.assertEqual(regrade_session('2024/2025', batch_size=2, progress=lambda *args: calls.append(args)),
+                         (3, 3))
+        self.assertEqual(calls, [(2, 3), (3, 3)])
+        self.assertEqual(sorted(Result.objects.values_list('grade', flat=True)), ['F', 'P', 'P'])
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='exam_app_sweep_'))
+    def test_sweep_removes_expired_and_orphaned_files(self):
+        enqueue('results_csv', {})
+        job = run_job(claim_job('w'))
+        job.refresh_from_db()
+        path = job.result_file.path
+        orphans = []
+        for name, days in (('old.csv', 30), ('new.csv', 0)):
+            orphan = os.path.join(settings.MEDIA_ROOT, 'jobs', 'orphans', name)
+            os.makedirs(os.path.dirname(orphan), exist_ok=True)
+            with open(orphan, 'w') as fh:
+                fh.write('x')
+            stamp = (timezone.now() - timedelta(days=days)).timestamp()
+            os.utime(orphan, (stamp, stamp))
+            orphans.append(orphan)
+
+        self.assertEqual(sweep_job_files(), 1)  # the old orphan; the job's file is still fresh
+        later = timezone.now() + timedelta(days=settings.EXAM_JOB_RETENTION_DAYS + 1)
+        self.assertEqual(sweep_job_files(now=later), 2)  # the job's file and the newer orphan
+        job.refresh_from_db()
+        self.assertEqual(job.result_file.name, '')
+        self.assertFalse(any(os.path.exists(p) for p in [path] + orphans))
+
+    def test_failed_job_records_the_error(self):
+        job = enqueue('report_cards', {'term': '1', 'session': '2024/2025'})
+        Job.objects.filter(id=job.id).update(params={'term': '1'})  # lost its session: the runner raises
+        with self.assertLogs('exam_app.jobs', 'ERROR'):
+            run_job(claim_job('w'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.message, job.result_file.name), ('failed', "'session'", ''))
+
+    def test_stale_jobs_are_requeued_then_failed(self):
+        job = enqueue('results_csv', {})
+        for attempt in range(1, 4):
+            claim_job('gone')
+            later = timezone.now() + timedelta(seconds=settings.EXAM_JOB_STALE_SECONDS + 1)
+            requeue_stale(now=later)
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'queued' if attempt < 3 else 'failed')
+
+
+# ---------------------------
+# Student search (autocomplete)
+# ---------------------------
+class StudentSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        TeacherProfile.objects.create(name='Search Teacher', password='pw', class_level='SS1')
+        TeacherProfile.objects.create(name='Search EO', password='pw', is_eo=True)
+        Student.objects.create(first_name='Adébáyọ̀', last_name='Okafor', reg_no='SS1/001', class_level='SS1')
+        Student.objects.create(first_name='Ada', last_name='Obi', reg_no='SS2/001', class_level='SS2')
+        for i in range(30):
+            Student.objects.create(first_name='Chinedu', last_name=f'Eze{i:02d}', reg_no=f'SS1/1{i:02d}',
+                                   class_level='SS1')
+
+    def setUp(self):
+        # Teacher ids are reused between test cases; drop teachers cached by earlier ones
+        cache.clear()
+        local_teachers.clear()
+
+    def search(self, user, **params):
+        self.client.post('/login/', {'name': user, 'password': 'pw'})
+        return self.client.get('/students/search/', params)
+
+    def test_accent_and_case_insensitive_prefixes(self):
+        self.assertEqual([row['reg_no'] for row in search_students('ADEBA')], ['SS1/001'])
+        self.assertEqual([row['reg_no'] for row in search_students('okafor ad')], ['SS1/001'])
+        self.assertEqual([row['reg_no'] for row in search_students('ss2/')], ['SS2/001'])
+        self.assertEqual(search_students('   '), [])
+
+    def test_results_are_bounded(self):
+        self.assertEqual(len(search_students('chinedu')), 20)
+        self.assertEqual(len(search_students('chinedu', limit=5)), 5)
+        self.assertEqual(len(search_students('chinedu', limit=1000)), 30)  # capped at MAX_LIMIT
+
+    def test_teachers_only_find_their_class(self):
+        response = self.search('search teacher', q='ad')
+        self.assertEqual([row['reg_no'] for row in response.json()['results']], ['SS1/001'])
+        response = self.search('search eo', q='ad')
+        self.assertEqual({row['reg_no'] for row in response.json()['results']}, {'SS1/001', 'SS2/001'})
+        self.assertIn('SS2/001 — Ada Obi', [row['label'] for row in response.json()['results']])
+
+    def test_login_required(self):
+        self.assertEqual(self.client.get('/students/search/', {'q': 'ad'}).status_code, 403)
+
+    def test_renamed_student_is_found_by_new_name(self):
+        student = Student.objects.get(reg_no='SS2/001')
+        student.last_name = 'Nwosu'
+        student.save(update_fields=['last_name'])
+        self.assertEqual([row['reg_no'] for row in search_students('nwosu')], ['SS2/001'])
+
+    def test_result_form_renders_only_the_selected_student(self):
+        html = str(ResultForm()['student'])
+        self.assertNotIn('Chinedu', html)
+        self.assertIn('data-url="/students/search/"', html)
+        student = Student.objects.get(reg_no='SS2/001')
+        self.assertIn('SS2/001 — Ada Obi', str(ResultForm(initial={'student': student.pk})['student']))
+
+    def test_non_numeric_student_is_a_form_error(self):
+        Subject.objects.create(name='Mathematics')
+        self.client.post('/login/', {'name': 'search teacher', 'password': 'pw'})
+        response = self.client.post('/teacher/input-results/', {
+            'student': 'abc', 'subject': Subject.objects.get().id, 'test_score': '20', 'exam_score': '50',
+            'term': '1', 'session': '2024/2025'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('student', response.context['form'].errors)
+        self.assertFalse(Result.objects.exists())
+
+
+# ---------------------------
+# Class broadsheet
+# ---------------------------
+class BroadsheetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        TeacherProfile.objects.create(name='Sheet EO', password='pw', is_eo=True)
+        maths, physics = Subject.objects.create(name='Mathematics'), Subject.objects.create(name='Physics')
+        scores = {'Ada': (70, 60), 'Bola': (65, 65), 'Chidi': (50, None)}
+        for first_name, (maths_score, physics_score) in scores.items():
+            student = Student.objects.create(first_name=first_name, last_name='Obi', reg_no=f'B/{first_name}',
+                                             class_level='SS1')
+            for subject, score in ((maths, maths_score), (physics, physics_score)):
+                if score is not None:
+                    Result.objects.create(student=student, subject=subject, test_score=0, exam_score=score,
+                                          term='1', session='2024/2025')
+        other = Student.objects.create(first_name='Dayo', last_name='Obi', reg_no='B/Dayo', class_level='SS2')
+        Result.objects.create(student=other, subject=maths, test_score=0, exam_score=99, term='1',
+                              session='2024/2025')
+
+    def setUp(self):
+        cache.clear()
+        local_teachers.clear()
+
+    def test_one_query_pivot(self):
+        with self.assertNumQueries(1):
+            sheet = Broadsheet.build('1', '2024/2025', 'SS1')
+        self.assertEqual(sheet.header(), ['Reg No', 'Student', 'Mathematics', 'Physics', 'Subjects', 'Total',
+                                          'Average', 'Position'])
+        lines = [[str(value) for value in line] for line in sheet.lines()]
+        self.assertEqual(lines, [
+            ['B/Ada', 'Ada Obi', '70', '60', '2', '130', '65.00', '1'],
+            ['B/Bola', 'Bola Obi', '65', '65', '2', '130', '65.00', '1'],
+            ['B/Chidi', 'Chidi Obi', '50', 'None', '1', '50', '50.00', '3'],
+        ])
+        self.assertEqual([str(value) for value in sheet.footer()[2:4]], ['61.67', '62.50'])
+
+    def test_competition_ranks(self):
+        self.assertEqual(competition_ranks([50, 70, 70, None, 60]), [4, 1, 1, None, 3])
+
+    def test_csv_export(self):
+        self.client.post('/login/', {'name': 'sheet eo', 'password': 'pw'})
+        response = self.client.get('/eo/broadsheet/', {'class_level': 'SS1', 'term': '1', 'session': '2024/2025',
+                                                       'download': 'csv'})
+        self.assertIn('broadsheet_SS1_1_2024-2025.csv', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[3], 'B/Chidi,Chidi Obi,50,,1,50,50.00,3')
+        self.assertEqual(len(lines), 5)
+
+    def test_page(self):
+        self.client.post('/login/', {'name': 'sheet eo', 'password': 'pw'})
+        response = self.client.get('/eo/broadsheet/', {'class_level': 'SS1', 'term': '1', 'session': '2024/2025'})
+        self.assertContains(response, 'Bola Obi')
+        self.assertNotContains(response, 'Dayo')
+
+    def test_xlsx_export(self):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            self.skipTest("openpyxl is not installed")
+        self.client.post('/login/', {'name': 'sheet eo', 'password': 'pw'})
+        response = self.client.get('/eo/broadsheet/', {'class_level': 'SS1', 'term': '1', 'session': '2024/2025',
+                                                       'download': 'xlsx'})
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as fh:
+            fh.write(b''.join(response.streaming_content))
+            fh.flush()
+            rows = list(load_workbook(fh.name, read_only=True).active.iter_rows(values_only=True))
+        self.assertEqual(rows[1][:4], ('B/Ada', 'Ada Obi', 70, 60))
+
+
+# ---------------------------
+# Cumulative (annual) results
+# ---------------------------
+class CumulativeResultTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.maths = Subject.objects.create(name='Mathematics')
+        cls.student = Student.objects.create(first_name='Ada', last_name='Obi', reg_no='CU/1', class_level='SS1')
+
+    def add(self, term, score, subject=None):
+        return Result.objects.create(student=self.student, subject=subject or self.maths, test_score=0,
+                                     exam_score=score, term=term, session='2024/2025')
+
+    def running(self):
+        return CumulativeResult.objects.get(student=self.student, subject=self.maths, session='2024/2025')
+
+    def test_running_totals_follow_saves_and_deletes(self):
+        first, second = self.add('1', 60), self.add('2', 70)
+        third = self.add('3', 80)
+        row = self.running()
+        self.assertEqual((row.result_count, row.total_score, row.average), (3, 210, Decimal('70.00')))
+        self.assertEqual(row.term_scores, {'1': '60.00', '2': '70.00', '3': '80.00'})
+        self.assertEqual(row.to_date('2'), (Decimal('130.00'), Decimal('65.00')))
+
+        second.exam_score = 40
+        second.save()
+        third.delete()
+        row = self.running()
+        self.assertEqual((row.result_count, row.average, row.maximum), (2, Decimal('50.00'), Decimal('60.00')))
+        self.assertEqual(row.term_scores, {'1': '60.00', '2': '40.00'})
+        self.assertEqual(check_cumulative(), (1, []))
+
+        first.delete()
+        second.delete()
+        self.assertFalse(CumulativeResult.objects.exists())
+
+    def test_only_the_affected_row_is_touched(self):
+        physics = Subject.objects.create(name='Physics')
+        self.add('1', 60)
+        self.add('1', 50, subject=physics)
+        before = CumulativeResult.objects.get(subject=physics).updated_at
+        self.add('2', 70)
+        self.assertEqual(CumulativeResult.objects.get(subject=physics).updated_at, before)
+
+    def test_check_finds_drift_and_rebuild_fixes_it(self):
+        self.add('1', 60)
+        self.add('2', 70)
+        CumulativeResult.objects.update(total_score=1)
+        checked, problems = check_cumulative()
+        self.assertEqual(problems, [((self.student.id, self.maths.id, '2024/2025'),
+                                     "total_score is Decimal('1.00'), expected Decimal('130.00')")])
+        Result.objects.filter(term='2').update(term='3')  # bypasses the signals
+        self.assertEqual(rebuild_cumulative(), 1)
+        self.assertEqual(self.running().term_scores, {'1': '60.00', '3': '70.00'})
+        self.assertEqual(check_cumulative(), (1, []))
+
+    def test_third_term_report_card(self):
+        self.add('1', 60)
+        self.add('2', 70)
+        self.add('3', 80)
+        card = build_contexts([{'id': self.student.id, 'reg_no': 'CU/1', 'first_name': 'Ada', 'last_name': 'Obi',
+                                'class_level': 'SS1'}], '3', '2024/2025')[0]
+        self.assertEqual(card['earlier_terms'], ['First Term', 'Second Term'])
+        self.assertEqual(card['subjects'][0]['earlier_scores'], ['60.00', '70.00'])
+        self.assertEqual(card['cumulative_average'], Decimal('70.00'))
+
+
+# ---------------------------
+# Grade analytics
+# ---------------------------
+class AnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        TeacherProfile.objects.create(name='Stats EO', password='pw', is_eo=True)
+        cls.maths, cls.physics = Subject.objects.create(name='Mathematics'), Subject.objects.create(name='Physics')
+        cls.students = [Student.objects.create(first_name=f'S{n}', last_name='Obi', reg_no=f'AN/{n}',
+                                               class_level='SS1') for n in range(4)]
+
+    def setUp(self):
+        cache.clear()
+        local_teachers.clear()
+
+    def add(self, student, subject, score, term='1'):
+        return Result.objects.create(student=student, subject=subject, test_score=0, exam_score=score, term=term,
+                                     session='2024/2025')
+
+    def histogram(self, subject, term='1'):
+        return ClassSubjectSummary.objects.get(subject=subject, term=term, class_level='SS1').score_histogram
+
+    def test_score_bucket(self):
+        self.assertEqual([score_bucket(s) for s in (0, Decimal('9.99'), 10, 45, 99, 100)], [0, 0, 10, 40, 90, 90])
+
+    def test_histogram_is_maintained_and_matches_rebuild(self):
+        first = self.add(self.students[0], self.maths, 35)
+        self.add(self.students[1], self.maths, 38)
+        self.add(self.students[2], self.maths, 100)
+        self.assertEqual(self.histogram(self.maths), {'30': 2, '90': 1})
+        first.exam_score = 72
+        first.save()
+        self.assertEqual(self.histogram(self.maths), {'30': 1, '70': 1, '90': 1})
+
+        rebuild_summaries()
+        self.assertEqual(self.histogram(self.maths), {'30': 1, '70': 1, '90': 1})
+
+    def test_pass_rate_difficulty_and_term_comparison(self):
+        for student, score in zip(self.students, (80, 60, 30, 20)):
+            self.add(student, self.maths, score)
+            self.add(student, self.physics, score + 10)
+            self.add(student, self.maths, score + 10, term='2')
+        data = grade_analytics('2024/2025', term='1')
+        self.assertEqual(data['overall'].count, 8)
+        self.assertEqual(data['overall'].pass_rate, Decimal('62.5'))  # 30, 20 and 30 are Fs
+        self.assertEqual([row['name'] for row in data['subjects']], ['Mathematics', 'Physics'])
+        self.assertEqual(data['subjects'][0]['relative'], -5)
+        self.assertEqual([row['count'] for row in data['histogram']], [0, 0, 1, 2, 1, 0, 1, 1, 1, 1])
+
+        first, second = grade_analytics('2024/2025', subject_id=self.maths.id)['terms']
+        self.assertEqual((first['stats'].average, second['stats'].average), (Decimal('47.5'), Decimal('57.5')))
+        self.assertEqual(second['average_change'], 10)
+        self.assertEqual(second['pass_rate_change'], 25)
+
+    def test_page_reads_no_results(self):
+        self.add(self.students[0], self.maths, 75)
+        self.client.post('/login/', {'name': 'stats eo', 'password': 'pw'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/eo/analytics/')
+        self.assertContains(response, 'Mathematics')
+        self.assertFalse([q['sql'] for q in queries if 'exam_app_result' in q['sql']])
+
+
+# ---------------------------
+# Columnar snapshots
+# ---------------------------
+class SnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        maths, physics = Subject.objects.create(name='Mathematics'), Subject.objects.create(name='Physics')
+        for i in range(5):
+            student = Student.objects.create(first_name='Ada', last_name=f'Obi{i}', reg_no=f'SN/{i}',
+                                             class_level='SS2' if i % 2 else 'SS1')
+            for subject in (maths, physics):
+                Result.objects.create(student=student, subject=subject, test_score=Decimal('10.25'),
+                                      exam_score=40 + i, term=str(i % 3 + 1), session='2024/2025')
+        Result.objects.create(student=student, subject=maths, test_score=1, exam_score=1, term='1',
+                              session='2023/2024')
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir, True)
+
+    def assertSnapshotMatches(self, path):
+        expected = [
+            [result.id, result.student_id, result.student.class_level, result.subject.name, result.term,
+             result.grade, result.test_score, result.exam_score, result.total_score]
+            for result in Result.objects.filter(session='2024/2025').order_by('id').select_related('student', 'subject')
+        ]
+        with load_snapshot(path) as snapshot:
+            self.assertEqual((len(snapshot), snapshot.session), (10, '2024/2025'))
+            columns = [snapshot.values(name) for name in snapshot.manifest['columns']]
+        self.assertEqual([list(row) for row in zip(*columns)], expected)
+
+    def test_npz_snapshot_round_trip(self):
+        path = os.path.join(self.workdir, 'snapshot.npz')
+        self.assertEqual(write_snapshot(path, '2024/2025', chunk_size=3), 10)
+        self.assertSnapshotMatches(path)
+        with load_snapshot(path) as snapshot:
+            self.assertEqual(snapshot['test_score'][0], 1025)  # fixed-point hundredths, read in place
+            self.assertEqual(snapshot.dictionaries['class_level'], ['SS1', 'SS2', 'SS3'])
+
+    def test_arrow_snapshot_round_trip(self):
+        if load_pyarrow() is None:
+            self.skipTest("pyarrow is not installed")
+        path = os.path.join(self.workdir, 'snapshot.arrow')
+        self.assertEqual(write_snapshot(path, '2024/2025', chunk_size=3), 10)
+        self.assertSnapshotMatches(path)
+
+    def test_arrow_needs_pyarrow(self):
+        if load_pyarrow() is not None:
+            self.skipTest("pyarrow is installed")
+        with self.assertRaisesMessage(ValueError, 'pyarrow'):
+            write_snapshot(os.path.join(self.workdir, 'snapshot.arrow'), '2024/2025')
+
+    def test_snapshot_job(self):
+        with override_settings(MEDIA_ROOT=self.workdir):
+            enqueue('snapshot', {'session': '2024/2025'})
+            job = run_job(claim_job('w'))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.message), ('succeeded', '10 results in a columnar snapshot'))
+            self.assertSnapshotMatches(job.result_file.path)
+
+
+# ---------------------------
+# Production static files
+# ---------------------------
+class CompressedStaticFilesTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_collectstatic_writes_hashed_and_gzipped_files(self):
+        storages = dict(settings.STORAGES, staticfiles={
+            'BACKEND': 'exam_app.storage.CompressedManifestStaticFilesStorage'})
+        with override_settings(STATIC_ROOT=self.root, STORAGES=storages):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            hashed = staticfiles_storage.stored_name('css/style.css')
+        self.assertRegex(hashed, r'^css/style\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.root, hashed), 'rb') as fh:
+            original = fh.read()
+        with gzip.open(os.path.join(self.root, hashed + '.gz')) as fh:
+            self.assertEqual(fh.read(), original)
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'images', 'go.jpg.gz')))
+
+    def test_result_rows_use_stylesheet_classes(self):
+        html = render_to_string('eo_result_rows.html', {'results': [
+            {'student__first_name': 'Ada', 'student__last_name': 'Obi', 'student__reg_no': 'R/1',
+             'total_score': '75.00', 'grade': 'A', 'term': '1', 'session': '2024/2025'}]})
+        self.assertIn('<td class="center">75.00</td>', html)
+        self.assertNotIn('style=', html)
+
+
+class ProductionSettingsTests(TestCase):
+    def load_settings(self, **env):
+        with mock.patch.dict(os.environ, env, clear=True):
+            return runpy.run_path(str(settings.BASE_DIR / 'exam_system' / 'settings.py'))
+
+    def test_production_needs_secret_key_and_hosts(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'DJANGO_SECRET_KEY'):
+            self.load_settings(DJANGO_PRODUCTION='1', DJANGO_ALLOWED_HOSTS='exams.example.com')
+        with self.assertRaisesMessage(ImproperlyConfigured, 'DJANGO_ALLOWED_HOSTS'):
+            self.load_settings(DJANGO_PRODUCTION='1', DJANGO_SECRET_KEY='s' * 50)
+        loaded = self.load_settings(DJANGO_PRODUCTION='1', DJANGO_SECRET_KEY='s' * 50,
+                                    DJANGO_ALLOWED_HOSTS='exams.example.com, www.exams.example.com')
+        self.assertEqual(loaded['ALLOWED_HOSTS'], ['exams.example.com', 'www.exams.example.com'])
+        self.assertFalse(loaded['DEBUG'])
+
+    def test_signed_cookie_sessions_need_secret_key(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'DJANGO_SECRET_KEY'):
+            self.load_settings(DJANGO_SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+
+
+class CsrfSafeGZipTests(TestCase):
+    def setUp(self):
+        cache.clear()  # login throttle counters from other tests
+        local_teachers.clear()
+
+    def compress(self, csrf_cookie=False):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = HttpResponse('x' * 1000)
+        if csrf_cookie:
+            response.set_cookie(settings.CSRF_COOKIE_NAME, 'token')
+        return CsrfSafeGZipMiddleware(lambda r: None).process_response(request, response)
+
+    def test_pages_without_a_token_are_compressed(self):
+        self.assertEqual(self.compress()['Content-Encoding'], 'gzip')
+
+    def test_pages_with_a_token_are_sent_as_they_are(self):
+        response = self.compress(csrf_cookie=True)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, b'x' * 1000)
+
+    def test_production_profile_compresses_pages_without_forms_only(self):
+        middleware = settings.MIDDLEWARE[:1] + settings.PRODUCTION_MIDDLEWARE + settings.MIDDLEWARE[1:]
+        with override_settings(MIDDLEWARE=middleware):
+            response = self.client.get('/login/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+        TeacherProfile.objects.create(name='Gzip EO', password='pw', is_eo=True)
+        self.client.post('/login/', {'name': 'Gzip EO', 'password': 'pw'})
+        with override_settings(MIDDLEWARE=middleware):
+            response = self.client.get('/eo/analytics/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
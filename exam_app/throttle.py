@@ -0,0 +1,88 @@
+import hashlib
+import math
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+# ---------------------------
+# Login attempt limiter
+# ---------------------------
+# Fixed-window counters in the cache framework, one per teacher name and
+# client IP pair and one per client IP. A blocked attempt is rejected before
+# any password hashing, so a login storm costs cache lookups instead of PBKDF2
+# rounds. Keying the name counter by IP too means guessing at a teacher's
+# name from elsewhere doesn't lock the teacher out.
+# Each counter's window end is stored next to it, so a blocked teacher is told
+# how long is left rather than the full window.
+
+DEFAULT_LIMITS = {
+    'name_ip': (5, 5 * 60),  # failed attempts per name and IP per 5 minutes
+    'ip': (30, 5 * 60),      # failed attempts per IP per 5 minutes
+}
+
+ATTEMPT_KEY = 'exam_app:login-attempts:{kind}:{value}'
+EXPIRES_SUFFIX = ':expires'
+
+
+def login_limits():
+    return getattr(settings, 'LOGIN_RATE_LIMITS', DEFAULT_LIMITS)
+
+
+def attempt_key(kind, value):
+    # Names may contain spaces or non-ASCII characters; keep keys memcached-safe
+    digest = hashlib.sha1(value.encode('utf-8')).hexdigest()
+    return ATTEMPT_KEY.format(kind=kind, value=digest)
+
+
+def client_ip(request):
+    """
+    The address the request came from. Behind a reverse proxy, set
+    LOGIN_CLIENT_IP_HEADER (e.g. 'HTTP_X_FORWARDED_FOR') to the META key the
+    proxy appends the client address to; its last entry is the one the proxy
+    added, so clients can't spoof it by sending the header themselves.
+    """
+    if request is None:
+        return ''
+    header = getattr(settings, 'LOGIN_CLIENT_IP_HEADER', '')
+    forwarded = request.META.get(header, '') if header else ''
+    if forwarded:
+        return forwarded.split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+class LoginThrottle:
+    def __init__(self, name, ip):
+        limits = login_limits()
+        self.counters = [
+            (kind, attempt_key(kind, value), limits[kind])
+            for kind, value in (('name_ip', name and f'{name}|{ip}'), ('ip', ip))
+            if value and kind in limits
+        ]
+
+    def blocked(self):
+        """Seconds left in the window of a counter that is over its limit, else 0."""
+        keys = [key for _, key, _ in self.counters]
+        found = cache.get_many(keys + [key + EXPIRES_SUFFIX for key in keys])
+        now = time.time()
+        wait = 0
+        for _, key, (limit, window) in self.counters:
+            if found.get(key, 0) >= limit:
+                expires = found.get(key + EXPIRES_SUFFIX)
+                left = expires - now if expires is not None else window
+                wait = max(wait, min(max(math.ceil(left), 1), window))
+        return wait
+
+    def failed(self):
+        for _, key, (_, window) in self.counters:
+            if cache.add(key, 1, window):
+                cache.set(key + EXPIRES_SUFFIX, time.time() + window, window)
+                continue
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, window)
+                cache.set(key + EXPIRES_SUFFIX, time.time() + window, window)
+
+    def succeeded(self):
+        # Only the name counter is cleared; a noisy IP stays limited
+        cache.delete_many([key for kind, key, _ in self.counters if kind == 'name_ip'])
@@ -1,21 +1,39 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
-urlpatterns = [
-    # Teacher URLs
-    path('teacher/dashboard/', views.teacher_dashboard, name='teacher_dashboard'),
-    path('teacher/add-student/', views.add_student, name='add_student'),
-    path('teacher/view-students/', views.view_students, name='view_students'),
-    path('teacher/input-results/', views.input_results, name='input_results'),
 
-    # EO URLs
-    path('eo/dashboard/', views.eo_dashboard, name='eo_dashboard'),
-    path('eo/view-results/', views.view_all_results, name='view_all_results'),
-    # path('eo/compile-results/', views.compile_results, name='compile_results'),
+def app_urlpatterns(read_views):
+    """The app's URLs, with the read-only views taken from ``read_views``."""
+    return [
+        # Teacher URLs
+        path('teacher/dashboard/', read_views.teacher_dashboard, name='teacher_dashboard'),
+        path('teacher/add-student/', views.add_student, name='add_student'),
+        path('teacher/view-students/', read_views.view_students, name='view_students'),
+        path('students/search/', views.student_search, name='student_search'),
+        path('teacher/input-results/', views.input_results, name='input_results'),
+        path('teacher/input-results/bulk/', views.bulk_input_results, name='bulk_input_results'),
+        path('teacher/upload-results/', views.upload_results, name='upload_results'),
+        path('api/results/bulk/', views.bulk_results_api, name='bulk_results_api'),
 
-    # Login / logout
-    path('login/', views.teacher_login_view, name='teacher_login'),
-    path('logout/', views.teacher_logout, name='teacher_logout'),
-    path('graded-students/', views.graded_students, name='graded_students'),
+        # EO URLs
+        path('eo/dashboard/', views.eo_dashboard, name='eo_dashboard'),
+        path('eo/view-results/', read_views.view_all_results, name='view_all_results'),
+        path('eo/view-results/section/', read_views.results_section, name='results_section'),
+        path('eo/compile-results/', views.compile_results, name='compile_results'),
+        path('eo/broadsheet/', views.broadsheet, name='broadsheet'),
+        path('eo/analytics/', views.analytics, name='analytics'),
+        path('eo/report-cards/', views.report_cards, name='report_cards'),
+        path('eo/jobs/', views.enqueue_job, name='enqueue_job'),
+        path('eo/jobs/<int:job_id>/', views.job_status_view, name='job_status'),
+        path('eo/jobs/<int:job_id>/download/', views.job_download, name='job_download'),
 
-]
+        # Login / logout
+        path('login/', views.teacher_login_view, name='teacher_login'),
+        path('logout/', views.teacher_logout, name='teacher_logout'),
+        path('graded-students/', read_views.graded_students, name='graded_students'),
+    ]
+
+
+# Read-only views have async twins for ASGI deployments (EXAM_ASYNC_VIEWS)
+urlpatterns = app_urlpatterns(async_views if settings.EXAM_ASYNC_VIEWS else views)
@@ -1,25 +1,40 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
-from .forms import TeacherLoginForm, StudentForm, ResultForm
-from .models import TeacherProfile, Student, Result, Subject
+from .forms import TeacherLoginForm, StudentForm, ResultForm, BulkResultForm, ResultUploadForm, JobForm
+from .models import TeacherProfile, Student, Result, Subject, Job, CLASS_CHOICES, TERM_CHOICES
 from django.contrib.auth.decorators import login_required
 from django.db.models import Sum
+import json
+import os
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from django.template.loader import render_to_string
+from .decorators import eo_required, teacher_required
+from .middleware import resolve_teacher
+from .caching import (
+    REBUILD_SCOPE, STUDENTS_SCOPE, cached, class_students_scope, section_scope, teacher_results_scope,
+)
+from .analytics import grade_analytics, session_choices
+from .broadsheet import broadsheet_filename, broadsheet_xlsx_file, class_broadsheet, iter_broadsheet_csv
+from .bulk import UPLOAD_COLUMNS, BulkEntryError, read_upload, save_results
+from .exports import streaming_results_csv, streaming_statistics_csv
+from .jobs import enqueue, job_status, recent_jobs
+from .queries import graded_by_teacher, results_overview, section_rows
+from .pagination import DEFAULT_PAGE_SIZE, keyset_page
+from .ranking import positions_by_student, subject_positions
+from .routers import reporting_view
+from .search import DEFAULT_LIMIT, search_students, student_label
 
-# Helper: get logged-in teacher
+# Helper: get logged-in teacher (TeacherMiddleware resolves it once per request)
 def get_logged_in_teacher(request):
-    teacher_id = request.session.get('teacher_id')
-    if not teacher_id:
-        return None
-    try:
-        return TeacherProfile.objects.get(id=teacher_id)
-    except TeacherProfile.DoesNotExist:
-        request.session.flush()
-        return None
+    if hasattr(request, 'teacher'):
+        return request.teacher
+    return resolve_teacher(request)
 
 # Teacher / EO Login
 def teacher_login_view(request):
     if request.method == 'POST':
-        form = TeacherLoginForm(request.POST)
+        form = TeacherLoginForm(request.POST, request=request)
         if form.is_valid():
             teacher = form.cleaned_data['teacher']
             request.session['teacher_id'] = teacher.id
@@ -38,12 +53,15 @@ def teacher_logout(request):
     return redirect('teacher_login')
 
 # Teacher Dashboard
+@teacher_required
 def teacher_dashboard(request):
-    teacher = get_logged_in_teacher(request)
-    if not teacher:
-        return redirect('teacher_login')
+    teacher = request.teacher
     students = Student.objects.filter(class_level=teacher.class_level)
-    recent_results = Result.objects.filter(entered_by=teacher).order_by('-created_at')[:8]
+    recent_results = (
+        Result.objects.filter(entered_by=teacher)
+        .select_related('student', 'subject')
+        .order_by('-created_at')[:8]
+    )
     return render(request, 'teacher_dashboard.html', {
         'teacher': teacher,
         'students': students,
@@ -51,21 +69,19 @@ def teacher_dashboard(request):
     })
 
 # EO Dashboard
+@eo_required
 def eo_dashboard(request):
-    teacher = get_logged_in_teacher(request)
-    if not teacher:
-        messages.error(request, "You must log in first.")
-        return redirect('teacher_login')
-    if not teacher.is_eo:
-        messages.error(request, "Access denied. EO only.")
-        return redirect('teacher_dashboard')
-    return render(request, 'eo_dashboard.html', {'teacher': teacher})
+    teacher = request.teacher
+    return render(request, 'eo_dashboard.html', {
+        'teacher': teacher,
+        'job_form': JobForm(),
+        'jobs': [job_status(job) for job in recent_jobs()],
+    })
 
 # Add Student
+@teacher_required
 def add_student(request):
-    teacher = get_logged_in_teacher(request)
-    if not teacher:
-        return redirect('teacher_login')
+    teacher = request.teacher
     if request.method == 'POST':
         form = StudentForm(request.POST)
         if form.is_valid():
@@ -83,21 +99,33 @@ def add_student(request):
     })
 
 # View Students
+@teacher_required
 def view_students(request):
-    teacher = get_logged_in_teacher(request)
-    if not teacher:
-        return redirect('teacher_login')
+    teacher = request.teacher
     students = Student.objects.filter(class_level=teacher.class_level)
     return render(request, 'view_students.html', {
         'students': students,
         'teacher': teacher  # ✅ added so navbar shows Logout & name
     })
 
+# Student search (autocomplete): GET ?q=<reg no or name prefix>&limit=<n>
+def student_search(request):
+    teacher = request.teacher
+    if not teacher:
+        return JsonResponse({'error': "Please log in."}, status=403)
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    # Teachers only find their own class; the EO searches the whole school
+    class_level = None if teacher.is_eo else teacher.class_level
+    rows = search_students(request.GET.get('q', ''), class_level=class_level, limit=limit)
+    return JsonResponse({'results': [dict(row, label=student_label(row)) for row in rows]})
+
 # Input Results
+@teacher_required
 def input_results(request):
-    teacher = get_logged_in_teacher(request)
-    if not teacher:
-        return redirect('teacher_login')
+    teacher = request.teacher
     if request.method == 'POST':
         form = ResultForm(request.POST)
         if form.is_valid():
@@ -118,114 +146,330 @@ def input_results(request):
         'teacher': teacher  # ✅ added
     })
 
-# EO: View All Resultsfrom django.db.models import Sum, Avg
-# from django.shortcuts import render, redirect
-from django.http import HttpResponse
-# from django.db.models import Avg
-import csv
+# Bulk Input Results (whole class grid for one subject / term / session)
+@teacher_required
+def bulk_input_results(request):
+    teacher = request.teacher
 
-def view_all_results(request):
-    teacher = get_logged_in_teacher(request)
+    form = BulkResultForm(request.POST if request.method == 'POST' else (request.GET or None))
+    rows = []
+    if form.is_valid():
+        subject = form.cleaned_data['subject']
+        term = form.cleaned_data['term']
+        session = form.cleaned_data['session']
+        students = list(
+            Student.objects.filter(class_level=teacher.class_level)
+            .order_by('last_name', 'first_name')
+            .only('id', 'reg_no', 'first_name', 'last_name')
+        )
+        entered = set(
+            Result.objects
+            .filter(subject=subject, term=term, session=session, student__class_level=teacher.class_level)
+            .values_list('student_id', flat=True)
+        )
+
+        if request.method == 'POST':
+            entries, entry_students = [], []
+            for student in students:
+                test_score = request.POST.get(f'test_{student.id}', '').strip()
+                exam_score = request.POST.get(f'exam_{student.id}', '').strip()
+                if student.id in entered or not (test_score or exam_score):
+                    continue
+                entries.append({
+                    'student_id': student.id, 'subject': subject.id, 'term': term, 'session': session,
+                    'test_score': test_score, 'exam_score': exam_score,
+                })
+                entry_students.append(student)
+            try:
+                created = save_results(teacher, entries)
+            except BulkEntryError as exc:
+                for number, error in exc.errors:
+                    messages.error(request, f"{entry_students[number - 1].reg_no}: {error}")
+            else:
+                messages.success(request, f"{len(created)} result(s) saved successfully.")
+                return redirect('teacher_dashboard')
+
+        rows = [{
+            'student': student,
+            'entered': student.id in entered,
+            'test_score': request.POST.get(f'test_{student.id}', ''),
+            'exam_score': request.POST.get(f'exam_{student.id}', ''),
+        } for student in students]
+
+    return render(request, 'bulk_input_results.html', {
+        'form': form,
+        'rows': rows,
+        'teacher': teacher
+    })
+
+# Upload Results (CSV / XLSX)
+@teacher_required
+def upload_results(request):
+    teacher = request.teacher
+    row_errors = []
+    if request.method == 'POST':
+        form = ResultUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            subject = form.cleaned_data['subject']
+            defaults = {
+                'subject': subject.id if subject else '',
+                'term': form.cleaned_data['term'],
+                'session': form.cleaned_data['session'],
+            }
+            try:
+                rows = read_upload(form.cleaned_data['file'], defaults)
+                created = save_results(teacher, rows)
+            except ValueError as exc:
+                messages.error(request, str(exc))
+            except BulkEntryError as exc:
+                messages.error(request, "No results were saved. Fix these rows and upload again.")
+                row_errors = exc.errors
+            else:
+                messages.success(request, f"{len(created)} result(s) uploaded successfully.")
+                return redirect('teacher_dashboard')
+    else:
+        form = ResultUploadForm()
+    return render(request, 'upload_results.html', {
+        'form': form,
+        'row_errors': row_errors,
+        'columns': UPLOAD_COLUMNS,
+        'teacher': teacher
+    })
+
+# Bulk Results API: POST {"rows": [{reg_no, subject, test_score, exam_score, term, session}, ...]}
+@require_POST
+def bulk_results_api(request):
+    teacher = request.teacher
     if not teacher:
-        return redirect('teacher_login')
-    if not teacher.is_eo:
-        messages.error(request, "Access denied. EO only.")
-        return redirect('teacher_dashboard')
+        return JsonResponse({'error': "You must log in first."}, status=403)
+    try:
+        rows = json.loads(request.body)['rows']
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected a JSON body like {"rows": [{...}, ...]}.'}, status=400)
+    try:
+        created = save_results(teacher, rows)
+    except BulkEntryError as exc:
+        return JsonResponse({'errors': [{'row': number, 'error': error} for number, error in exc.errors]}, status=400)
+    return JsonResponse({'created': len(created)}, status=201)
 
-    # CSV download (flat list)
+# EO: View All Results
+@eo_required
+@reporting_view
+def view_all_results(request):
+    teacher = request.teacher
+
+    # CSV download (flat list, streamed straight from the cursor)
     if request.GET.get("download") == "csv":
-        results_qs = Result.objects.select_related('student', 'subject').order_by(
-            'student__class_level', 'subject__name', 'student__last_name', 'student__first_name'
-        )
+        return streaming_results_csv(Result.objects.all(), request.GET)
 
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="all_results.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['Student', 'Class', 'Subject', 'Total Score', 'Grade', 'Term', 'Session'])
-
-        for r in results_qs:
-            writer.writerow([
-                f"{r.student.first_name} {r.student.last_name}",
-                r.student.class_level,
-                r.subject.name if r.subject else '',
-                r.total_score,
-                r.grade,
-                r.term,
-                r.session
-            ])
-        return response
-
-    # Normal page render: group by class -> subject -> [results]
-    results_qs = Result.objects.select_related('student', 'subject').order_by(
-        'student__class_level', 'subject__name', 'student__last_name', 'student__first_name'
-    )
+    # Class / subject statistics (aggregated in SQL)
+    if request.GET.get("download") == "stats":
+        return streaming_statistics_csv(request.GET)
 
-    grouped_temp = {}  # temporary structure: { class_name: { subject_name: [result, ...] } }
-    for r in results_qs:
-        class_name = r.student.class_level or "Unknown"
-        subject_name = r.subject.name if r.subject else "Unknown"
-        grouped_temp.setdefault(class_name, {}).setdefault(subject_name, []).append(r)
-
-    # Convert grouped_temp to a list of class dicts with averages to make template access easy
-    classes = []
-    for class_name, subjects in grouped_temp.items():
-        # collect all total_score values for this class to compute average
-        scores = []
-        for subject_results in subjects.values():
-            for rr in subject_results:
-                try:
-                    scores.append(float(rr.total_score))
-                except Exception:
-                    # fallback if Decimal or None etc.
-                    try:
-                        scores.append(float(str(rr.total_score)))
-                    except Exception:
-                        pass
-        average = (sum(scores) / len(scores)) if scores else 0
-        classes.append({
-            'class_name': class_name,
-            'average': average,
-            'subjects': subjects  # dict: subject_name -> [Result,...]
-        })
-
-    # optional: sort classes by name
-    classes.sort(key=lambda c: c['class_name'])
+    # Normal page render: only the class/subject headers are queried here,
+    # each section's rows are fetched on demand from results_section.
+    filters = {key: request.GET.get(key, '') for key in ('term', 'session', 'class_level')}
+    classes = results_overview(filters)
 
     return render(request, 'eo_view_results.html', {
         'classes': classes,
         'teacher': teacher,
+        'filters': filters,
+        'class_choices': CLASS_CHOICES,
+        'term_choices': TERM_CHOICES,
     })
 
-# EO: Compile Results
-# def compile_results(request):
-#     teacher = get_logged_in_teacher(request)
-#     if not teacher:
-#         return redirect('teacher_login')
-#     if not teacher.is_eo:
-#         messages.error(request, "Access denied. EO only.")
-#         return redirect('teacher_dashboard')
-#     return render(request, 'eo_compile_results.html', {
-#         'teacher': teacher
-#     })
+# EO: one page of a class/subject section (JSON fragment)
+@reporting_view
+def results_section(request):
+    teacher = request.teacher
+    if not teacher or not teacher.is_eo:
+        return JsonResponse({'error': "Access denied. EO only."}, status=403)
 
-def graded_students(request):
-    teacher = get_logged_in_teacher(request)
-    if not teacher:
-        return redirect('teacher_login')
-
-    graded = (
-        Result.objects
-        .filter(entered_by=teacher)
-        .values(
-            'subject__name',
-            'student__id',
-            'student__reg_no',
-            'student__first_name',
-            'student__last_name',
-            'student__class_level'
+    class_level = request.GET.get('class_level')
+    subject_id = request.GET.get('subject')
+    if not class_level or not subject_id:
+        return JsonResponse({'error': "class_level and subject are required."}, status=400)
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        limit = DEFAULT_PAGE_SIZE
+
+    def page():
+        rows, next_cursor = keyset_page(section_rows(request.GET, subject_id),
+                                        after=request.GET.get('after'), limit=limit)
+        html = render_to_string('eo_result_rows.html', {'results': rows})
+        return {'html': html, 'count': len(rows), 'next': next_cursor}
+
+    # Cached per page; only changes to this class/subject section (or its students) invalidate it
+    term, session = request.GET.get('term', ''), request.GET.get('session', '')
+    try:
+        data = cached(
+            'results-section', (class_level, subject_id, term or '*', session or '*',
+                                request.GET.get('after', ''), limit),
+            (section_scope(class_level, subject_id, term, session), class_students_scope(class_level),
+             REBUILD_SCOPE),
+            page,
         )
-        .annotate(total_marks=Sum('total_score'))
-        .order_by('subject__name')
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse(data)
+
+# EO: Compile Results (class positions)
+@eo_required
+@reporting_view
+def compile_results(request):
+    teacher = request.teacher
+
+    filters = {key: request.GET.get(key, '') for key in ('term', 'session', 'class_level')}
+    students, subjects = [], []
+    if filters['term'] and filters['session'] and filters['class_level']:
+        ranked = positions_by_student(filters['term'], filters['session'], filters['class_level'])
+        subjects = sorted(
+            {(row['subject__name'], row['subject_id'])
+             for row in subject_positions(filters['term'], filters['session'], filters['class_level'])}
+        )
+        for row in ranked.values():
+            row['subject_columns'] = [row['subject_positions'].get(subject_id, '') for _, subject_id in subjects]
+            students.append(row)
+
+    return render(request, 'eo_compile_results.html', {
+        'teacher': teacher,
+        'filters': filters,
+        'students': students,
+        'subjects': [name for name, _ in subjects],
+        'class_choices': CLASS_CHOICES,
+        'term_choices': TERM_CHOICES,
+    })
+
+# EO: Class broadsheet (student x subject scores; ?download=csv|xlsx)
+@eo_required
+@reporting_view
+def broadsheet(request):
+    teacher = request.teacher
+
+    filters = {key: request.GET.get(key, '') for key in ('term', 'session', 'class_level')}
+    sheet = None
+    if filters['term'] and filters['session'] and filters['class_level']:
+        sheet = class_broadsheet(filters['term'], filters['session'], filters['class_level'])
+        download = request.GET.get('download')
+        if download == 'csv':
+            response = StreamingHttpResponse(iter_broadsheet_csv(sheet), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="{}"'.format(
+                broadsheet_filename(filters['term'], filters['session'], filters['class_level'], 'csv'))
+            return response
+        if download == 'xlsx':
+            try:
+                fh = broadsheet_xlsx_file(sheet, title=f"{filters['class_level']} term {filters['term']}")
+            except ValueError as exc:
+                messages.error(request, str(exc))
+            else:
+                return FileResponse(fh, as_attachment=True, filename=broadsheet_filename(
+                    filters['term'], filters['session'], filters['class_level'], 'xlsx'))
+
+    return render(request, 'eo_broadsheet.html', {
+        'teacher': teacher,
+        'filters': filters,
+        'sheet': sheet,
+        'header': sheet.header() if sheet else [],
+        'lines': list(sheet.lines()) if sheet else [],
+        'footer': sheet.footer() if sheet else [],
+        'class_choices': CLASS_CHOICES,
+        'term_choices': TERM_CHOICES,
+    })
+
+# EO: Grade analytics (distributions, pass rates, subject difficulty; summary rows only)
+@eo_required
+@reporting_view
+def analytics(request):
+    teacher = request.teacher
+
+    sessions = session_choices()
+    filters = {key: request.GET.get(key, '') for key in ('session', 'term', 'class_level', 'subject')}
+    if not filters['session'] and sessions:
+        filters['session'] = sessions[0]
+    if not filters['subject'].isdigit():
+        filters['subject'] = ''
+
+    data = None
+    if filters['session']:
+        data = grade_analytics(filters['session'], filters['term'], filters['class_level'], filters['subject'])
+
+    return render(request, 'eo_analytics.html', {
+        'teacher': teacher,
+        'filters': filters,
+        'data': data,
+        'sessions': sessions,
+        'subjects': Subject.objects.order_by('name').values_list('id', 'name'),
+        'class_choices': CLASS_CHOICES,
+        'term_choices': TERM_CHOICES,
+    })
+
+# EO: Report Cards (zip of one card per student, rendered by a background job)
+@eo_required
+def report_cards(request):
+    teacher = request.teacher
+
+    filters = {key: request.POST.get(key, '') for key in ('term', 'session', 'class_level')}
+    if request.method == 'POST':
+        if not (filters['term'] and filters['session']):
+            messages.error(request, "Choose a term and a session.")
+        else:
+            enqueue('report_cards', {key: value for key, value in filters.items() if value}, requested_by=teacher)
+            messages.success(request, "Report cards are being generated; the download appears below when ready.")
+            return redirect('report_cards')
+
+    return render(request, 'eo_report_cards.html', {
+        'teacher': teacher,
+        'filters': filters,
+        'class_choices': CLASS_CHOICES,
+        'term_choices': TERM_CHOICES,
+        'jobs': [job_status(job) for job in recent_jobs(kind='report_cards')],
+    })
+
+# EO: background jobs (run by manage.py run_jobs; the dashboard polls their status)
+@require_POST
+def enqueue_job(request):
+    teacher = request.teacher
+    if not teacher or not teacher.is_eo:
+        return JsonResponse({'error': "Access denied. EO only."}, status=403)
+    form = JobForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'error': form.errors.as_text()}, status=400)
+    try:
+        job = enqueue(form.cleaned_data['kind'], form.params(), requested_by=teacher)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse(job_status(job), status=202)
+
+def job_status_view(request, job_id):
+    teacher = request.teacher
+    if not teacher or not teacher.is_eo:
+        return JsonResponse({'error': "Access denied. EO only."}, status=403)
+    job = Job.objects.filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({'error': "No such job."}, status=404)
+    return JsonResponse(job_status(job))
+
+@eo_required
+def job_download(request, job_id):
+    job = get_object_or_404(Job, id=job_id, status=Job.SUCCEEDED)
+    if not job.result_file:
+        raise Http404("This job has no file.")
+    return FileResponse(job.result_file.open('rb'), as_attachment=True,
+                        filename=os.path.basename(job.result_file.name))
+
+@teacher_required
+@reporting_view
+def graded_students(request):
+    teacher = request.teacher
+
+    graded = cached(
+        'graded-students', (teacher.id,),
+        (teacher_results_scope(teacher.id), STUDENTS_SCOPE, REBUILD_SCOPE),
+        lambda: list(graded_by_teacher(teacher)),
     )
 
     grouped_by_subject = {}
@@ -5,6 +5,8 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Run with an ASGI server, e.g. ``uvicorn exam_system.asgi:application``.
 """
 
 import os
@@ -12,5 +14,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'exam_system.settings')
+# Async twins of the read-only views (exam_app.async_views); set to 0 to compare
+os.environ.setdefault('DJANGO_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
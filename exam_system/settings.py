@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -21,7 +23,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-q0&ca(dnj!_nuiwv#lt!mnd5+&clx651)%)4tf3zzwm94n98cf'
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY',
+                            'django-insecure-q0&ca(dnj!_nuiwv#lt!mnd5+&clx651)%)4tf3zzwm94n98cf')
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
@@ -43,11 +46,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'exam_app.instrumentation.InstrumentationMiddleware',  # no-op unless EXAM_INSTRUMENTATION is on
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'exam_app.middleware.TeacherMiddleware',
+    'exam_app.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -75,13 +81,75 @@ ASGI_APPLICATION = 'exam_system.asgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#
+# DJANGO_DB_ENGINE=postgresql switches to PostgreSQL (DJANGO_DB_NAME, _USER,
+# _PASSWORD, _HOST, _PORT). Connections are kept for DJANGO_CONN_MAX_AGE
+# seconds and health-checked before reuse; with DJANGO_DB_POOL=1 psycopg's
+# connection pool is used instead (it needs CONN_MAX_AGE = 0).
+# SQLite stays the default; exam_app.database switches it to WAL with a busy
+# timeout when each connection opens.
+
+DB_ENGINE = os.environ.get('DJANGO_DB_ENGINE', 'sqlite')
+CONN_MAX_AGE = int(os.environ.get('DJANGO_CONN_MAX_AGE', 60))
+
+if DB_ENGINE == 'postgresql':
+    DB_POOL = os.environ.get('DJANGO_DB_POOL', '') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DJANGO_DB_NAME', 'exam_system'),
+            'USER': os.environ.get('DJANGO_DB_USER', ''),
+            'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('DJANGO_DB_HOST', ''),
+            'PORT': os.environ.get('DJANGO_DB_PORT', ''),
+            'CONN_MAX_AGE': 0 if DB_POOL else CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DJANGO_DB_POOL_MIN', 2)),
+                    'max_size': int(os.environ.get('DJANGO_DB_POOL_MAX', 10)),
+                    'timeout': 10,
+                },
+            } if DB_POOL else {},
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_DB_NAME', str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'timeout': 20,
+                # Take the write lock at BEGIN, so two transactions never deadlock
+                # upgrading read locks (the usual source of "database is locked")
+                'transaction_mode': 'IMMEDIATE',
+            },
+            # A file, not :memory:, so tests can exercise concurrent connections
+            'TEST': {'NAME': str(BASE_DIR / 'test_db.sqlite3')},
+        }
+    }
+
+# Read replica for EO reporting (exam_app.routers). DJANGO_DB_REPLICA_NAME
+# (another SQLite file, or the replica's PostgreSQL database) and/or
+# DJANGO_DB_REPLICA_HOST turn it on; the other settings are the primary's.
+# A session that writes reads from the primary for the next
+# DJANGO_DB_REPLICA_STICKY_SECONDS, so it always sees its own results.
+REPLICA_NAME = os.environ.get('DJANGO_DB_REPLICA_NAME', '')
+REPLICA_HOST = os.environ.get('DJANGO_DB_REPLICA_HOST', '')
+if REPLICA_NAME or REPLICA_HOST:
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        NAME=REPLICA_NAME or DATABASES['default']['NAME'],
+        HOST=REPLICA_HOST or DATABASES['default'].get('HOST', ''),
+        OPTIONS=dict(DATABASES['default']['OPTIONS']),
+        TEST={'MIRROR': 'default'},
+    )
+
+DATABASE_ROUTERS = ['exam_app.routers.ReplicaRouter']
+EXAM_REPLICA_DATABASE = 'replica' if 'replica' in DATABASES else None
+EXAM_REPLICA_STICKY_SECONDS = int(os.environ.get('DJANGO_DB_REPLICA_STICKY_SECONDS', 10))
 
 
 # Password validation
@@ -102,6 +170,33 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing policy
+# The first hasher hashes new passwords; the rest only verify old hashes, which
+# are upgraded transparently when the teacher next logs in. Lower or raise the
+# PBKDF2 cost with DJANGO_PBKDF2_ITERATIONS without locking anyone out.
+PASSWORD_HASHERS = [
+    hasher.strip() for hasher in os.environ.get('DJANGO_PASSWORD_HASHERS', ','.join([
+        'exam_app.hashers.TunablePBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ])).split(',') if hasher.strip()
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('DJANGO_PBKDF2_ITERATIONS', 0)) or None  # None = Django default
+
+# Failed login attempts allowed per (count, window in seconds) before further
+# attempts are rejected without checking the password: per teacher name from
+# one client IP, and per client IP
+LOGIN_RATE_LIMITS = {
+    'name_ip': (5, 5 * 60),
+    'ip': (30, 5 * 60),
+}
+# Behind a reverse proxy every request has the proxy's REMOTE_ADDR. Name the
+# META key the proxy appends the client address to (e.g. HTTP_X_FORWARDED_FOR);
+# leave it empty when clients connect directly, or they could pick their own IP.
+LOGIN_CLIENT_IP_HEADER = os.environ.get('DJANGO_CLIENT_IP_HEADER', '')
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -128,6 +223,18 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
 
+# Sessions
+# cached_db reads sessions from the cache and falls back to the database, so
+# identifying the logged-in teacher normally needs no database round-trip
+# (the profile itself comes from cache), while logging out still deletes the
+# session on the server. Signed-cookie sessions can be forged by anyone who
+# knows SECRET_KEY and can't be revoked, so they need a key from the
+# environment rather than the public development one above.
+SESSION_ENGINE = os.environ.get('DJANGO_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+if SESSION_ENGINE.endswith('.signed_cookies') and 'DJANGO_SECRET_KEY' not in os.environ:
+    raise ImproperlyConfigured('Signed-cookie sessions need DJANGO_SECRET_KEY to be set.')
+
+
 LOGIN_URL = 'teacher_login'
 LOGIN_REDIRECT_URL = 'teacher_dashboard'
 
@@ -136,3 +243,90 @@ LOGIN_REDIRECT_URL = 'teacher_dashboard'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Cache for report data, template fragments, grade scales and the logged-in
+# teacher. 'locmem' is per process; use 'file' (or a shared backend) when
+# several worker processes serve the site, so invalidations reach all of them.
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'exam_app'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.cache')),
+}
+_cache_backend, _cache_location = CACHE_BACKENDS[os.environ.get('DJANGO_CACHE', 'locmem')]
+CACHES = {
+    'default': {
+        'BACKEND': _cache_backend,
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', _cache_location),
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Per-request query/timing headers and JSON log lines (exam_app.instrumentation).
+# Off by default; the middleware removes itself at startup when disabled.
+EXAM_INSTRUMENTATION = os.environ.get('DJANGO_INSTRUMENTATION', '') == '1'
+# The same SQL shape this many times in one request is logged as an N+1 candidate
+EXAM_N_PLUS_ONE_THRESHOLD = int(os.environ.get('DJANGO_N_PLUS_ONE_THRESHOLD', 5))
+
+# Serve the read-only dashboard/results views from exam_app.async_views.
+# asgi.py turns this on; under WSGI the async views would each need a
+# thread-hopping event loop, so the sync views stay the default there.
+EXAM_ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', '') == '1'
+
+# Background jobs (exam_app.jobs, manage.py run_jobs). A running job whose
+# worker has not reported progress for EXAM_JOB_STALE_SECONDS is queued
+# again, up to EXAM_JOB_MAX_ATTEMPTS tries in all.
+EXAM_JOB_STALE_SECONDS = int(os.environ.get('DJANGO_JOB_STALE_SECONDS', 60 * 60))
+EXAM_JOB_MAX_ATTEMPTS = 3
+# Result files under media/jobs/ are deleted this many days after their job finished
+EXAM_JOB_RETENTION_DAYS = int(os.environ.get('DJANGO_JOB_RETENTION_DAYS', 7))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'exam_app.instrumentation': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'exam_app.jobs': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Result indexes use INCLUDE columns, which only PostgreSQL stores; SQLite
+# builds them as plain indexes on the key columns.
+SILENCED_SYSTEM_CHECKS = ['models.W040']
+
+# Production rendering profile (DJANGO_PRODUCTION=1): DEBUG off, templates
+# compiled once per process by the cached loader, gzip-compressed responses
+# (except pages carrying a CSRF token, see exam_app.middleware), and static
+# files stored under content hashes with .gz/.br copies written by
+# collectstatic (exam_app.storage) for the web server to send as they are.
+# The gzip middleware goes outside everything that reads or changes the body.
+EXAM_PRODUCTION = os.environ.get('DJANGO_PRODUCTION', '') == '1'
+
+PRODUCTION_TEMPLATE_LOADERS = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+PRODUCTION_MIDDLEWARE = ['exam_app.middleware.CsrfSafeGZipMiddleware']
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+if EXAM_PRODUCTION:
+    # No silent fallbacks: the development key is public, and an empty
+    # host list rejects every request
+    if not os.environ.get('DJANGO_SECRET_KEY'):
+        raise ImproperlyConfigured("DJANGO_PRODUCTION=1 needs DJANGO_SECRET_KEY.")
+    DEBUG = False
+    ALLOWED_HOSTS = [host.strip() for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host.strip()]
+    if not ALLOWED_HOSTS:
+        raise ImproperlyConfigured("DJANGO_PRODUCTION=1 needs DJANGO_ALLOWED_HOSTS (comma-separated).")
+    TEMPLATES[0]['APP_DIRS'] = False  # the loaders list replaces it
+    TEMPLATES[0]['OPTIONS']['loaders'] = PRODUCTION_TEMPLATE_LOADERS
+    MIDDLEWARE = MIDDLEWARE[:1] + PRODUCTION_MIDDLEWARE + MIDDLEWARE[1:]  # inside instrumentation only
+    STORAGES['staticfiles']['BACKEND'] = 'exam_app.storage.CompressedManifestStaticFilesStorage'
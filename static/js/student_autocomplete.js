@@ -0,0 +1,55 @@
+// Student autocomplete for StudentAutocomplete (forms.py): queries the
+// student_search endpoint as the user types and fills the hidden id input.
+(function () {
+  var DELAY = 150;  // ms of quiet typing before a request
+
+  function setup(box) {
+    var hidden = box.querySelector('input[type=hidden]');
+    var input = box.querySelector('input[type=search]');
+    var list = box.querySelector('.student-autocomplete-results');
+    var timer = null;
+    var latest = 0;
+
+    function choose(student) {
+      hidden.value = student.id;
+      input.value = student.label;
+      list.hidden = true;
+    }
+
+    function show(results) {
+      list.innerHTML = '';
+      results.forEach(function (student) {
+        var item = document.createElement('li');
+        item.textContent = student.label + ' (' + student.class_level + ')';
+        item.addEventListener('mousedown', function (event) {
+          event.preventDefault();
+          choose(student);
+        });
+        list.appendChild(item);
+      });
+      list.hidden = results.length === 0;
+    }
+
+    function search() {
+      var query = input.value.trim();
+      if (!query) { show([]); return; }
+      var request = ++latest;
+      fetch(box.dataset.url + '?q=' + encodeURIComponent(query), {credentials: 'same-origin'})
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          if (request === latest) { show(data.results || []); }  // ignore out-of-order replies
+        });
+    }
+
+    input.addEventListener('input', function () {
+      hidden.value = '';  // typing again clears the previous choice
+      clearTimeout(timer);
+      timer = setTimeout(search, DELAY);
+    });
+    input.addEventListener('blur', function () { list.hidden = true; });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('.student-autocomplete').forEach(setup);
+  });
+})();